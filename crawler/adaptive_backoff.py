@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Adaptive 429 / Retry-After aware backoff controller
+AIMD pacing per host: halve the request rate when a site throttles us, honour
+its Retry-After, and creep back up after a run of successful requests. The
+rate lives in the shared token-bucket limiter, so every crawler process
+slows down and speeds up together.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from rate_limiter import TokenBucketLimiter, get_limiter, host_of
+
+logger = logging.getLogger(__name__)
+
+# Upper bound (requests per second) the controller may raise a host to
+RATE_CEILINGS = {
+    'www.gsmarena.com': 0.5,
+    'fdn2.gsmarena.com': 4.0,
+    'detail.zol.com.cn': 0.5,
+    'search.zol.com.cn': 0.5,
+}
+MIN_RATE = 1 / 60.0
+DEFAULT_RETRY_AFTER = 30.0
+MAX_RETRY_AFTER = 600.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateController:
+    """Additive-increase / multiplicative-decrease rate control per host"""
+
+    def __init__(self, limiter: Optional[TokenBucketLimiter] = None,
+                 decrease_factor: float = 0.5, increase_step: float = 0.02,
+                 success_window: int = 20, ceilings: Optional[Dict[str, float]] = None):
+        self.limiter = limiter or get_limiter()
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.success_window = success_window
+        self.ceilings = dict(RATE_CEILINGS)
+        if ceilings:
+            self.ceilings.update(ceilings)
+        self._lock = threading.Lock()
+        self._streaks: Dict[str, int] = {}
+        self._throttles: Dict[str, int] = {}
+        self._last_throttle: Dict[str, float] = {}
+
+    def current_rate(self, url_or_host: str) -> float:
+        """Requests per second currently allowed for a host"""
+        return self.limiter.get_rate(url_or_host)
+
+    def on_success(self, url_or_host: str):
+        """Record a non-throttled response; raise the rate after a sustained streak"""
+        host = host_of(url_or_host)
+        with self._lock:
+            streak = self._streaks.get(host, 0) + 1
+            if streak < self.success_window:
+                self._streaks[host] = streak
+                return
+            self._streaks[host] = 0
+        rate = self.current_rate(host)
+        ceiling = self.ceilings.get(host, self.limiter.default_limit(host)[0])
+        new_rate = min(ceiling, rate + self.increase_step)
+        if new_rate > rate:
+            self.limiter.set_rate(host, new_rate)
+            logger.info(f"{host}: {self.success_window} clean responses, rate {rate:.3f} -> {new_rate:.3f} req/s")
+
+    def on_throttled(self, url_or_host: str, retry_after: Optional[str] = None) -> float:
+        """Record a 429/503; cut the rate, hold the host and return the seconds to wait"""
+        host = host_of(url_or_host)
+        with self._lock:
+            self._streaks[host] = 0
+            self._throttles[host] = self._throttles.get(host, 0) + 1
+            self._last_throttle[host] = time.time()
+        rate = self.current_rate(host)
+        new_rate = max(MIN_RATE, rate * self.decrease_factor)
+        self.limiter.set_rate(host, new_rate)
+
+        wait = parse_retry_after(retry_after)
+        if wait is None:
+            wait = max(DEFAULT_RETRY_AFTER, 1.0 / new_rate)
+        wait = min(wait, MAX_RETRY_AFTER)
+        self.limiter.hold(host, wait)
+        logger.warning(f"{host}: throttled (Retry-After={retry_after!r}), rate {rate:.3f} -> {new_rate:.3f} req/s, holding {wait:.1f}s")
+        return wait
+
+    def stats(self) -> Dict[str, Dict]:
+        """Current rate and throttle counts for every host seen by this process"""
+        with self._lock:
+            hosts = set(self._streaks) | set(self._throttles)
+            throttles = dict(self._throttles)
+            last = dict(self._last_throttle)
+        return {
+            host: {
+                'rate': self.current_rate(host),
+                'throttled': throttles.get(host, 0),
+                'last_throttled_at': last.get(host),
+            }
+            for host in sorted(hosts)
+        }
+
+
+_shared_controller: Optional[AdaptiveRateController] = None
+
+
+def get_rate_controller() -> AdaptiveRateController:
+    """Process-wide controller bound to the shared limiter"""
+    global _shared_controller
+    if _shared_controller is None:
+        _shared_controller = AdaptiveRateController()
+    return _shared_controller
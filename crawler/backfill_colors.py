@@ -5,6 +5,7 @@ Primary source: GSMArena (Colors field). Fallback: ZOL (Chinese "颜色/配色")
 Dry-run supported.
 """
 
+import asyncio
 import os
 import re
 import sys
@@ -12,9 +13,15 @@ import time
 import logging
 from typing import Optional, Dict, List
 
-import psycopg2
+from db_pool import pooled_connect
 import requests
-from bs4 import BeautifulSoup
+
+from crawl_jobs import get_job_ledger
+from fetch_engine import FetchEngine
+from gsmarena_parser import PhoneSpecRecord, get_spec_store
+from model_matcher import best_match
+from phone_index import get_phone_index, indexed_search, search_candidates
+from response_cache import CachedSession
 
 
 logging.basicConfig(
@@ -34,36 +41,39 @@ DB_CONFIG = {
     'user': 'postgres'
 }
 
+GSMARENA_BASE = 'https://www.gsmarena.com'
+GSMARENA_SEARCH_URL = f'{GSMARENA_BASE}/results.php3'
+
 
 class ColorBackfiller:
     def __init__(self):
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9',
         })
-        self.base_delay_seconds = 6.0  # base polite delay between requests
         self.max_retries = 5
+        self.spec_records = get_spec_store()
+        self.phone_index = get_phone_index()
+        self.jobs = get_job_ledger('backfill_colors')
 
     def request_with_backoff(self, method: str, url: str, **kwargs):
         import random
-        delay = 30.0  # start higher for rate limits
+        timeout = kwargs.pop('timeout', 25)
+        delay = 30.0  # network errors only; throttling is paced by the rate controller
         last_exc = None
         for attempt in range(1, self.max_retries + 1):
             try:
-                resp = self.session.request(method, url, timeout=kwargs.pop('timeout', 25), **kwargs)
+                resp = self.session.request(method, url, timeout=timeout, **kwargs)
                 if resp.status_code == 429:
-                    jitter = random.uniform(-2.0, 2.0)
-                    sleep_s = max(5.0, delay + jitter)
-                    logger.warning(f"429 Too Many Requests for {url} (attempt {attempt}); sleeping {sleep_s:.1f}s")
-                    time.sleep(sleep_s)
-                    delay = min(180.0, delay * 2)
+                    # The session already cut the host rate and holds its bucket
+                    # for Retry-After; the next request waits for a token
+                    rate = self.session.rate_controller.current_rate(url)
+                    logger.warning(f"429 Too Many Requests for {url} (attempt {attempt}); host rate now {rate:.3f} req/s")
+                    last_exc = requests.exceptions.HTTPError(f"429 Too Many Requests for {url}", response=resp)
                     continue
                 resp.raise_for_status()
-                # Small polite delay between successful requests
-                polite = max(3.0, self.base_delay_seconds + random.uniform(-2.0, 2.0))
-                time.sleep(polite)
                 return resp
             except requests.exceptions.RequestException as e:
                 last_exc = e
@@ -96,76 +106,67 @@ class ColorBackfiller:
         if limit:
             query += f"\nLIMIT {int(limit)}"
 
-        with psycopg2.connect(**DB_CONFIG) as conn:
+        with pooled_connect(**DB_CONFIG) as conn:
             with conn.cursor() as cur:
                 cur.execute(query, params)
                 rows = cur.fetchall()
                 return [ {'id': r[0], 'brand': r[1], 'model': r[2]} for r in rows ]
 
-    def search_gsmarena(self, brand: str, model: str) -> Optional[str]:
-        base = 'https://www.gsmarena.com'
-        search_url = f'{base}/results.php3'
+    def search_params(self, brand: str, model: str) -> Dict[str, str]:
         # Normalize query: avoid duplicate brand words, keep key tokens
         query = f"{brand} {model}".strip()
-        params = {'sQuickSearch': 'yes', 'sName': query}
+        return {'sQuickSearch': 'yes', 'sName': query}
+
+    @indexed_search()
+    def search_gsmarena(self, brand: str, model: str) -> Optional[str]:
         try:
-            r = self.request_with_backoff('GET', search_url, params=params)
-            soup = BeautifulSoup(r.content, 'html.parser')
-            for a in soup.find_all('a', href=True):
-                href = a.get('href')
-                text = a.get_text(strip=True).lower()
-                if not href or not href.endswith('.php'):
-                    continue
-                # Heuristic: must contain brand and at least one digit from model if exists
-                brand_ok = brand.lower() in text
-                digits = re.findall(r'\d+', model)
-                digit_ok = True if not digits else any(d in text for d in digits)
-                if brand_ok and digit_ok:
-                    return f'{base}/{href}'
+            r = self.request_with_backoff('GET', GSMARENA_SEARCH_URL, params=self.search_params(brand, model))
+            return self.parse_search_results(r.content, brand, model)
         except Exception as e:
             logger.warning(f"GSMArena search failed for {brand} {model}: {e}")
         return None
 
+    def parse_search_results(self, html, brand: str, model: str) -> Optional[str]:
+        self.phone_index.index_search_page(html)
+        match = best_match(brand, model, search_candidates(html, GSMARENA_BASE))
+        if match:
+            logger.info(f"GSMArena match: {match.name} -> {match.url} (confidence {match.confidence:.2f})")
+            return match.url
+        return None
+
     def extract_colors_gsmarena(self, url: str) -> Optional[str]:
         try:
-            r = self.request_with_backoff('GET', url)
-            soup = BeautifulSoup(r.content, 'html.parser')
-
-            # Preferred: data-spec="colors"
-            colors_elem = soup.find(attrs={'data-spec': 'colors'})
-            if colors_elem:
-                text = colors_elem.get_text(separator=' ', strip=True)
-                if text:
-                    return text
-
-            # Fallback: rows labeled 'Colors'
-            for row in soup.find_all('tr'):
-                header = row.find('th') or row.find('td')
-                if not header:
-                    continue
-                key = header.get_text(separator=' ', strip=True)
-                if key and 'colors' in key.lower():
-                    # Value often in td with class 'nfo'
-                    nfos = row.find_all('td')
-                    if nfos:
-                        val = nfos[-1].get_text(separator=' ', strip=True)
-                        if val:
-                            return val
-
-            # Last resort: any element whose text starts with 'Colors'
-            for elem in soup.find_all(text=True):
-                s = elem.strip()
-                if s.lower().startswith('colors'):
-                    # try sibling text
-                    parent = elem.parent
-                    if parent and parent.next_sibling:
-                        val = parent.next_sibling.get_text(separator=' ', strip=True)
-                        if val:
-                            return val
+            record = self.spec_records.load(url)
+            if record is None:
+                r = self.request_with_backoff('GET', url)
+                record = self.spec_records.parse_and_save(r.content, url)
+            return self.colors_from_record(record)
         except Exception as e:
             logger.warning(f"GSMArena extract failed for {url}: {e}")
         return None
 
+    def colors_from_record(self, record: PhoneSpecRecord) -> Optional[str]:
+        # Preferred: data-spec="colors"
+        text = record.spec('colors')
+        if text:
+            return text
+
+        # Fallback: rows labeled 'Colors'
+        for cells in record.rows:
+            key = cells[0]
+            if key and 'colors' in key.lower() and len(cells) > 1:
+                # Value is the last cell of the row
+                val = cells[-1]
+                if val:
+                    return val
+
+        # Last resort: the text line following one that starts with 'Colors'
+        lines = [line.strip() for line in record.text.splitlines() if line.strip()]
+        for idx, line in enumerate(lines[:-1]):
+            if line.lower().startswith('colors'):
+                return lines[idx + 1]
+        return None
+
     def extract_colors_zol(self, brand: str, model: str) -> Optional[str]:
         # Minimal fallback using site search is complex; skip unless needed
         return None
@@ -191,7 +192,7 @@ class ColorBackfiller:
             logger.info(f"[DRY-RUN] Would update Id={phone_id} Colors='{colors}'")
             return True
         try:
-            with psycopg2.connect(**DB_CONFIG) as conn:
+            with pooled_connect(**DB_CONFIG) as conn:
                 with conn.cursor() as cur:
                     cur.execute('UPDATE "Phones" SET "Colors" = %s WHERE "Id" = %s', (colors, phone_id))
                     conn.commit()
@@ -200,31 +201,52 @@ class ColorBackfiller:
             logger.error(f"DB update failed for {phone_id}: {e}")
             return False
 
-    def backfill(self, limit: Optional[int] = None, dry_run: bool = True, brand_like: Optional[str] = None, model_like: Optional[str] = None):
-        targets = self.get_targets(limit=limit, brand_like=brand_like, model_like=model_like)
-        logger.info(f"Found {len(targets)} phones missing colors")
-        success = 0
-        for i, t in enumerate(targets, 1):
-            brand, model, pid = t['brand'], t['model'], t['id']
-            logger.info(f"({i}/{len(targets)}) {brand} {model}")
-            url = self.search_gsmarena(brand, model)
-            if not url:
-                logger.info("No GSMArena match; skipping")
-                continue
-            colors = self.extract_colors_gsmarena(url)
-            if not colors:
-                logger.info("No colors found on GSMArena; skipping")
-                continue
-            norm = self.normalize_colors(colors)
+    async def backfill_phone_async(self, engine: FetchEngine, target: Dict, dry_run: bool) -> bool:
+        brand, model, pid = target['brand'], target['model'], target['id']
+        url = self.jobs.result(pid, 'resolve')
+        if not url:
+            with self.jobs.track(pid, 'resolve'):
+                url = self.phone_index.lookup(brand, model)
+                if not url:
+                    search_html = await engine.fetch_text(GSMARENA_SEARCH_URL, params=self.search_params(brand, model))
+                    url = self.parse_search_results(search_html, brand, model)
+                    if not url:
+                        self.jobs.fail(pid, 'resolve', 'No GSMArena match')
+                        logger.info(f"{brand} {model}: No GSMArena match; skipping")
+                        return False
+                    self.phone_index.record(brand, model, url)
+                self.jobs.succeed(pid, 'resolve', url)
+        with self.jobs.track(pid, 'colors'):
+            colors = self.colors_from_record(await self.spec_records.get_async(engine, url))
+            norm = self.normalize_colors(colors) if colors else None
             if not norm:
-                logger.info("Colors normalized to empty; skipping")
-                continue
-            if self.update_colors(pid, norm, dry_run=dry_run):
-                success += 1
-            # Additional spacing between items
-            import random
-            time.sleep(max(3.0, self.base_delay_seconds + random.uniform(-2.0, 2.0)))
+                self.jobs.fail(pid, 'colors', 'No colors found on GSMArena')
+                logger.info(f"{brand} {model}: No colors found on GSMArena; skipping")
+                return False
+            if not await asyncio.to_thread(self.update_colors, pid, norm, dry_run):
+                self.jobs.fail(pid, 'colors', 'Database update failed')
+                return False
+            if dry_run:
+                # A dry run must not count as done, or --apply would skip the phone
+                self.jobs.forget(pid, 'colors')
+        return True
+
+    async def backfill_async(self, limit: Optional[int] = None, dry_run: bool = True, brand_like: Optional[str] = None, model_like: Optional[str] = None):
+        # Phones that keep failing are left out, so a limited batch always makes progress
+        targets = self.jobs.runnable(self.get_targets(brand_like=brand_like, model_like=model_like),
+                                     'colors', stages=('resolve', 'colors'))
+        if limit:
+            targets = targets[:limit]
+        logger.info(f"Found {len(targets)} phones missing colors")
+        # Politeness between requests is enforced per host by the fetch engine
+        async with FetchEngine(headers=self.session.headers) as engine:
+            results = await engine.map(lambda t: self.backfill_phone_async(engine, t, dry_run), targets)
+        success = sum(1 for r in results if r is True)
         logger.info(f"Completed. Updated={success} / {len(targets)}")
+        return success
+
+    def backfill(self, limit: Optional[int] = None, dry_run: bool = True, brand_like: Optional[str] = None, model_like: Optional[str] = None):
+        return asyncio.run(self.backfill_async(limit=limit, dry_run=dry_run, brand_like=brand_like, model_like=model_like))
 
 
 def main():
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Batched "Phones" writer
+Collects per-phone field changes and writes them in bulk: each batch is
+loaded into a temp table with execute_values and applied with a single
+UPDATE ... FROM, all in one transaction. Rows are matched on "Id" by
+default, or on any other key columns such as ("Brand", "Model").
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Sequence, Tuple
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from db_pool import pooled_connect
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+STAGING_TABLE = '_phone_batch_update'
+
+
+class PhoneBatchWriter:
+    """Buffers UPDATEs to a table and flushes them a batch at a time"""
+
+    def __init__(self, db_config: Dict, key_columns: Sequence[str] = ('Id',),
+                 batch_size: int = DEFAULT_BATCH_SIZE, table: str = 'Phones'):
+        self.db_config = db_config
+        self.key_columns = tuple(key_columns)
+        self.batch_size = batch_size
+        self.table = table
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[Tuple, Dict[str, Any]] = {}
+        self.rows_written = 0
+        self.batches = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def update(self, key, fields: Dict[str, Any]):
+        """Queue column -> value changes for one row; later values for the same column win"""
+        if not fields:
+            return
+        key = key if isinstance(key, tuple) else (key,)
+        if len(key) != len(self.key_columns):
+            raise ValueError(f"Expected key {self.key_columns}, got {key!r}")
+        with self._lock:
+            self._pending.setdefault(key, {}).update(fields)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> List[Tuple]:
+        """Write everything queued in one transaction; returns the keys of the rows that matched"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return []
+
+            # Rows changing the same set of columns share one staging load and UPDATE
+            groups: Dict[Tuple[str, ...], List[Tuple]] = {}
+            for key, fields in pending.items():
+                columns = tuple(sorted(fields))
+                groups.setdefault(columns, []).append(key + tuple(fields[c] for c in columns))
+
+            try:
+                updated = []
+                with pooled_connect(**self.db_config) as conn:
+                    with conn.cursor() as cur:
+                        for columns, rows in groups.items():
+                            updated.extend(self._apply(cur, columns, rows))
+            except Exception:
+                # Keep the batch so a later flush can retry it; newer changes take precedence
+                with self._lock:
+                    for key, fields in pending.items():
+                        self._pending[key] = {**fields, **self._pending.get(key, {})}
+                raise
+
+            self.rows_written += len(updated)
+            self.batches += 1
+            logger.info(f"Flushed {len(pending)} queued updates to \"{self.table}\": {len(updated)} rows matched")
+            return updated
+
+    def _apply(self, cur, columns: Tuple[str, ...], rows: List[Tuple]) -> List[Tuple]:
+        all_columns = self.key_columns + columns
+        column_list = sql.SQL(', ').join(map(sql.Identifier, all_columns))
+        staging = sql.Identifier(STAGING_TABLE)
+        table = sql.Identifier(self.table)
+
+        cur.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(staging))
+        # Same column types as the target table, so values are cast exactly as a direct UPDATE would
+        cur.execute(sql.SQL('CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA')
+                    .format(staging, column_list, table))
+        execute_values(cur, sql.SQL('INSERT INTO {} ({}) VALUES %s').format(staging, column_list).as_string(cur),
+                       rows, page_size=1000)
+
+        cur.execute(sql.SQL('UPDATE {table} AS t SET {assignments} FROM {staging} AS s WHERE {match} RETURNING {keys}').format(
+            table=table,
+            staging=staging,
+            assignments=sql.SQL(', ').join(
+                sql.SQL('{} = s.{}').format(sql.Identifier(c), sql.Identifier(c)) for c in columns),
+            match=sql.SQL(' AND ').join(
+                sql.SQL('t.{} = s.{}').format(sql.Identifier(c), sql.Identifier(c)) for c in self.key_columns),
+            keys=sql.SQL(', ').join(sql.SQL('t.{}').format(sql.Identifier(c)) for c in self.key_columns),
+        ))
+        return [tuple(row) for row in cur.fetchall()]
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Parsing benchmark
+Times the old BeautifulSoup('html.parser') + find_all() extraction against a
+SoupStrainer-restricted parse and the lxml helpers in html_parsing, per page.
+Defaults to the saved ZOL fixtures; pass more files, or --cache N to replay
+pages from the HTTP response cache.
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+import zlib
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from html_parsing import links, parse_html, table_rows
+from response_cache import DEFAULT_DB_PATH as CACHE_DB_PATH
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURES = [
+    os.path.join(SCRIPT_DIR, 'zol_page_debug.html'),
+    os.path.join(SCRIPT_DIR, 'zol_response.html'),
+]
+
+
+def extract_soup(content):
+    """What the crawlers did before: full html.parser tree, then find_all"""
+    soup = BeautifulSoup(content, 'html.parser')
+    found = [(a.get('href'), a.get_text(strip=True)) for a in soup.find_all('a', href=True)]
+    rows = [[[c.get_text(strip=True) for c in row.find_all(['td', 'th'])] for row in table.find_all('tr')]
+            for table in soup.find_all('table')]
+    return found, rows
+
+
+def extract_strainer(content):
+    """html.parser, but only <a> and <table> subtrees are built"""
+    soup = BeautifulSoup(content, 'html.parser', parse_only=SoupStrainer(['a', 'table']))
+    found = [(a.get('href'), a.get_text(strip=True)) for a in soup.find_all('a', href=True)]
+    rows = [[[c.get_text(strip=True) for c in row.find_all(['td', 'th'])] for row in table.find_all('tr')]
+            for table in soup.find_all('table')]
+    return found, rows
+
+
+def extract_lxml(content):
+    """lxml tree with XPath lookups via html_parsing"""
+    doc = parse_html(content)
+    return links(doc), table_rows(doc)
+
+
+STRATEGIES = [
+    ('bs4 html.parser', extract_soup),
+    ('bs4 SoupStrainer', extract_strainer),
+    ('lxml + XPath', extract_lxml),
+]
+
+
+def load_cached_pages(limit):
+    """Up to `limit` HTML bodies from the response cache"""
+    if not os.path.exists(CACHE_DB_PATH):
+        return []
+    conn = sqlite3.connect(CACHE_DB_PATH)
+    try:
+        rows = conn.execute('SELECT url, body FROM responses LIMIT ?', (limit,)).fetchall()
+    finally:
+        conn.close()
+    return [(url, zlib.decompress(body)) for url, body in rows]
+
+
+def time_per_page(func, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(content)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(pages, repeat):
+    totals = {name: 0.0 for name, _ in STRATEGIES}
+    for label, content in pages:
+        print(f"\n{label} ({len(content) / 1024:.1f} KB)")
+        baseline_links = len(extract_soup(content)[0])
+        baseline_ms = None
+        for name, func in STRATEGIES:
+            ms = time_per_page(func, content, repeat)
+            totals[name] += ms
+            baseline_ms = baseline_ms or ms
+            print(f"  {name:<18} {ms:8.2f} ms/page  x{baseline_ms / ms:5.1f}  "
+                  f"links={len(func(content)[0])}/{baseline_links}")
+
+    if len(pages) > 1:
+        print(f"\nTotal over {len(pages)} pages")
+        baseline = totals[STRATEGIES[0][0]]
+        for name, _ in STRATEGIES:
+            print(f"  {name:<18} {totals[name]:8.2f} ms  x{baseline / totals[name]:5.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTML parsing strategies')
+    parser.add_argument('files', nargs='*', help='HTML files to parse (default: saved ZOL fixtures)')
+    parser.add_argument('--cache', type=int, default=0, help='also replay N pages from the response cache')
+    parser.add_argument('--repeat', type=int, default=20, help='parses per page per strategy')
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.files or DEFAULT_FIXTURES:
+        with open(path, 'rb') as f:
+            pages.append((os.path.basename(path), f.read()))
+    pages.extend(load_cached_pages(args.cache))
+    run(pages, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
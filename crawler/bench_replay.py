@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+"""
+Offline replay benchmark
+Serves recorded pages from a local stand-in for GSMArena and ZOL and runs the
+crawlers end to end against it, so throughput changes can be measured without
+touching the real sites. Pages come from a corpus captured from the HTTP
+response cache (`capture`) or generated (`fixtures`: a small search results
+page and spec page per flagship phone, for both sites, in each site's
+charset), with the saved ZOL pages as fallbacks for ZOL search/detail URLs;
+image URLs get real JPEGs from images/phones. The server can add latency,
+inject 429s and cap bandwidth per response. `run` refuses to start without
+a corpus, since the fallbacks alone resolve no phone.
+
+Every run uses a throwaway state directory (rate limits, spec records, phone
+index, job ledger, downloaded images), archives no pages, writes nothing to
+the database and reports phones/sec, requests/phone and p50/p99 phone and
+request latency.
+
+    python bench_replay.py capture       # or: python bench_replay.py fixtures
+    python bench_replay.py run --phones 40 --latency 0.2 --throttle 0.02 --runs 2
+"""
+
+import argparse
+import asyncio
+import html
+import json
+import logging
+import math
+import os
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote, urlsplit
+
+from aiohttp import web
+from requests.adapters import HTTPAdapter
+
+from adaptive_backoff import RATE_CEILINGS, AdaptiveRateController
+from crawl_jobs import JobLedger
+from crawl_scheduler import CrawlScheduler
+from fetch_engine import FetchEngine
+from gsmarena_parser import SpecRecordStore
+from page_fingerprint import FingerprintStore
+from image_store import PHONES_DIR, hash_file
+from phone_index import PhoneIndex
+from rate_limiter import DEFAULT_RATE_LIMIT, RATE_LIMITS, LimitedSession, TokenBucketLimiter
+from response_cache import DEFAULT_DB_PATH as CACHE_DB_PATH
+from response_cache import CachedSession, ResponseCache
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(SCRIPT_DIR, 'bench_corpus.sqlite')
+DEFAULT_PHONES = os.path.join(SCRIPT_DIR, 'flagship_phones_2020_2024.json')
+CAPTURE_HOSTS = ('www.gsmarena.com', 'search.zol.com.cn', 'detail.zol.com.cn')
+
+# (URL pattern, saved page) served when the corpus has no exact match
+FIXTURES = [
+    (re.compile(r'^https?://search\.zol\.com\.cn/'), 'zol_response.html'),
+    (re.compile(r'^https?://detail\.zol\.com\.cn/'), 'zol_page_debug.html'),
+]
+META_CHARSET = re.compile(r'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+IMAGE_URL = re.compile(r'\.(jpe?g|png|webp|gif)(\?|$)', re.IGNORECASE)
+CHUNK_SIZE = 16 * 1024
+
+# Crawlers never reach the database during a benchmark; the config only satisfies constructors
+OFFLINE_DB_CONFIG = {'host': 'localhost', 'database': 'mobilephone_db', 'user': 'postgres'}
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+class ReplayServer:
+    """Local HTTP server answering for any host from the corpus, fixtures and sample images.
+    Crawlers reach it through rewrite(): https://host/path -> http://127.0.0.1:port/https/host/path"""
+
+    def __init__(self, corpus_path: Optional[str] = DEFAULT_CORPUS, latency: float = 0.0, jitter: float = 0.0,
+                 throttle: float = 0.0, retry_after: float = 1.0, bandwidth: float = 0.0, seed: int = 0,
+                 port: int = 0):
+        self.corpus = ResponseCache(corpus_path) if corpus_path and os.path.exists(corpus_path) else None
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.bandwidth = bandwidth          # bytes per second per response, 0 = unlimited
+        self.random = random.Random(seed)
+        self.port = port
+        self.fixtures = [(pattern, *self._read_fixture(name)) for pattern, name in FIXTURES
+                         if os.path.exists(os.path.join(SCRIPT_DIR, name))]
+        self.images = sorted(os.path.join(PHONES_DIR, name) for name in os.listdir(PHONES_DIR)
+                             if name.lower().endswith(('.jpg', '.jpeg')))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self.reset_stats()
+
+    @staticmethod
+    def _read_fixture(name: str) -> Tuple[bytes, str]:
+        """(body, content type) of a saved page. The pages were saved as UTF-8 text; they are
+        sent in the charset their <meta> declares (GBK for ZOL search), as the site does."""
+        with open(os.path.join(SCRIPT_DIR, name), encoding='utf-8') as f:
+            text = f.read()
+        match = META_CHARSET.search(text)
+        charset = match.group(1).lower() if match else 'utf-8'
+        return text.encode(charset, errors='xmlcharrefreplace'), f"text/html; charset={charset}"
+
+    def reset_stats(self):
+        self.requests = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        self.missing: Dict[str, int] = {}
+        self.latencies: List[float] = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def rewrite(self, url: str) -> str:
+        parts = urlsplit(url)
+        query = f"?{parts.query}" if parts.query else ''
+        return f"{self.base_url}/{parts.scheme}/{parts.netloc}{parts.path or '/'}{query}"
+
+    def lookup(self, url: str) -> Tuple[int, str, bytes]:
+        """(status, content type, body) for an original URL"""
+        entry = self.corpus.get(url) if self.corpus else None
+        if entry is not None:
+            content_type = next((v for k, v in entry.headers.items() if k.lower() == 'content-type'), 'text/html')
+            return entry.status, content_type, entry.body
+        for pattern, body, content_type in self.fixtures:
+            if pattern.search(url):
+                return 200, content_type, body
+        if IMAGE_URL.search(url) and self.images:
+            with open(self.images[zlib.crc32(url.encode()) % len(self.images)], 'rb') as f:
+                return 200, 'image/jpeg', f.read()
+        self.missing[url] = self.missing.get(url, 0) + 1
+        return 404, 'text/html', b'<html><body>Not in replay corpus</body></html>'
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        started = time.monotonic()
+        self.requests += 1
+        scheme, _, rest = request.raw_path.lstrip('/').partition('/')
+        url = f"{scheme}://{rest}"
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.random.random() < self.throttle:
+            self.throttled += 1
+            self.latencies.append(time.monotonic() - started)
+            return web.Response(status=429, headers={'Retry-After': f"{self.retry_after:g}"})
+
+        status, content_type, body = await asyncio.to_thread(self.lookup, url)
+        response = web.StreamResponse(status=status, headers={'Content-Type': content_type})
+        response.content_length = len(body)
+        await response.prepare(request)
+        for offset in range(0, len(body), CHUNK_SIZE):
+            chunk = body[offset:offset + CHUNK_SIZE]
+            if self.bandwidth:
+                await asyncio.sleep(len(chunk) / self.bandwidth)
+            await response.write(chunk)
+        await response.write_eof()
+        self.bytes_sent += len(body)
+        self.latencies.append(time.monotonic() - started)
+        return response
+
+    def start(self) -> 'ReplayServer':
+        """Serve from a background thread; returns once the port is bound"""
+        ready = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            app = web.Application()
+            app.router.add_route('*', '/{tail:.*}', self.handle)
+            runner = web.AppRunner(app, access_log=None)
+            self._loop.run_until_complete(runner.setup())
+            self._loop.run_until_complete(web.TCPSite(runner, '127.0.0.1', self.port).start())
+            self.port = runner.addresses[0][1]
+            ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(runner.cleanup())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve, name='replay-server', daemon=True)
+        self._thread.start()
+        ready.wait()
+        logger.info(f"Replay server on {self.base_url} ({'corpus + ' if self.corpus else ''}"
+                    f"{len(self.fixtures)} fixtures, {len(self.images)} images)")
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+
+class ReplayAdapter(HTTPAdapter):
+    """requests transport adapter that sends every request to the replay server"""
+
+    def __init__(self, server: ReplayServer):
+        super().__init__()
+        self.server = server
+
+    def send(self, request, **kwargs):
+        request.url = self.server.rewrite(request.url)
+        return super().send(request, **kwargs)
+
+
+class RecordingWriter:
+    """Stands in for PhoneBatchWriter: keeps the queued updates instead of writing them"""
+
+    def __init__(self):
+        self.updates: Dict = {}
+
+    def update(self, key, fields: Dict):
+        self.updates.setdefault(key if isinstance(key, tuple) else (key,), {}).update(fields)
+
+    def flush(self) -> List[Tuple]:
+        return list(self.updates)
+
+
+def bench_limits(state_dir: str, rate_scale: float) -> Tuple[TokenBucketLimiter, AdaptiveRateController]:
+    """A private limiter/controller pair with every host's rate multiplied by rate_scale
+    (1 reproduces production pacing)"""
+    limits = {host: (rate * rate_scale, capacity) for host, (rate, capacity) in RATE_LIMITS.items()}
+    limiter = TokenBucketLimiter(os.path.join(state_dir, 'rate_limits.sqlite'), limits,
+                                 fallback_limit=(DEFAULT_RATE_LIMIT[0] * rate_scale, DEFAULT_RATE_LIMIT[1]))
+    controller = AdaptiveRateController(limiter, ceilings={host: ceiling * rate_scale
+                                                          for host, ceiling in RATE_CEILINGS.items()})
+    return limiter, controller
+
+
+def load_phones(path: str = DEFAULT_PHONES, limit: Optional[int] = None) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        phones = json.load(f)
+    return [{'id': i, 'brand': p['brand'], 'model': p['model'], 'year': p.get('year')}
+            for i, p in enumerate(phones[:limit] if limit else phones, 1)]
+
+
+def summarize(name: str, run: int, server: ReplayServer, phones: int, ok: int, elapsed: float,
+              phone_latencies: List[float]) -> Dict:
+    return {
+        'crawler': name,
+        'run': run,
+        'phones': phones,
+        'ok': ok,
+        'elapsed': elapsed,
+        # Only phones that made it through count; failures are cheap and would flatter the rates
+        'phones_per_sec': ok / elapsed if elapsed else 0.0,
+        'requests': server.requests,
+        'requests_per_phone': server.requests / ok if ok else 0.0,
+        'throttled': server.throttled,
+        'missing': len(server.missing),
+        'mb_sent': server.bytes_sent / 1e6,
+        'phone_p50': percentile(phone_latencies, 50),
+        'phone_p99': percentile(phone_latencies, 99),
+        'request_p50': percentile(server.latencies, 50),
+        'request_p99': percentile(server.latencies, 99),
+    }
+
+
+async def bench_gsmarena(server: ReplayServer, phones: List[Dict], state_dir: str, rate_scale: float,
+                         use_cache: bool) -> Tuple[int, List[float]]:
+    """GSMArenaFlagshipCrawler's resolve -> fetch -> parse -> download -> write pipeline"""
+    from gsmarena_flagship_crawler import GSMArenaFlagshipCrawler
+
+    crawler = GSMArenaFlagshipCrawler(OFFLINE_DB_CONFIG)
+    crawler.spec_records = SpecRecordStore(os.path.join(state_dir, 'spec_records.sqlite'), use_archive=False)
+    crawler.phone_index = PhoneIndex(os.path.join(state_dir, 'phone_index.sqlite'))
+    crawler.jobs = JobLedger('bench', os.path.join(state_dir, 'crawl_jobs.sqlite'))
+    crawler.writer = RecordingWriter()
+    crawler.fingerprints = FingerprintStore(os.path.join(state_dir, 'page_fingerprints.sqlite'))
+    crawler.scheduler = CrawlScheduler(crawler.scheduler.source, crawler.scheduler.fields,
+                                       os.path.join(state_dir, 'crawl_schedule.sqlite'))
+    images_dir = os.path.join(state_dir, 'images')
+    os.makedirs(images_dir, exist_ok=True)
+
+    async def download_image(engine, url, filename):
+        # Same transfer and hashing work as the image store, but into the scratch directory
+        path = os.path.join(images_dir, filename)
+        try:
+            await engine.download(url, path)
+            await asyncio.to_thread(hash_file, path)
+            return f"/images/phones/{filename}"
+        except Exception as e:
+            logger.error(f"Failed to download image {url}: {e}")
+            return None
+
+    crawler.download_image_async = download_image
+
+    limiter, controller = bench_limits(state_dir, rate_scale)
+    cache = ResponseCache(os.path.join(state_dir, 'http_cache.sqlite')) if use_cache else None
+    started_at: Dict = {}
+    latencies: List[float] = []
+    async with FetchEngine(headers=crawler.session.headers, limiter=limiter, rate_controller=controller,
+                           cache=cache, use_cache=use_cache, use_archive=False,
+                           url_rewriter=server.rewrite) as engine:
+        pipeline = crawler.build_pipeline(engine)
+        first, last = pipeline.stages[0], pipeline.stages[-1]
+        first_func, last_func = first.func, last.func
+
+        async def timed_first(phone):
+            started_at[phone['id']] = time.monotonic()
+            return await first_func(phone)
+
+        def timed_last(phone):
+            result = last_func(phone)
+            if result is not None:
+                latencies.append(time.monotonic() - started_at[phone['id']])
+            return result
+
+        first.func, last.func = timed_first, timed_last
+        written = await pipeline.run(phones)
+    crawler.finish_writes()
+    pipeline.log_report()
+    return len(written), latencies
+
+
+def bench_zol(server: ReplayServer, phones: List[Dict], state_dir: str, rate_scale: float,
+              use_cache: bool) -> Tuple[int, List[float]]:
+    """ZOLCrawler's search -> details -> images loop, one phone after another as in production"""
+    from zol_flagship_crawler import ZOLCrawler
+
+    crawler = ZOLCrawler(OFFLINE_DB_CONFIG)
+    limiter, controller = bench_limits(state_dir, rate_scale)
+    if use_cache:
+        session = CachedSession(ResponseCache(os.path.join(state_dir, 'http_cache.sqlite')),
+                                use_archive=False, limiter=limiter, rate_controller=controller)
+    else:
+        session = LimitedSession(limiter, controller)
+    session.headers.update(crawler.session.headers)
+    adapter = ReplayAdapter(server)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    crawler.session = session
+    crawler.images_dir = os.path.join(state_dir, 'images')
+    os.makedirs(crawler.images_dir, exist_ok=True)
+    # The undecorated search, so the shared phone index is neither consulted nor updated
+    search = ZOLCrawler.search_phone_on_zol.__wrapped__
+
+    ok, latencies = 0, []
+    for phone in phones:
+        started = time.monotonic()
+        product_url = search(crawler, phone['brand'], phone['model'])
+        details = crawler.extract_phone_details(product_url) if product_url else {}
+        if not details:
+            continue
+        for field in ('image_front', 'image_back', 'image_side'):
+            if details.get(field):
+                crawler.download_image(details[field], f"{phone['id']}_{field.split('_')[1]}.jpg")
+        ok += 1
+        latencies.append(time.monotonic() - started)
+    return ok, latencies
+
+
+CRAWLERS = {
+    'gsmarena': bench_gsmarena,
+    'zol': bench_zol,
+}
+
+
+def run_benchmark(crawlers: Sequence[str], phones: List[Dict], server: ReplayServer, runs: int = 1,
+                  rate_scale: float = 100.0, use_cache: bool = False) -> List[Dict]:
+    """Run each crawler `runs` times; state (cache, index, spec records) carries over between
+    runs of the same crawler, so run 2+ shows the warm-state speed"""
+    results = []
+    for name in crawlers:
+        state_dir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+        try:
+            for run in range(1, runs + 1):
+                server.reset_stats()
+                started = time.monotonic()
+                bench = CRAWLERS[name]
+                if asyncio.iscoroutinefunction(bench):
+                    ok, latencies = asyncio.run(bench(server, phones, state_dir, rate_scale, use_cache))
+                else:
+                    ok, latencies = bench(server, phones, state_dir, rate_scale, use_cache)
+                result = summarize(name, run, server, len(phones), ok, time.monotonic() - started, latencies)
+                results.append(result)
+                for url in list(server.missing)[:5]:
+                    logger.warning(f"Not in replay corpus: {url}")
+        finally:
+            shutil.rmtree(state_dir, ignore_errors=True)
+    return results
+
+
+def capture(corpus_path: str = DEFAULT_CORPUS, source: str = CACHE_DB_PATH,
+            hosts: Sequence[str] = CAPTURE_HOSTS) -> int:
+    """Copy pages of the given hosts from the response cache into the replay corpus"""
+    corpus_path = os.path.abspath(corpus_path)
+    ResponseCache(corpus_path)  # creates the responses table
+    conn = sqlite3.connect(corpus_path)
+    try:
+        conn.execute('ATTACH DATABASE ? AS source', (source,))
+        where = ' OR '.join('key LIKE ?' for _ in hosts)
+        cur = conn.execute(f'INSERT OR REPLACE INTO responses SELECT * FROM source.responses WHERE {where}',
+                           [f"%://{host}/%" for host in hosts])
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+def gsmarena_fixture_pages(crawler, phone: Dict) -> List[Tuple[str, Dict, str, bytes]]:
+    """(url, params, content type, body) of a search results page and spec page for one phone"""
+    slug = re.sub(r'[^a-z0-9]+', '_', f"{phone['brand']} {phone['model']}".lower()).strip('_')
+    product_url = f"{crawler.base_url}/{slug}-{10000 + phone['id']}.php"
+    name = html.escape(phone['model'])
+    search = (f'<html><body><div class="makers"><ul><li><a href="{product_url.rsplit("/", 1)[1]}">'
+              f'<img src="https://fdn2.gsmarena.com/vv/bigpic/{slug}.jpg"><strong><span>'
+              f'{html.escape(phone["brand"])}<br>{name}</span></strong></a></li></ul></div></body></html>')
+    ios = phone['brand'] == 'Apple'
+    rows = [
+        ('Network', 'Technology', 'nettech', 'GSM / HSPA / LTE / 5G'),
+        ('Launch', 'Announced', 'year', f"{phone.get('year') or 2024}, September 10"),
+        ('Body', 'Dimensions', 'dimensions', '160.9 x 77.8 x 8.3 mm'),
+        ('', 'Weight', 'weight', f"{180 + phone['id'] % 60} g"),
+        ('', 'Build', 'build', 'Glass front, glass back, aluminum frame'),
+        ('', 'Protection', 'bodyother', 'IP68 dust/water resistant'),
+        ('Display', 'Size', 'displaysize', f"6.{phone['id'] % 9} inches"),
+        ('Platform', 'OS', 'os', 'iOS 18' if ios else 'Android 14'),
+        ('', 'Chipset', 'chipset', f"Fixture SoC {phone['id']} (3 nm)"),
+        ('Memory', 'Internal', 'internalmemory', '256GB 8GB RAM, 512GB 12GB RAM'),
+        ('Main Camera', 'Triple', 'cam1modules', '48 MP, f/1.8, 24mm (wide)'),
+        ('Battery', 'Type', 'batdescription1', f"Li-Ion {4000 + phone['id'] * 10} mAh"),
+        ('', 'Charging', 'charging', '45W wired'),
+        ('Misc', 'Colors', 'colors', 'Black, White, Blue'),
+    ]
+    # One table per section, its name only in the first row, as on the site
+    tables, open_table = [], False
+    for section, label, key, value in rows:
+        if section:
+            tables.append(f'{"</table>" if open_table else ""}<table><tr><th rowspan="2">{section}</th>')
+            open_table = True
+        else:
+            tables.append('<tr>')
+        tables.append(f'<td class="ttl">{label}</td><td class="nfo" data-spec="{key}">{value}</td></tr>')
+    table = ''.join(tables)
+    spec = (f'<html><body><h1 class="specs-phone-name-title">{html.escape(phone["brand"])} {name}</h1>'
+            f'<div class="specs-photo-main"><a><img src="https://fdn2.gsmarena.com/vv/bigpic/{slug}.jpg"></a></div>'
+            f'<div class="specs-photo-gallery"><img src="https://fdn2.gsmarena.com/vv/pics/{slug}-1.jpg">'
+            f'<img src="https://fdn2.gsmarena.com/vv/pics/{slug}-2.jpg"></div>'
+            f'<div id="specs-list">{table}</table></div></body></html>')
+    html_type = 'text/html; charset=utf-8'
+    return [(crawler.search_url, crawler.search_params(phone['brand'], phone['model']), html_type, search.encode()),
+            (product_url, {}, html_type, spec.encode())]
+
+
+def zol_fixture_pages(crawler, phone: Dict) -> List[Tuple[str, Dict, str, bytes]]:
+    """(url, params, content type, body) of a search results page and detail page for one
+    phone, GBK-encoded like the site"""
+    query = f"{crawler.normalize_brand_for_search(phone['brand'])} {crawler.normalize_model_for_search(phone['model'])}"
+    search_url = f"{crawler.search_url}{quote(query.encode('utf-8'))}.html"
+    product_id = 1400000 + phone['id']
+    detail_url = f"{crawler.base_url}/cell_phone/index{product_id}.shtml"
+    name = html.escape(query)
+    head = '<html><head><meta charset="gbk"></head><body>'
+    search = (f'{head}<ul class="result"><li><a href="//detail.zol.com.cn/cell_phone/index{product_id}.shtml">'
+              f'{name}</a></li></ul></body></html>')
+    rows = [
+        ('CPU型号', f"Fixture SoC {phone['id']}"),
+        ('操作系统', 'iOS 18' if phone['brand'] == 'Apple' else 'Android 14'),
+        ('机身尺寸', '160.9x77.8x8.3mm'),
+        ('机身重量', f"{180 + phone['id'] % 60}g"),
+        ('电池容量', f"{4000 + phone['id'] * 10}mAh"),
+        ('快充', '45W有线快充'),
+        ('防护等级', 'IP68'),
+        ('机身材质', '玻璃后盖，铝合金中框'),
+        ('机身颜色', '黑色，白色，蓝色'),
+        ('网络类型', '5G全网通'),
+        ('主屏尺寸', f"6.{phone['id'] % 9}英寸"),
+        ('机身内存', '256GB'),
+        ('运行内存', '8GB'),
+        ('后置摄像头', '4800万像素'),
+    ]
+    table = ''.join(f'<tr><th>{label}</th><td>{value}</td></tr>' for label, value in rows)
+    image = f"https://2d.zol-img.com.cn/product/{product_id}"
+    detail = (f'{head}<h1>{name}</h1><img id="bigpic" src="{image}_800x600.jpg">'
+              f'<div class="gallery"><img src="{image}_1.jpg"><img src="{image}_2.jpg"></div>'
+              f'<table class="param-table">{table}</table></body></html>')
+    html_type = 'text/html; charset=gbk'
+    return [(search_url, {}, html_type, search.encode('gbk')),
+            (detail_url, {}, html_type, detail.encode('gbk'))]
+
+
+def build_fixtures(corpus_path: str = DEFAULT_CORPUS, phones: Optional[List[Dict]] = None) -> int:
+    """Write generated GSMArena and ZOL pages for the flagship phones into the replay corpus,
+    so the benchmark resolves phones without a captured cache"""
+    from gsmarena_flagship_crawler import GSMArenaFlagshipCrawler
+    from zol_flagship_crawler import ZOLCrawler
+
+    corpus = ResponseCache(os.path.abspath(corpus_path))
+    gsmarena, zol = GSMArenaFlagshipCrawler(OFFLINE_DB_CONFIG), ZOLCrawler(OFFLINE_DB_CONFIG)
+    written = 0
+    for phone in phones or load_phones():
+        for url, params, content_type, body in gsmarena_fixture_pages(gsmarena, phone) + zol_fixture_pages(zol, phone):
+            corpus.store(url, params, 200, {'Content-Type': content_type}, body, ttl=365 * 24 * 3600)
+            written += 1
+    return written
+
+
+def format_result(r: Dict) -> str:
+    return (f"{r['crawler']:>8} run {r['run']}: {r['ok']}/{r['phones']} phones in {r['elapsed']:.1f}s = "
+            f"{r['phones_per_sec']:.2f} phones/s | {r['requests_per_phone']:.1f} requests/phone "
+            f"({r['throttled']} throttled, {r['missing']} missing, {r['mb_sent']:.1f} MB) | "
+            f"phone p50 {r['phone_p50']:.2f}s p99 {r['phone_p99']:.2f}s | "
+            f"request p50 {r['request_p50'] * 1000:.0f}ms p99 {r['request_p99'] * 1000:.0f}ms")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Benchmark crawlers against a local replay of GSMArena/ZOL')
+    sub = parser.add_subparsers(dest='command', required=True)
+    cap = sub.add_parser('capture', help='copy cached pages into the replay corpus')
+    cap.add_argument('--corpus', default=DEFAULT_CORPUS)
+    cap.add_argument('--host', action='append', dest='hosts', help='host to capture (repeatable)')
+    fix = sub.add_parser('fixtures', help='generate search and spec pages for the flagship phones into the corpus')
+    fix.add_argument('--corpus', default=DEFAULT_CORPUS)
+
+    for name in ('run', 'serve'):
+        cmd = sub.add_parser(name, help='benchmark the crawlers' if name == 'run' else 'only run the server')
+        cmd.add_argument('--corpus', default=DEFAULT_CORPUS)
+        cmd.add_argument('--latency', type=float, default=0.15, help='seconds added to every response')
+        cmd.add_argument('--jitter', type=float, default=0.1, help='extra random latency, up to this many seconds')
+        cmd.add_argument('--throttle', type=float, default=0.0, help='share of requests answered with 429')
+        cmd.add_argument('--retry-after', type=float, default=1.0, help='Retry-After sent with injected 429s')
+        cmd.add_argument('--bandwidth', type=float, default=0.0, help='KB/s per response (0 = unlimited)')
+        cmd.add_argument('--seed', type=int, default=0)
+    run = sub.choices['run']
+    run.add_argument('--crawler', nargs='+', choices=sorted(CRAWLERS), default=sorted(CRAWLERS))
+    run.add_argument('--phones', type=int, default=20, help='phones from the flagship list (0 = all)')
+    run.add_argument('--runs', type=int, default=1, help='repeat with warm state')
+    run.add_argument('--rate-scale', type=float, default=100.0,
+                     help='multiply per-host rate limits (1 = production pacing)')
+    run.add_argument('--cache', action='store_true', help='use a (fresh) response cache')
+    run.add_argument('--json', default=None, help='also write results to this file')
+    sub.choices['serve'].add_argument('--port', type=int, default=8800)
+    args = parser.parse_args()
+
+    if args.command == 'capture':
+        print(f"Captured {capture(args.corpus, hosts=args.hosts or CAPTURE_HOSTS)} pages into {args.corpus}")
+        return
+    if args.command == 'fixtures':
+        print(f"Wrote {build_fixtures(args.corpus)} generated pages into {args.corpus}")
+        return
+    if not os.path.exists(args.corpus):
+        print(f"❌ No replay corpus at {args.corpus}: run `capture` (pages from the response cache) "
+              f"or `fixtures` (generated pages) first")
+        sys.exit(2)
+
+    server = ReplayServer(os.path.abspath(args.corpus), args.latency, args.jitter, args.throttle, args.retry_after,
+                          args.bandwidth * 1024, args.seed, port=getattr(args, 'port', 0))
+    server.start()
+    try:
+        if args.command == 'serve':
+            print(f"Serving on {server.base_url}/https/<host>/<path>; Ctrl-C to stop")
+            threading.Event().wait()
+        results = run_benchmark(args.crawler, load_phones(limit=args.phones or None), server,
+                                args.runs, args.rate_scale, args.cache)
+    except KeyboardInterrupt:
+        return
+    finally:
+        server.stop()
+
+    print()
+    for result in results:
+        print(format_result(result))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+    failed = sorted({result['crawler'] for result in results if result['ok'] == 0})
+    if failed:
+        print(f"❌ No phone made it through for {', '.join(failed)}: the numbers above only time the failure path")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Spec dispatch micro-benchmark
+Times the old if/elif label chain from GSMArenaFlagshipCrawler against the
+compiled GSMARENA_RULES dispatch over a corpus of spec pages, and checks both
+produce the same fields. The corpus is every record in the spec record store
+plus any saved GSMArena pages passed on the command line; with neither, a
+synthetic corpus of typical GSMArena labels is used.
+"""
+
+import argparse
+import json
+import random
+import re
+import sqlite3
+import time
+import zlib
+
+from gsmarena_parser import DEFAULT_DB_PATH as SPEC_DB_PATH, parse_spec_page
+from spec_fields import GSMARENA_RULES
+
+# Labels and values as they appear in GSMArena spec tables
+SAMPLE_ROWS = [
+    ('Network', 'Technology', 'GSM / HSPA / LTE / 5G'), ('2G bands', 'GSM 850 / 900 / 1800 / 1900'),
+    ('3G bands', 'HSDPA 850 / 900 / 1700(AWS) / 1900 / 2100'), ('4G bands', '1, 2, 3, 4, 5, 7, 8, 12, 13'),
+    ('5G bands', '1, 3, 5, 7, 8, 20, 28, 38, 40, 41, 77, 78 SA/NSA'), ('Speed', 'HSPA, LTE-A, 5G'),
+    ('Launch', 'Announced', '2023, February 01'), ('Status', 'Available. Released 2023, February 17'),
+    ('Body', 'Dimensions', '146.3 x 70.9 x 7.6 mm'), ('Weight', '168 g (5.93 oz)'),
+    ('Build', 'Glass front (Gorilla Glass Victus 2), aluminum frame'), ('SIM', 'Nano-SIM and eSIM'),
+    ('', 'IP68 dust/water resistant (up to 1.5m for 30 min)'),
+    ('Display', 'Type', 'Dynamic AMOLED 2X, 120Hz, HDR10+'), ('Size', '6.1 inches, 90.1 cm2'),
+    ('Resolution', '1080 x 2340 pixels'), ('Protection', 'Corning Gorilla Glass Victus 2'),
+    ('Platform', 'OS', 'Android 13, One UI 5.1'), ('Chipset', 'Qualcomm SM8550-AC Snapdragon 8 Gen 2'),
+    ('CPU', 'Octa-core (1x3.36 GHz Cortex-X3)'), ('GPU', 'Adreno 740'),
+    ('Memory', 'Card slot', 'No'), ('Internal', '128GB 8GB RAM, 256GB 8GB RAM'),
+    ('Main Camera', 'Triple', '50 MP, f/1.8, 24mm (wide)'), ('Features', 'LED flash, auto-HDR, panorama'),
+    ('Video', '8K@24/30fps, 4K@30/60fps'), ('Selfie camera', 'Single', '12 MP, f/2.2'),
+    ('Sound', 'Loudspeaker', 'Yes, with stereo speakers'), ('3.5mm jack', 'No'),
+    ('Comms', 'WLAN', 'Wi-Fi 802.11 a/b/g/n/ac/6e'), ('Bluetooth', '5.3, A2DP, LE'),
+    ('Positioning', 'GPS, GLONASS, BDS, GALILEO'), ('NFC', 'Yes'), ('USB', 'USB Type-C 3.2'),
+    ('Features', 'Sensors', 'Fingerprint (under display, ultrasonic)'),
+    ('Battery', 'Type', 'Li-Ion 3900 mAh, non-removable'), ('Charging', '25W wired, PD3.0'),
+    ('Misc', 'Colors', 'Phantom Black, Cream, Green, Lavender'), ('Models', 'SM-S911B'),
+    ('Price', '$ 599.99 / € 649.00'),
+]
+
+
+def legacy_details(pairs):
+    """The original per-row if/elif chain, kept here as the reference"""
+    details = {}
+    for key, value in pairs:
+        if 'OS' in key or 'operating system' in key.lower():
+            details['os'] = value
+        elif 'Chipset' in key or 'chipset' in key.lower():
+            details['processor'] = value
+        elif 'CPU' in key and 'processor' not in details:
+            details['processor'] = value
+        elif 'Dimensions' in key or 'dimensions' in key.lower():
+            details['dimensions'] = value
+        elif 'Weight' in key or 'weight' in key.lower():
+            weight_match = re.search(r'(\d+(?:\.\d+)?)', value)
+            if weight_match:
+                details['weight'] = float(weight_match.group(1))
+        elif 'Battery' in key or 'battery' in key.lower():
+            details['battery'] = value
+        elif 'Charging' in key or 'charging' in key.lower():
+            details['charging_power'] = value
+        elif 'protection' in key.lower() or 'water' in key.lower():
+            details['water_resistance'] = value
+        elif 'Build' in key or 'build' in key.lower():
+            details['material'] = value
+        elif 'Colors' in key or 'colors' in key.lower():
+            details['colors'] = value
+        elif 'Network' in key or '2G' in key or '3G' in key or '4G' in key or '5G' in key:
+            if 'network_type' not in details:
+                details['network_type'] = value
+        elif 'Display' in key and 'Size' in key:
+            details['screen_size'] = value
+        elif 'Internal' in key or 'internal' in key.lower():
+            if 'storage' not in details:
+                details['storage'] = value
+        elif 'RAM' in key or 'Memory' in key:
+            if 'ram' not in details:
+                details['ram'] = value
+        elif 'Camera' in key and ('Main' in key or 'Primary' in key):
+            details['camera'] = value
+    return details
+
+
+def load_corpus(files, synthetic_pages):
+    """List of pages, each a list of (label, value) pairs"""
+    corpus = []
+    try:
+        conn = sqlite3.connect(f'file:{SPEC_DB_PATH}?mode=ro', uri=True)
+        for (blob,) in conn.execute('SELECT record FROM spec_records'):
+            tables = json.loads(zlib.decompress(blob)).get('tables', [])
+            corpus.append([(c[0], c[1]) for table in tables for c in table if len(c) >= 2])
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+    for path in files:
+        with open(path, 'rb') as f:
+            corpus.append(list(parse_spec_page(f.read(), path).pairs()))
+
+    if not corpus:
+        rng = random.Random(0)
+        for _ in range(synthetic_pages):
+            rows = [row for row in SAMPLE_ROWS if rng.random() > 0.1]
+            corpus.append([(row[0], row[1]) for row in rows])
+    return corpus
+
+
+def time_pass(func, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for pairs in corpus:
+            func(pairs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark spec label dispatch')
+    parser.add_argument('files', nargs='*', help='saved GSMArena product pages')
+    parser.add_argument('--synthetic', type=int, default=2000, help='synthetic pages when no corpus exists')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.files, args.synthetic)
+    rows = sum(len(pairs) for pairs in corpus)
+    mismatches = sum(legacy_details(pairs) != GSMARENA_RULES.apply(pairs) for pairs in corpus)
+    print(f"Corpus: {len(corpus)} pages, {rows} rows; mismatching pages: {mismatches}")
+
+    legacy = time_pass(legacy_details, corpus, args.repeat)
+    compiled = time_pass(GSMARENA_RULES.apply, corpus, args.repeat)
+    total_rows = rows * args.repeat
+    print(f"  if/elif chain      {legacy * 1e9 / total_rows:8.0f} ns/row  {legacy * 1e3 / args.repeat:8.1f} ms/pass")
+    print(f"  compiled dispatch  {compiled * 1e9 / total_rows:8.0f} ns/row  {compiled * 1e3 / args.repeat:8.1f} ms/pass"
+          f"  x{legacy / compiled:.1f}")
+
+
+if __name__ == '__main__':
+    main()
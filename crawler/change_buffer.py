@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Write-behind change buffer for "Phones"
+Loads the current values of the columns a script touches once, compares
+every proposed value against them and queues only the fields that really
+differ. Queued changes are written by a background thread through
+PhoneBatchWriter, so reruns of the fillers no longer rewrite identical
+rows (and create dead tuples / WAL for nothing).
+"""
+
+import logging
+import threading
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+from psycopg2 import sql
+
+from batch_writer import DEFAULT_BATCH_SIZE, PhoneBatchWriter
+from db_pool import pooled_connect
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 2.0    # seconds between background flushes
+
+
+def same_value(current: Any, proposed: Any) -> bool:
+    """Whether writing proposed over current would leave the column unchanged"""
+    if current is None or proposed is None:
+        return current is None and proposed is None
+    numbers = (int, float, Decimal)
+    if isinstance(current, numbers) and isinstance(proposed, numbers):
+        return float(current) == float(proposed)
+    if isinstance(current, numbers) or isinstance(proposed, numbers):
+        try:
+            return float(current) == float(proposed)
+        except (TypeError, ValueError):
+            return False
+    return str(current).strip() == str(proposed).strip()
+
+
+class ChangeBuffer:
+    """Diffs proposed field values against the stored row and writes only the changes"""
+
+    def __init__(self, db_config: Dict, columns: Sequence[str], batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, table: str = 'Phones'):
+        self.db_config = db_config
+        self.columns = tuple(columns)
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # The background thread decides when to flush, so the writer never flushes on its own
+        self.writer = PhoneBatchWriter(db_config, batch_size=float('inf'), table=table)
+        self._lock = threading.Lock()
+        self._current: Optional[Dict[Any, Dict[str, Any]]] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, name='change-buffer', daemon=True)
+        self._thread.start()
+        self.proposed = 0
+        self.changed = 0
+        self.unchanged = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def load(self, ids: Optional[Iterable] = None):
+        """Snapshot the current column values, for all rows or just the given ids"""
+        query = sql.SQL('SELECT "Id", {} FROM {}').format(
+            sql.SQL(', ').join(map(sql.Identifier, self.columns)), sql.Identifier(self.table))
+        params = None
+        if ids is not None:
+            query += sql.SQL(' WHERE "Id" = ANY(%s)')
+            params = (list(ids),)
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                rows = cur.fetchall()
+        with self._lock:
+            if self._current is None:
+                self._current = {}
+            for row in rows:
+                self._current[row[0]] = dict(zip(self.columns, row[1:]))
+        logger.info(f"Loaded current values of {len(rows)} rows for {', '.join(self.columns)}")
+
+    def propose(self, phone_id, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue the fields whose value differs from the stored one; returns just those"""
+        if self._current is None:
+            self.load()
+        with self._lock:
+            current = self._current.setdefault(phone_id, {})
+            dirty = {column: value for column, value in fields.items()
+                     if column not in current or not same_value(current[column], value)}
+            current.update(dirty)
+            self.proposed += len(fields)
+            self.changed += len(dirty)
+            self.unchanged += len(fields) - len(dirty)
+        if dirty:
+            self.writer.update(phone_id, dirty)
+            if len(self.writer) >= self.batch_size:
+                self._wake.set()
+        return dirty
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._flush()
+
+    def _flush(self):
+        try:
+            self.writer.flush()
+        except Exception as e:
+            # The writer keeps the batch; the next round retries it
+            logger.error(f"Background flush failed: {e}")
+
+    def close(self):
+        """Stop the background thread and write whatever is still queued"""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self.writer.flush()
+        logger.info(f"Change buffer: {self.changed} of {self.proposed} proposed fields changed, "
+                    f"{self.unchanged} already up to date")
@@ -6,7 +6,6 @@ Supports GSMArena and ZOL websites
 """
 
 import os
-import re
 import sys
 import time
 import logging
@@ -14,8 +13,14 @@ import json
 import requests
 from typing import Optional, Dict, List, Tuple
 from urllib.parse import urljoin, urlparse
-import psycopg2
+from db_pool import pooled_connect
 from bs4 import BeautifulSoup
+from model_matcher import best_match
+from image_downloads import DownloadJob
+from image_store import store_images
+from perceptual_index import choose_color_images
+from phone_index import indexed_search, search_candidates
+from response_cache import CachedSession
 
 # Get parent directory of script location (project root)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -40,13 +45,12 @@ DB_CONFIG = {
 
 class ColorImagesCrawler:
     def __init__(self):
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9',
         })
-        self.base_delay_seconds = 8.0  # Increase to 8 seconds for safety
         self.max_retries = 5
         
         # 确保图片目录存在
@@ -55,22 +59,20 @@ class ColorImagesCrawler:
     def request_with_backoff(self, method: str, url: str, **kwargs):
         """带退避的请求方法"""
         import random
-        delay = 30.0
+        timeout = kwargs.pop('timeout', 25)
+        delay = 30.0  # network errors only; throttling is paced by the rate controller
         last_exc = None
         for attempt in range(1, self.max_retries + 1):
             try:
-                resp = self.session.request(method, url, timeout=kwargs.pop('timeout', 25), **kwargs)
+                resp = self.session.request(method, url, timeout=timeout, **kwargs)
                 if resp.status_code == 429:
-                    jitter = random.uniform(-2.0, 2.0)
-                    sleep_s = max(5.0, delay + jitter)
-                    logger.warning(f"429 Too Many Requests for {url} (attempt {attempt}); sleeping {sleep_s:.1f}s")
-                    time.sleep(sleep_s)
-                    delay = min(180.0, delay * 2)
+                    # The session already cut the host rate and holds its bucket
+                    # for Retry-After; the next request waits for a token
+                    rate = self.session.rate_controller.current_rate(url)
+                    logger.warning(f"429 Too Many Requests for {url} (attempt {attempt}); host rate now {rate:.3f} req/s")
+                    last_exc = requests.exceptions.HTTPError(f"429 Too Many Requests for {url}", response=resp)
                     continue
                 resp.raise_for_status()
-                # 礼貌延迟
-                polite = max(3.0, self.base_delay_seconds + random.uniform(-2.0, 2.0))
-                time.sleep(polite)
                 return resp
             except requests.exceptions.RequestException as e:
                 last_exc = e
@@ -106,12 +108,13 @@ class ColorImagesCrawler:
         if limit:
             query += f"\nLIMIT {int(limit)}"
 
-        with psycopg2.connect(**DB_CONFIG) as conn:
+        with pooled_connect(**DB_CONFIG) as conn:
             with conn.cursor() as cur:
                 cur.execute(query, params)
                 rows = cur.fetchall()
                 return [{'id': r[0], 'brand': r[1], 'model': r[2], 'colors': r[3]} for r in rows]
 
+    @indexed_search()
     def search_gsmarena(self, brand: str, model: str) -> Optional[str]:
         """在GSMArena搜索手机页面"""
         base = 'https://www.gsmarena.com'
@@ -121,27 +124,15 @@ class ColorImagesCrawler:
         
         try:
             r = self.request_with_backoff('GET', search_url, params=params)
-            soup = BeautifulSoup(r.content, 'html.parser')
-            
-            for a in soup.find_all('a', href=True):
-                href = a.get('href')
-                text = a.get_text(strip=True).lower()
-                if not href or not href.endswith('.php'):
-                    continue
-                
-                # 匹配品牌和型号
-                brand_ok = brand.lower() in text
-                digits = re.findall(r'\d+', model)
-                digit_ok = True if not digits else any(d in text for d in digits)
-                
-                if brand_ok and digit_ok:
-                    return f'{base}/{href}'
+            match = best_match(brand, model, search_candidates(r.content, base))
+            if match:
+                return match.url
         except Exception as e:
             logger.warning(f"GSMArena search failed for {brand} {model}: {e}")
         return None
 
-    def extract_color_images_gsmarena(self, url: str, colors: str) -> Dict[str, str]:
-        """从GSMArena页面提取颜色图片"""
+    def extract_color_images_gsmarena(self, url: str, colors: str) -> Dict[str, List[str]]:
+        """从GSMArena页面提取颜色图片 (color -> 候选图片URL列表)"""
         color_images = {}
         color_list = [c.strip() for c in colors.split(',')]
         
@@ -163,18 +154,21 @@ class ColorImagesCrawler:
                         # 进入图片库页面
                         gallery_url = urljoin(url, href)
                         gallery_images = self.extract_gallery_images(gallery_url, color_list)
-                        color_images.update(gallery_images)
+                        for color, candidates in gallery_images.items():
+                            color_images.setdefault(color, []).extend(
+                                src for src in candidates if src not in color_images.get(color, []))
             
             # 如果没找到图片库，尝试从主页面查找
             if not color_images:
-                color_images = self.extract_main_page_images(soup, color_list, url)
+                color_images = {color: [src] for color, src in
+                                self.extract_main_page_images(soup, color_list, url).items()}
                 
         except Exception as e:
             logger.warning(f"GSMArena color images extraction failed for {url}: {e}")
         
         return color_images
 
-    def extract_gallery_images(self, gallery_url: str, color_list: List[str]) -> Dict[str, str]:
+    def extract_gallery_images(self, gallery_url: str, color_list: List[str]) -> Dict[str, List[str]]:
         """从图片库页面提取颜色图片"""
         color_images = {}
         
@@ -208,40 +202,16 @@ class ColorImagesCrawler:
                         elif src.startswith('/'):
                             src = 'https://www.gsmarena.com' + src
                         
-                        # 如果还没有这个颜色的图片，或者找到更大的图片，则更新
-                        if color not in color_images or self.is_better_image(src, color_images[color]):
-                            color_images[color] = src
+                        # 收集全部候选图片, 下载后用感知哈希挑选
+                        candidates = color_images.setdefault(color, [])
+                        if src not in candidates:
+                            candidates.append(src)
                         
         except Exception as e:
             logger.warning(f"Gallery images extraction failed for {gallery_url}: {e}")
         
         return color_images
 
-    def is_better_image(self, new_src: str, current_src: str) -> bool:
-        """比较两个图片URL，判断新的是否更好"""
-        # 简单的启发式规则：优先选择更大的图片
-        # 通过URL中的尺寸信息判断
-        import re
-        
-        # 提取尺寸信息
-        new_dims = re.findall(r'(\d+)x(\d+)', new_src)
-        current_dims = re.findall(r'(\d+)x(\d+)', current_src)
-        
-        if new_dims and current_dims:
-            new_w, new_h = map(int, new_dims[0])
-            current_w, current_h = map(int, current_dims[0])
-            new_area = new_w * new_h
-            current_area = current_w * current_h
-            return new_area > current_area
-        
-        # 如果没有尺寸信息，优先选择不包含"thumb"或"small"的图片
-        if 'thumb' in new_src.lower() or 'small' in new_src.lower():
-            return False
-        if 'thumb' in current_src.lower() or 'small' in current_src.lower():
-            return True
-        
-        return False
-
     def extract_main_page_images(self, soup: BeautifulSoup, color_list: List[str], base_url: str) -> Dict[str, str]:
         """从主页面提取颜色图片"""
         color_images = {}
@@ -268,32 +238,33 @@ class ColorImagesCrawler:
         
         return color_images
 
-    def download_color_image(self, image_url: str, brand: str, model: str, color: str) -> Optional[str]:
-        """下载颜色图片到本地"""
-        try:
-            # 生成文件名
-            clean_brand = "".join(c for c in brand if c.isalnum() or c in (' ', '-', '_')).strip()
-            clean_model = "".join(c for c in model if c.isalnum() or c in (' ', '-', '_')).strip()
-            clean_color = "".join(c for c in color if c.isalnum() or c in (' ', '-', '_')).strip()
-            
-            # 获取文件扩展名
-            parsed_url = urlparse(image_url)
-            file_ext = os.path.splitext(parsed_url.path)[1] or '.jpg'
-            
-            filename = f"{clean_brand}_{clean_model}_{clean_color}{file_ext}".replace(' ', '_')
-            local_path = os.path.join(IMAGES_DIR, filename)
-            
-            # 下载图片
-            response = self.request_with_backoff('GET', image_url)
-            with open(local_path, 'wb') as f:
-                f.write(response.content)
-            
-            logger.info(f"✅ Downloaded color image: {filename}")
-            return f"images/phones/{filename}"
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to download color image {image_url}: {e}")
-            return None
+    def color_image_filename(self, image_url: str, brand: str, model: str, color: str) -> str:
+        """生成颜色图片的本地文件名"""
+        clean_brand = "".join(c for c in brand if c.isalnum() or c in (' ', '-', '_')).strip()
+        clean_model = "".join(c for c in model if c.isalnum() or c in (' ', '-', '_')).strip()
+        clean_color = "".join(c for c in color if c.isalnum() or c in (' ', '-', '_')).strip()
+        
+        # 获取文件扩展名
+        parsed_url = urlparse(image_url)
+        file_ext = os.path.splitext(parsed_url.path)[1] or '.jpg'
+        
+        return f"{clean_brand}_{clean_model}_{clean_color}{file_ext}".replace(' ', '_')
+
+    def download_color_images(self, color_images: Dict[str, List[str]], brand: str, model: str) -> Dict[str, str]:
+        """并发下载一部手机的全部候选颜色图片, 按感知哈希挑选后返回 color -> 相对路径"""
+        jobs = []
+        for color, urls in color_images.items():
+            filename = self.color_image_filename(urls[0], brand, model, color)
+            stem, ext = os.path.splitext(filename)
+            jobs.extend((color, DownloadJob(url, filename if i == 0 else f"{stem}_{i + 1}{ext}"))
+                        for i, url in enumerate(urls))
+        results = store_images([job for _, job in jobs], headers=self.session.headers)
+        
+        candidates: Dict[str, List] = {}
+        for (color, _), stored in zip(jobs, results):
+            if stored:
+                candidates.setdefault(color, []).append(stored)
+        return {color: stored.relative_path for color, stored in choose_color_images(candidates).items()}
 
     def update_color_images(self, phone_id: int, color_images: Dict[str, str], dry_run: bool = True) -> bool:
         """更新数据库中的颜色图片信息"""
@@ -302,7 +273,7 @@ class ColorImagesCrawler:
             return True
         
         try:
-            with psycopg2.connect(**DB_CONFIG) as conn:
+            with pooled_connect(**DB_CONFIG) as conn:
                 with conn.cursor() as cur:
                     cur.execute('UPDATE "Phones" SET "ColorImages" = %s WHERE "Id" = %s', 
                               (json.dumps(color_images), phone_id))
@@ -337,21 +308,14 @@ class ColorImagesCrawler:
             
             # 下载图片到本地
             if download_images:
-                local_color_images = {}
-                for color, image_url in color_images.items():
-                    local_path = self.download_color_image(image_url, brand, model, color)
-                    if local_path:
-                        local_color_images[color] = local_path
-                color_images = local_color_images
+                color_images = self.download_color_images(color_images, brand, model)
+            else:
+                color_images = {color: urls[0] for color, urls in color_images.items()}
             
             if color_images:
                 if self.update_color_images(pid, color_images, dry_run=dry_run):
                     success += 1
                     logger.info(f"✅ Updated {len(color_images)} color images")
-            
-            # 额外延迟
-            import random
-            time.sleep(max(3.0, self.base_delay_seconds + random.uniform(-2.0, 2.0)))
         
         logger.info(f"Completed. Updated={success} / {len(targets)}")
 
@@ -3,12 +3,15 @@
 Complete specs filler - Fill missing Camera, Weight, Processor, Dimensions fields based on web search results
 """
 
-import psycopg2
+from change_buffer import ChangeBuffer
+from db_pool import pooled_connect
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DB_CONFIG = {'host': 'localhost', 'database': 'mobilephone_db', 'user': 'postgres'}
+
 # Complete phone specs database - Authoritative information based on web search
 COMPLETE_PHONE_SPECS = {
     # Samsung Galaxy series
@@ -359,7 +362,7 @@ COMPLETE_PHONE_SPECS = {
 def get_phones_needing_completion():
     """Get phones that need additional specs completion"""
     try:
-        conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+        conn = pooled_connect(**DB_CONFIG)
         cur = conn.cursor()
         
         cur.execute('''
@@ -385,48 +388,31 @@ def get_phones_needing_completion():
         logger.error(f"Database error: {e}")
         return []
 
-def update_complete_specs(phone_id, brand, model, specs):
-    """Update phone with complete specs data"""
-    try:
-        conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
-        cur = conn.cursor()
-        
-        update_fields = []
-        values = []
-        
-        if specs.get('camera'):
-            update_fields.append('"Camera" = %s')
-            values.append(specs['camera'])
-        
-        if specs.get('weight') is not None:
-            update_fields.append('"Weight" = %s')
-            values.append(specs['weight'])
-        
-        if specs.get('processor'):
-            update_fields.append('"Processor" = %s')
-            values.append(specs['processor'])
-        
-        if specs.get('dimensions'):
-            update_fields.append('"Dimensions" = %s')
-            values.append(specs['dimensions'])
-        
-        if update_fields:
-            query = f'UPDATE "Phones" SET {", ".join(update_fields)} WHERE "Id" = %s'
-            values.append(phone_id)
-            
-            cur.execute(query, values)
-            conn.commit()
-            
-            logger.info(f"✅ Updated {brand} {model}: {len(update_fields)} fields")
-            return True
-        
-        cur.close()
-        conn.close()
-        return False
-        
-    except Exception as e:
-        logger.error(f"Database update error for {brand} {model}: {e}")
+def update_complete_specs(buffer, phone_id, brand, model, specs):
+    """Propose the complete specs data for a phone; only values that differ get written"""
+    fields = {}
+    
+    if specs.get('camera'):
+        fields['Camera'] = specs['camera']
+    
+    if specs.get('weight') is not None:
+        fields['Weight'] = specs['weight']
+    
+    if specs.get('processor'):
+        fields['Processor'] = specs['processor']
+    
+    if specs.get('dimensions'):
+        fields['Dimensions'] = specs['dimensions']
+    
+    if not fields:
         return False
+    
+    changed = buffer.propose(phone_id, fields)
+    if changed:
+        logger.info(f"✅ Updated {brand} {model}: {len(changed)} fields")
+    else:
+        logger.info(f"➖ {brand} {model} already up to date")
+    return True
 
 def complete_all_specs():
     """Main function to complete all missing specs"""
@@ -439,20 +425,22 @@ def complete_all_specs():
     success_count = 0
     no_data_count = 0
     
-    for phone_id, brand, model in phones:
-        full_name = f"{brand} {model}"
-        logger.info(f"\n📱 Processing: {full_name}")
+    with ChangeBuffer(DB_CONFIG, ('Camera', 'Weight', 'Processor', 'Dimensions')) as buffer:
+        buffer.load(phone_id for phone_id, _, _ in phones)
+        for phone_id, brand, model in phones:
+            full_name = f"{brand} {model}"
+            logger.info(f"\n📱 Processing: {full_name}")
         
-        if full_name in COMPLETE_PHONE_SPECS:
-            specs = COMPLETE_PHONE_SPECS[full_name]
-            if update_complete_specs(phone_id, brand, model, specs):
-                success_count += 1
-                logger.info(f"✅ {full_name}: Camera {specs.get('camera', 'N/A')}, Weight {specs.get('weight', 'N/A')}g, Processor {specs.get('processor', 'N/A')[:30]}...")
+            if full_name in COMPLETE_PHONE_SPECS:
+                specs = COMPLETE_PHONE_SPECS[full_name]
+                if update_complete_specs(buffer, phone_id, brand, model, specs):
+                    success_count += 1
+                    logger.info(f"✅ {full_name}: Camera {specs.get('camera', 'N/A')}, Weight {specs.get('weight', 'N/A')}g, Processor {specs.get('processor', 'N/A')[:30]}...")
+                else:
+                    logger.error(f"❌ Failed to update {full_name}")
             else:
-                logger.error(f"❌ Failed to update {full_name}")
-        else:
-            logger.warning(f"⚠️ No complete specs for {full_name}")
-            no_data_count += 1
+                logger.warning(f"⚠️ No complete specs for {full_name}")
+                no_data_count += 1
     
     logger.info(f"\n🎯 Complete Specs Fill completed!")
     logger.info(f"✅ Updated: {success_count}")
@@ -5,14 +5,16 @@ Correctly crawl ScreenSize, RAM, Battery and other fields
 """
 
 import requests
-import time
 import json
-import psycopg2
+from db_pool import pooled_connect
 import os
-from bs4 import BeautifulSoup
 import logging
-from urllib.parse import urljoin, quote
+from urllib.parse import quote
 import re
+from model_matcher import best_match
+from phone_index import indexed_search, search_candidates
+from response_cache import CachedSession
+from gsmarena_parser import get_spec_store
 
 # Configure logging
 logging.basicConfig(
@@ -28,7 +30,7 @@ logger = logging.getLogger(__name__)
 class ComprehensiveSpecsCrawler:
     def __init__(self, db_config):
         self.db_config = db_config
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -38,11 +40,12 @@ class ComprehensiveSpecsCrawler:
             'Upgrade-Insecure-Requests': '1',
         })
         self.base_url = "https://www.gsmarena.com"
+        self.spec_records = get_spec_store()
         
     def get_phones_missing_specs(self):
         """Get phones that have processor but missing other specs"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cur = conn.cursor()
             
             query = '''
@@ -68,6 +71,7 @@ class ComprehensiveSpecsCrawler:
             logger.error(f"Database error: {e}")
             return []
     
+    @indexed_search()
     def search_phone_on_gsmarena(self, brand, model):
         """Search for phone on GSMArena"""
         try:
@@ -80,38 +84,10 @@ class ComprehensiveSpecsCrawler:
             response = self.session.get(search_url, timeout=10)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for phone links in search results
-            phone_links = soup.find_all('a', href=re.compile(r'\.php$'))
-            
-            for link in phone_links:
-                href = link.get('href', '')
-                link_text = link.get_text(strip=True).lower()
-                
-                # Check if this link matches our phone
-                brand_lower = brand.lower()
-                model_lower = model.lower()
-                
-                # Handle special cases
-                if brand_lower == 'oneplus':
-                    brand_patterns = ['oneplus', 'one plus']
-                elif brand_lower == 'oppo':
-                    brand_patterns = ['oppo']
-                elif brand_lower == 'samsung':
-                    brand_patterns = ['samsung']
-                elif brand_lower == 'apple':
-                    brand_patterns = ['apple']
-                else:
-                    brand_patterns = [brand_lower]
-                
-                # Check if brand matches
-                brand_match = any(pattern in link_text for pattern in brand_patterns)
-                
-                if brand_match and any(word in link_text for word in model_lower.split()):
-                    phone_url = urljoin(self.base_url, href)
-                    logger.info(f"Found match: {phone_url}")
-                    return phone_url
+            match = best_match(brand, model, search_candidates(response.content, self.base_url))
+            if match:
+                logger.info(f"Found match: {match.name} -> {match.url} (confidence {match.confidence:.2f})")
+                return match.url
             
             logger.warning(f"No product page found for {brand} {model}")
             return None
@@ -129,46 +105,38 @@ class ComprehensiveSpecsCrawler:
     def extract_comprehensive_specs(self, phone_url):
         """Extract comprehensive specs from GSMArena phone page"""
         try:
-            response = self.session.get(phone_url, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            record = self.spec_records.get(self.session, phone_url)
             
             specs = {}
             
             # Method 1: Extract from highlight specs (data-spec attributes)
             # Screen Size
-            screen_size_elem = soup.find('span', {'data-spec': 'displaysize-hl'})
-            if screen_size_elem:
-                screen_size = screen_size_elem.get_text(strip=True)
+            screen_size = record.spec('displaysize-hl')
+            if screen_size:
                 specs['screen_size'] = screen_size
                 logger.info(f"✅ Screen Size: {screen_size}")
             
             # RAM Size
-            ram_size_elem = soup.find('span', {'data-spec': 'ramsize-hl'})
-            if ram_size_elem:
-                ram_size = ram_size_elem.get_text(strip=True)
+            ram_size = record.spec('ramsize-hl')
+            if ram_size:
                 specs['ram'] = f"{ram_size}GB RAM"
                 logger.info(f"✅ RAM: {ram_size}GB RAM")
             
             # Battery Size
-            battery_elem = soup.find('span', {'data-spec': 'batsize-hl'})
-            if battery_elem:
-                battery_size = battery_elem.get_text(strip=True)
+            battery_size = record.spec('batsize-hl')
+            if battery_size:
                 specs['battery'] = f"{battery_size}mAh"
                 logger.info(f"✅ Battery: {battery_size}mAh")
             
             # Internal Storage (already have this but let's make sure it's correct)
-            storage_elem = soup.find('span', {'data-spec': 'storage-hl'})
-            if storage_elem:
-                storage_info = storage_elem.get_text(strip=True)
+            storage_info = record.spec('storage-hl')
+            if storage_info:
                 specs['storage_summary'] = storage_info
                 logger.info(f"✅ Storage Summary: {storage_info}")
             
             # Weight (from body-hl)
-            body_elem = soup.find('span', {'data-spec': 'body-hl'})
-            if body_elem:
-                body_info = body_elem.get_text(strip=True)
+            body_info = record.spec('body-hl')
+            if body_info:
                 # Extract weight (format: "164g, 7.4mm thickness")
                 weight_match = re.search(r'(\d+(?:\.\d+)?)g', body_info)
                 if weight_match:
@@ -178,9 +146,9 @@ class ComprehensiveSpecsCrawler:
             # Method 2: Extract from detailed specs table if highlights are missing
             if not specs.get('screen_size'):
                 # Look for size in detailed specs
-                size_elements = soup.find_all('td', {'data-spec': re.compile(r'size|display')})
-                for elem in size_elements:
-                    text = elem.get_text(strip=True)
+                for key, text in record.specs.items():
+                    if not re.search(r'size|display', key):
+                        continue
                     if '"' in text and any(char.isdigit() for char in text):
                         specs['screen_size'] = text.split(',')[0].strip()  # Take first part
                         logger.info(f"✅ Screen Size (detailed): {specs['screen_size']}")
@@ -188,7 +156,7 @@ class ComprehensiveSpecsCrawler:
             
             # Method 3: Look for battery in mAh pattern if not found
             if not specs.get('battery'):
-                battery_pattern = re.search(r'(\d+)\s*mAh', soup.get_text())
+                battery_pattern = re.search(r'(\d+)\s*mAh', record.text)
                 if battery_pattern:
                     specs['battery'] = f"{battery_pattern.group(1)}mAh"
                     logger.info(f"✅ Battery (pattern): {specs['battery']}")
@@ -203,7 +171,7 @@ class ComprehensiveSpecsCrawler:
     def update_phone_comprehensive_specs(self, phone_id, specs):
         """Update phone with comprehensive specs"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cur = conn.cursor()
             
             # Build update query
@@ -283,9 +251,6 @@ class ComprehensiveSpecsCrawler:
             else:
                 fail_count += 1
                 logger.error(f"❌ Failed to update {brand} {model}")
-            
-            # Add delay between requests
-            time.sleep(4)
         
         logger.info(f"\n🎯 Comprehensive Specs Crawling completed!")
         logger.info(f"✅ Success: {success_count}")
@@ -6,7 +6,8 @@ Move all images from COMPX576/images/phones/ to COMPX576/MobilePhone/images/phon
 
 import os
 import shutil
-import psycopg2
+from db_pool import pooled_connect
+from image_store import hash_file
 import logging
 from pathlib import Path
 
@@ -37,11 +38,15 @@ class ImageConsolidator:
             
             try:
                 if target_path.exists():
-                    # If destination exists, compare size to decide replacement
+                    # Identical content is a true duplicate; otherwise keep the larger file
                     old_size = image_file.stat().st_size
                     new_size = target_path.stat().st_size
                     
-                    if old_size > new_size:
+                    if hash_file(str(image_file)) == hash_file(str(target_path)):
+                        image_file.unlink()
+                        logger.info(f"⏭️ Identical content: {image_file.name}")
+                        duplicate_count += 1
+                    elif old_size > new_size:
                         # Replace if old file is larger
                         shutil.move(str(image_file), str(target_path))
                         logger.info(f"🔄 Replaced larger: {image_file.name} ({old_size} > {new_size} bytes)")
@@ -65,7 +70,7 @@ class ImageConsolidator:
     def update_database_paths(self):
         """Update image paths in database to new location"""
         try:
-            conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+            conn = pooled_connect(host='localhost', database='mobilephone_db', user='postgres')
             cur = conn.cursor()
             
             # Update all local image paths
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Durable crawl job ledger
+Records, per crawl job, phone and stage (resolve, details, images, write...),
+whether the stage is done, how many attempts it took and the last error, plus
+a small JSON checkpoint such as the resolved product URL. A crawler that is
+interrupted resumes from the stages it already finished, and phones that keep
+failing are skipped after max_attempts instead of being retried blindly.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from rate_limiter import STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(STATE_DIR, 'crawl_jobs.sqlite')
+DEFAULT_MAX_ATTEMPTS = 3
+
+RUNNING = 'running'     # left behind by a crash; simply run again
+DONE = 'done'
+FAILED = 'failed'
+
+
+class StageRecord(NamedTuple):
+    status: str
+    attempts: int
+    last_error: Optional[str]
+    result: Any
+    updated_at: float
+
+
+class JobLedger:
+    """Per-phone, per-stage status of one named crawl job"""
+
+    def __init__(self, job: str, db_path: str = DEFAULT_DB_PATH, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.job = job
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS stages (
+                job TEXT NOT NULL,
+                item TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                result TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (job, item, stage)
+            )
+        ''')
+        self._conn.commit()
+        self._records: Dict[tuple, StageRecord] = {}
+        for item, stage, status, attempts, last_error, result, updated_at in self._conn.execute(
+                'SELECT item, stage, status, attempts, last_error, result, updated_at FROM stages WHERE job = ?',
+                (job,)):
+            self._records[(item, stage)] = StageRecord(status, attempts, last_error,
+                                                       json.loads(result) if result else None, updated_at)
+
+    def _write(self, item, stage: str, record: StageRecord):
+        key = (str(item), stage)
+        with self._lock:
+            self._records[key] = record
+            self._conn.execute(
+                'INSERT OR REPLACE INTO stages (job, item, stage, status, attempts, last_error, result, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (self.job, key[0], stage, record.status, record.attempts, record.last_error,
+                 json.dumps(record.result) if record.result is not None else None, record.updated_at))
+            self._conn.commit()
+
+    def get(self, item, stage: str) -> Optional[StageRecord]:
+        with self._lock:
+            return self._records.get((str(item), stage))
+
+    def is_done(self, item, stage: str) -> bool:
+        record = self.get(item, stage)
+        return record is not None and record.status == DONE
+
+    def exhausted(self, item, stage: str) -> bool:
+        """Whether the stage failed max_attempts times and should no longer be tried"""
+        record = self.get(item, stage)
+        return record is not None and record.status == FAILED and record.attempts >= self.max_attempts
+
+    def should_run(self, item, stage: str) -> bool:
+        return not self.is_done(item, stage) and not self.exhausted(item, stage)
+
+    def result(self, item, stage: str) -> Any:
+        """Checkpoint data saved when the stage finished, if it did"""
+        record = self.get(item, stage)
+        return record.result if record is not None and record.status == DONE else None
+
+    def start(self, item, stage: str):
+        record = self.get(item, stage)
+        attempts = record.attempts if record else 0
+        self._write(item, stage, StageRecord(RUNNING, attempts + 1, record.last_error if record else None,
+                                             None, time.time()))
+
+    def succeed(self, item, stage: str, result: Any = None):
+        record = self.get(item, stage)
+        self._write(item, stage, StageRecord(DONE, record.attempts if record else 1, None, result, time.time()))
+
+    def fail(self, item, stage: str, error: str):
+        record = self.get(item, stage)
+        attempts = record.attempts if record and record.status == RUNNING else (record.attempts + 1 if record else 1)
+        self._write(item, stage, StageRecord(FAILED, attempts, error, None, time.time()))
+        if attempts >= self.max_attempts:
+            logger.warning(f"[{self.job}] {item}/{stage} failed {attempts} times, skipping from now on: {error}")
+
+    @contextmanager
+    def track(self, item, stage: str):
+        """Mark a stage running for the block; an exception records a failure, otherwise it is done
+        unless the block already called succeed()/fail()"""
+        self.start(item, stage)
+        try:
+            yield
+        except Exception as e:
+            self.fail(item, stage, f"{type(e).__name__}: {e}")
+            raise
+        record = self.get(item, stage)
+        if record is not None and record.status == RUNNING:
+            self.succeed(item, stage)
+
+    def runnable(self, items: Iterable, final_stage: str, key: Callable[[Any], Any] = lambda item: item['id'],
+                 stages: Iterable[str] = ()) -> List:
+        """Items whose final stage is not done and none of whose stages are exhausted"""
+        stages = tuple(stages) or (final_stage,)
+        selected, finished, given_up = [], 0, 0
+        for item in items:
+            item_key = key(item)
+            if self.is_done(item_key, final_stage):
+                finished += 1
+            elif any(self.exhausted(item_key, stage) for stage in stages):
+                given_up += 1
+            else:
+                selected.append(item)
+        if finished or given_up:
+            logger.info(f"[{self.job}] Resuming: {finished} already done, {given_up} skipped after "
+                        f"{self.max_attempts} failed attempts, {len(selected)} to do")
+        return selected
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """stage -> status -> count"""
+        counts: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            for (_, stage), record in self._records.items():
+                status = FAILED + ' (gave up)' if record.status == FAILED and record.attempts >= self.max_attempts \
+                    else record.status
+                counts.setdefault(stage, {}).setdefault(status, 0)
+                counts[stage][status] += 1
+        return counts
+
+    def forget(self, item, stage: str):
+        """Drop one stage record, as if the stage had never run"""
+        with self._lock:
+            self._records.pop((str(item), stage), None)
+            self._conn.execute('DELETE FROM stages WHERE job = ? AND item = ? AND stage = ?',
+                               (self.job, str(item), stage))
+            self._conn.commit()
+
+    def reset(self, stage: Optional[str] = None, status: Optional[str] = FAILED) -> int:
+        """Forget records (by default the failed ones) so they are tried again"""
+        with self._lock:
+            keys = [key for key, record in self._records.items()
+                    if (stage is None or key[1] == stage) and (status is None or record.status == status)]
+        for item, item_stage in keys:
+            self.forget(item, item_stage)
+        return len(keys)
+
+
+_ledgers: Dict[str, JobLedger] = {}
+
+
+def get_job_ledger(job: str) -> JobLedger:
+    """Process-wide ledger for a job name"""
+    if job not in _ledgers:
+        _ledgers[job] = JobLedger(job)
+    return _ledgers[job]
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Inspect or reset crawl job progress')
+    parser.add_argument('job', help='job name, e.g. gsmarena_flagship or backfill_colors')
+    parser.add_argument('--reset-failed', action='store_true', help='retry failed items on the next run')
+    parser.add_argument('--reset-all', action='store_true', help='forget all progress of the job')
+    parser.add_argument('--stage', default=None, help='limit a reset to one stage')
+    args = parser.parse_args()
+
+    ledger = get_job_ledger(args.job)
+    if args.reset_all or args.reset_failed:
+        removed = ledger.reset(args.stage, status=None if args.reset_all else FAILED)
+        print(f"Reset {removed} stage records")
+    for stage, counts in sorted(ledger.summary().items()):
+        print(f"{stage:>10}: " + ', '.join(f"{status}={count}" for status, count in sorted(counts.items())))
+
+
+if __name__ == '__main__':
+    main()
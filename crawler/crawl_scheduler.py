@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Staleness-based crawl scheduling
+Replaces hard-coded target filters ("Processor" = 'TBD', "Storage" = 'Card
+slot', one brand at a time...) with a per-run plan. For every phone and
+"Phones" column a crawler fills, the time the value was last checked against
+the source is recorded. Phones with missing fields come first; a field the
+source was asked for and did not have (many phones have no side picture)
+is only chased again with the phone's regular refresh. Complete phones are
+due again once their oldest check is older than their refresh interval,
+which is a week for this year's releases and doubles with every year of
+age. Phones are taken in priority order until the run's request budget is
+spent.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from rate_limiter import STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(STATE_DIR, 'crawl_schedule.sqlite')
+
+DAY = 86400
+BASE_INTERVAL_DAYS = 7          # refresh interval of a phone released this year
+MAX_INTERVAL_DAYS = 365
+MISSING_RETRY_DAYS = 3          # retry delay for a phone never checked successfully (e.g. search failed)
+MISSING_WEIGHT = 10.0           # one missing field outranks ten intervals of staleness
+
+# Values that mean "not filled in yet"
+PLACEHOLDERS = {None, '', 'TBD'}
+FIELD_PLACEHOLDERS = {
+    'Ram': {'Card slot', 'No'},
+    'Storage': {'Card slot', 'No'},
+}
+
+
+def is_missing(field: str, value) -> bool:
+    if isinstance(value, str):
+        value = value.strip()
+    return value in PLACEHOLDERS or value in FIELD_PLACEHOLDERS.get(field, ())
+
+
+def refresh_interval(release_year: Optional[int], today: Optional[date] = None) -> float:
+    """Seconds a phone's data stays fresh: BASE_INTERVAL_DAYS, doubled per year since release"""
+    current_year = (today or date.today()).year
+    age = max(0, current_year - release_year) if release_year else MAX_INTERVAL_DAYS
+    return min(BASE_INTERVAL_DAYS * 2 ** min(age, 16), MAX_INTERVAL_DAYS) * DAY
+
+
+class ScheduledPhone(NamedTuple):
+    phone: Dict
+    priority: float
+    missing: List[str]      # fields being chased this run
+    overdue: float          # time since the last check, in refresh intervals
+    cost: int               # estimated requests
+
+
+class CrawlScheduler:
+    """Per-phone, per-field last-checked times of one crawl source, and the plan built from them"""
+
+    def __init__(self, source: str, fields: Sequence[str], db_path: str = DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.source = source
+        self.fields = list(fields)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS field_checks (
+                source TEXT NOT NULL,
+                phone_id TEXT NOT NULL,
+                field TEXT NOT NULL,
+                verified_at REAL NOT NULL,
+                PRIMARY KEY (source, phone_id, field)
+            );
+            CREATE TABLE IF NOT EXISTS scheduled (
+                source TEXT NOT NULL,
+                phone_id TEXT NOT NULL,
+                scheduled_at REAL NOT NULL,
+                PRIMARY KEY (source, phone_id)
+            );
+        ''')
+        self._conn.commit()
+
+    def verified(self) -> Dict[str, Dict[str, float]]:
+        """phone id -> field -> last verified time"""
+        with self._lock:
+            rows = self._conn.execute('SELECT phone_id, field, verified_at FROM field_checks WHERE source = ?',
+                                      (self.source,)).fetchall()
+        checks: Dict[str, Dict[str, float]] = {}
+        for phone_id, field, verified_at in rows:
+            checks.setdefault(phone_id, {})[field] = verified_at
+        return checks
+
+    def scheduled(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._conn.execute('SELECT phone_id, scheduled_at FROM scheduled WHERE source = ?',
+                                           (self.source,)).fetchall())
+
+    def mark_verified(self, phone_id, fields: Optional[Iterable[str]] = None):
+        """Record that the source was checked for these fields (default: all) just now,
+        whether or not it had a value for them"""
+        now = time.time()
+        rows = [(self.source, str(phone_id), field, now) for field in (fields or self.fields)]
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO field_checks VALUES (?, ?, ?, ?)', rows)
+            self._conn.commit()
+
+    def mark_scheduled(self, phone_ids: Iterable):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO scheduled VALUES (?, ?, ?)',
+                                   [(self.source, str(phone_id), now) for phone_id in phone_ids])
+            self._conn.commit()
+
+    def score(self, phone: Dict, verified: Dict[str, float], scheduled_at: Optional[float],
+              now: float) -> Optional[ScheduledPhone]:
+        """Priority of one phone, or None when it is not due. phone['values'] holds its
+        current "Phones" values of the tracked fields."""
+        interval = refresh_interval(phone.get('year'))
+        missing = []
+        for field in self.fields:
+            if not is_missing(field, phone['values'].get(field)):
+                continue
+            checked = verified.get(field)
+            if checked is not None:
+                # The source was asked and lacked it: no sooner than the regular refresh
+                due = now - checked >= interval
+            else:
+                due = now - (scheduled_at or 0.0) >= MISSING_RETRY_DAYS * DAY
+            if due:
+                missing.append(field)
+        # Checked as a whole: the oldest field check (or a later attempt that found nothing) counts
+        oldest = min(verified.get(field, 0.0) for field in self.fields)
+        reference = max(oldest, scheduled_at or 0.0)
+        overdue = (now - reference) / interval if reference else 1.0
+        if not missing and overdue < 1.0:
+            return None
+        return ScheduledPhone(phone, MISSING_WEIGHT * len(missing) + overdue, missing, overdue, 0)
+
+    def plan(self, phones: Iterable[Dict], budget: int, cost: Callable[[Dict, List[str]], int]) -> List[ScheduledPhone]:
+        """Due phones, highest priority first, whose estimated requests fit in the budget.
+        cost(phone, missing fields) estimates the requests one phone takes."""
+        now = time.time()
+        checks, scheduled = self.verified(), self.scheduled()
+        due = []
+        for phone in phones:
+            phone_id = str(phone['id'])
+            entry = self.score(phone, checks.get(phone_id, {}), scheduled.get(phone_id), now)
+            if entry is not None:
+                due.append(entry)
+        due.sort(key=lambda entry: entry.priority, reverse=True)
+
+        planned, remaining = [], budget
+        for entry in due:
+            requests = cost(entry.phone, entry.missing)
+            if requests <= remaining:
+                planned.append(entry._replace(cost=requests))
+                remaining -= requests
+            if remaining <= 0:
+                break
+        logger.info(f"[{self.source}] {len(due)} phones due, {len(planned)} fit in a budget of {budget} requests "
+                    f"({sum(1 for entry in planned if entry.missing)} with missing fields)")
+        return planned
+
+
+_schedulers: Dict[str, CrawlScheduler] = {}
+
+
+def get_crawl_scheduler(source: str, fields: Sequence[str]) -> CrawlScheduler:
+    """Process-wide scheduler for a crawl source"""
+    if source not in _schedulers:
+        _schedulers[source] = CrawlScheduler(source, fields)
+    return _schedulers[source]
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Shared PostgreSQL connection pool
+Every crawler used to open a fresh psycopg2 connection per row update. Pools
+are kept per connection config and handed out through pooled_connect(), a
+drop-in replacement for psycopg2.connect(): close() and leaving a `with`
+block return the connection to the pool instead of tearing it down.
+Connections that sat idle are pinged before reuse, broken ones are replaced.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from typing import Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 8
+HEALTH_CHECK_AFTER = 30.0   # idle seconds after which a connection is pinged before reuse
+CHECKOUT_TIMEOUT = 60.0     # seconds to wait for a free connection
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that goes back to its pool on close() or `with` exit"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool: Optional['ConnectionPool'] = None
+        self._finalizer = None
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Commit or roll back like a plain psycopg2 connection, then hand it back
+        try:
+            return super().__exit__(exc_type, exc_value, traceback)
+        finally:
+            self.close()
+
+    def close(self):
+        # A second close() after the connection went back to the pool is a no-op
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool._release(self)
+
+    def discard(self):
+        """Really close the connection instead of returning it"""
+        self._pool = None
+        if not self.closed:
+            super().close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of connections for one database config"""
+
+    def __init__(self, dsn: Optional[str] = None, size: int = DEFAULT_POOL_SIZE,
+                 health_check_after: float = HEALTH_CHECK_AFTER, **db_config):
+        self.dsn = dsn
+        self.db_config = db_config
+        self.size = size
+        self.health_check_after = health_check_after
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: List[Tuple[PooledConnection, float]] = []
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def connect(self, timeout: float = CHECKOUT_TIMEOUT) -> PooledConnection:
+        """Check out a healthy connection, waiting for a free slot if all are in use"""
+        if not self._slots.acquire(timeout=timeout):
+            raise psycopg2.pool.PoolError(f"No free database connection after {timeout:.0f}s (pool size {self.size})")
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        conn._pool = self
+        # A connection dropped without close() still frees its slot once collected
+        conn._finalizer = weakref.finalize(conn, self._slots.release)
+        return conn
+
+    def _checkout(self) -> PooledConnection:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, returned_at = self._idle.pop()
+            if self._healthy(conn, time.monotonic() - returned_at):
+                self.reused += 1
+                return conn
+            self.discarded += 1
+            conn.discard()
+
+        conn = psycopg2.connect(self.dsn, connection_factory=PooledConnection, **self.db_config)
+        self.created += 1
+        return conn
+
+    def _healthy(self, conn: PooledConnection, idle_for: float) -> bool:
+        if conn.closed:
+            return False
+        if idle_for < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Dropping stale database connection: {e}")
+            return False
+
+    def _release(self, conn: PooledConnection):
+        if conn._finalizer is not None:
+            conn._finalizer.detach()
+            conn._finalizer = None
+        try:
+            keep = not conn.closed
+            if keep and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                # Uncommitted work is dropped, as closing the connection would have done
+                conn.rollback()
+        except psycopg2.Error:
+            keep = False
+
+        with self._lock:
+            if keep and len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+        if conn is not None:
+            self.discarded += 1
+            conn.discard()
+        self._slots.release()
+
+    async def run(self, func: Callable, *args):
+        """Run func(conn, *args) on a pooled connection in a worker thread, committing on success"""
+        def call():
+            with self.connect() as conn:
+                return func(conn, *args)
+        return await asyncio.get_running_loop().run_in_executor(None, call)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.discard()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'size': self.size, 'idle': len(self._idle), 'created': self.created,
+                    'reused': self.reused, 'discarded': self.discarded}
+
+
+_pools: Dict[Tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(dsn: Optional[str] = None, size: int = DEFAULT_POOL_SIZE, **db_config) -> ConnectionPool:
+    """Process-wide pool for a connection config; size only applies when the pool is created"""
+    key = (dsn, tuple(sorted(db_config.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(dsn, size=size, **db_config)
+        return pool
+
+
+def pooled_connect(dsn: Optional[str] = None, **db_config) -> PooledConnection:
+    """Drop-in for psycopg2.connect() that reuses connections from the shared pool"""
+    return get_pool(dsn, **db_config).connect()
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
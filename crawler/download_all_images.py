@@ -4,12 +4,15 @@ Download all phone images to local storage
 Download GSMArena images and other external images to local images folder
 """
 
-import requests
-import psycopg2
+from db_pool import pooled_connect
 import os
 import logging
 from urllib.parse import urlparse
-import time
+from image_downloads import DownloadJob
+from image_manifest import ImageManifest, relative_image_path
+from image_store import get_image_store, store_images
+from image_validation import validate_images
+from rate_limiter import LimitedSession
 
 # Configure logging
 logging.basicConfig(
@@ -26,7 +29,7 @@ class ImageDownloader:
     def __init__(self, images_dir):
         self.images_dir = images_dir
         self.phones_dir = os.path.join(images_dir, 'phones')
-        self.session = requests.Session()
+        self.session = LimitedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         })
@@ -37,7 +40,7 @@ class ImageDownloader:
     def get_images_to_download(self):
         """Get list of images that need to be downloaded"""
         try:
-            conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+            conn = pooled_connect(host='localhost', database='mobilephone_db', user='postgres')
             cur = conn.cursor()
             
             # 获取所有外部图片URL
@@ -74,33 +77,13 @@ class ImageDownloader:
         filename = f"{clean_brand}_{clean_model}{file_ext}".replace(' ', '_')
         return filename
     
-    def download_image(self, image_url, local_path):
-        """下载单张图片"""
-        try:
-            response = self.session.get(image_url, timeout=30)
-            response.raise_for_status()
-            
-            with open(local_path, 'wb') as f:
-                f.write(response.content)
-            
-            logger.info(f"✅ Downloaded: {os.path.basename(local_path)}")
-            return True
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Failed to download {image_url}: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"❌ Error saving {local_path}: {e}")
-            return False
-    
-    def update_database_path(self, phone_id, new_local_path):
+    def update_database_path(self, phone_id, local_url):
         """更新数据库中的图片路径"""
         try:
-            conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+            conn = pooled_connect(host='localhost', database='mobilephone_db', user='postgres')
             cur = conn.cursor()
             
             # 更新为本地路径
-            local_url = f"http://localhost:5198/images/phones/{os.path.basename(new_local_path)}"
             cur.execute('UPDATE "Phones" SET "ImageUrl" = %s WHERE "Id" = %s', (local_url, phone_id))
             conn.commit()
             
@@ -124,9 +107,11 @@ class ImageDownloader:
         success_count = 0
         fail_count = 0
         
-        for i, (phone_id, brand, model, image_url) in enumerate(images, 1):
-            logger.info(f"\n📸 Processing {i}/{len(images)}: {brand} {model}")
-            
+        # 先整理出需要下载的文件, 再并发下载进内容寻址存储 (相同内容只存一份)
+        store = get_image_store()
+        targets = []
+        jobs = {}
+        for phone_id, brand, model, image_url in images:
             # 跳过已经是本地路径的图片
             if image_url.startswith('http://localhost:5198/'):
                 logger.info(f"⏭️ Already local: {brand} {model}")
@@ -134,30 +119,29 @@ class ImageDownloader:
             
             # 生成本地文件名
             filename = self.generate_local_filename(brand, model, image_url)
-            local_path = os.path.join(self.phones_dir, filename)
-            
-            # 如果文件已存在，跳过下载
-            if os.path.exists(local_path):
-                logger.info(f"⏭️ File exists: {filename}")
-                # 更新数据库路径
-                if self.update_database_path(phone_id, local_path):
-                    success_count += 1
-                continue
+            targets.append((phone_id, brand, model, filename))
             
-            # 下载图片
-            if self.download_image(image_url, local_path):
-                # 更新数据库路径
-                if self.update_database_path(phone_id, local_path):
-                    success_count += 1
-                    logger.info(f"✅ {brand} {model}: {filename}")
-                else:
-                    fail_count += 1
+            # 如果已经存过同名文件或同一URL，跳过下载
+            known = store.get(filename) or store.for_url(image_url)
+            if known:
+                store.alias(known, name=filename)
+                logger.info(f"⏭️ Already stored: {filename}")
             else:
+                jobs.setdefault(filename, DownloadJob(image_url, filename))
+        
+        logger.info(f"📸 Downloading {len(jobs)} images ({len(targets) - len(jobs)} already stored)")
+        stored = dict(zip(jobs, store_images(jobs.values(), headers=self.session.headers)))
+        
+        for phone_id, brand, model, filename in targets:
+            image = stored[filename] if filename in stored else store.get(filename)
+            if image is None:
                 fail_count += 1
                 logger.error(f"❌ Failed: {brand} {model}")
-            
-            # 添加延迟避免请求过快
-            time.sleep(1)
+            elif self.update_database_path(phone_id, image.local_url):
+                success_count += 1
+                logger.info(f"✅ {brand} {model}: {image.relative_path}")
+            else:
+                fail_count += 1
         
         logger.info(f"\n🎯 Image Download completed!")
         logger.info(f"✅ Success: {success_count}")
@@ -167,7 +151,7 @@ class ImageDownloader:
     def verify_local_images(self):
         """验证本地图片完整性"""
         try:
-            conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+            conn = pooled_connect(host='localhost', database='mobilephone_db', user='postgres')
             cur = conn.cursor()
             
             cur.execute('''
@@ -180,14 +164,10 @@ class ImageDownloader:
             cur.close()
             conn.close()
             
-            missing_files = []
-            for brand, model, image_url in local_images:
-                # 提取文件名
-                filename = image_url.split('/')[-1]
-                local_path = os.path.join(self.phones_dir, filename)
-                
-                if not os.path.exists(local_path):
-                    missing_files.append((brand, model, filename))
+            # 一次扫描建立文件清单, 逐行检查只是字典查找
+            manifest = ImageManifest(self.images_dir).refresh()
+            missing_files = [(brand, model, relative_image_path(image_url))
+                             for brand, model, image_url in local_images if not manifest.exists(image_url)]
             
             if missing_files:
                 logger.warning(f"⚠️ Found {len(missing_files)} missing local files:")
@@ -213,6 +193,11 @@ def main():
     
     logger.info("\n🔍 Verifying downloaded images...")
     downloader.verify_local_images()
+    # New downloads are decoded before they are stored; anything flagged here predates that or
+    # was damaged on disk. Purging it would leave "Phones" pointing at a missing file, so only report it.
+    _, invalid = validate_images()
+    if invalid:
+        logger.warning(f"⚠️ {len(invalid)} stored images failed to decode (see image_validation.py)")
     
     logger.info("\n✨ Image download process completed!")
 
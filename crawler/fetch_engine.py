@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Shared async fetch engine
+One aiohttp session for every crawler, with bounded concurrency per host and
+request pacing from the shared token-bucket limiter, so search, detail and
+image requests for different phones overlap instead of running strictly one
+after another
+"""
+
+import asyncio
+import logging
+import os
+import random
+import tempfile
+from email.message import Message
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional
+
+import aiohttp
+from multidict import CIMultiDict
+
+from adaptive_backoff import AdaptiveRateController, get_rate_controller
+from page_archive import PageArchive, get_page_archive
+from rate_limiter import TokenBucketLimiter, get_limiter, host_of
+from response_cache import CacheEntry, ResponseCache, get_cache, normalize_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+# Max in-flight requests per host; request rate is governed by rate_limiter.RATE_LIMITS
+HOST_CONCURRENCY = {
+    'www.gsmarena.com': 2,
+    'fdn2.gsmarena.com': 4,
+    'detail.zol.com.cn': 2,
+    'search.zol.com.cn': 1,
+}
+DEFAULT_CONCURRENCY = 2
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class FetchError(Exception):
+    """Raised when a request still fails after all retries"""
+
+    def __init__(self, url: str, status: Optional[int] = None, message: str = ''):
+        self.url = url
+        self.status = status
+        super().__init__(message or f"Fetch failed for {url} (status={status})")
+
+
+class FetchResult:
+    """Fully-read response, shaped like requests.Response for easy porting"""
+
+    def __init__(self, url: str, status_code: int, headers: Mapping[str, str], content: bytes,
+                 encoding: Optional[str] = None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise FetchError(self.url, self.status_code)
+
+
+def _charset(headers: Mapping[str, str]) -> Optional[str]:
+    message = Message()
+    message['Content-Type'] = headers.get('Content-Type', '')
+    return message.get_content_charset()
+
+
+def _result_from_entry(entry: CacheEntry) -> FetchResult:
+    headers = CIMultiDict(entry.headers)
+    return FetchResult(entry.url, entry.status, headers, entry.body, _charset(headers))
+
+
+class FetchEngine:
+    """Async HTTP client shared by all crawlers"""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None,
+                 host_concurrency: Optional[Dict[str, int]] = None,
+                 limiter: Optional[TokenBucketLimiter] = None,
+                 rate_controller: Optional[AdaptiveRateController] = None,
+                 cache: Optional[ResponseCache] = None, use_cache: bool = True,
+                 archive: Optional[PageArchive] = None, use_archive: bool = True,
+                 timeout: float = 25, max_retries: int = 3, retry_delay: float = 10.0,
+                 default_concurrency: int = DEFAULT_CONCURRENCY,
+                 url_rewriter: Optional[Callable[[str], str]] = None):
+        self.headers = dict(DEFAULT_HEADERS)
+        if headers:
+            self.headers.update(headers)
+        # aiohttp negotiates compression itself and may lack brotli support
+        self.headers = {k: v for k, v in self.headers.items() if k.lower() != 'accept-encoding'}
+        self.host_concurrency = dict(HOST_CONCURRENCY)
+        self.default_concurrency = default_concurrency
+        if host_concurrency:
+            self.host_concurrency.update(host_concurrency)
+        self.limiter = limiter or get_limiter()
+        self.rate_controller = rate_controller or get_rate_controller()
+        self.cache = (cache or get_cache()) if use_cache else None
+        self.archive = (archive or get_page_archive()) if use_archive else None
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        # Maps a URL to the one actually requested (bench_replay.py points crawlers at a
+        # local stand-in server); limits, concurrency and caching still use the original URL
+        self.url_rewriter = url_rewriter
+        self.request_count = 0
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(headers=self.headers, timeout=self.timeout)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _wire_url(self, url: str) -> str:
+        return self.url_rewriter(url) if self.url_rewriter else url
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.host_concurrency.get(host, self.default_concurrency))
+            self._semaphores[host] = semaphore
+        return semaphore
+
+    async def fetch(self, url: str, params: Optional[Dict[str, Any]] = None,
+                    headers: Optional[Dict[str, str]] = None, method: str = 'GET',
+                    revalidate: bool = False) -> FetchResult:
+        """Fetch a URL, honouring the host's concurrency and rate limit, with retries.
+        GETs are served from the response cache when fresh and revalidated when stale;
+        with revalidate, a fresh entry is revalidated too, so the source is always asked."""
+        entry = None
+        if self.cache is not None and method == 'GET':
+            entry = self.cache.get(url, params)
+            if entry is not None and entry.fresh and not revalidate:
+                self.cache.hits += 1
+                return _result_from_entry(entry)
+            if entry is not None:
+                headers = {**(headers or {}), **entry.validators()}
+
+        await self.open()
+        host = host_of(url)
+        semaphore = self._semaphore(host)
+        delay = self.retry_delay
+        last_error = None
+        for attempt in range(1, self.max_retries + 1):
+            async with semaphore:
+                await self.limiter.acquire_async(host)
+                try:
+                    self.request_count += 1
+                    async with self.session.request(method, self._wire_url(url), params=params,
+                                                    headers=headers) as resp:
+                        body = await resp.read()
+                        result = FetchResult(url if self.url_rewriter else str(resp.url), resp.status,
+                                             resp.headers.copy(), body, resp.charset)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    last_error = FetchError(url, None, f"Request error for {url}: {e}")
+                    result = None
+            if result is not None:
+                if result.status_code in (429, 503):
+                    # The controller slows the host down and holds its bucket for
+                    # Retry-After, so the next attempt simply waits for a token
+                    self.rate_controller.on_throttled(host, result.headers.get('Retry-After'))
+                    last_error = FetchError(url, result.status_code)
+                    continue
+                if result.status_code < 500:
+                    self.rate_controller.on_success(host)
+                    if self.archive is not None and method == 'GET':
+                        await asyncio.to_thread(self.archive.record, normalize_url(url, params),
+                                                result.status_code, result.headers, result.content)
+                    if self.cache is not None and method == 'GET':
+                        if result.status_code == 304 and entry is not None:
+                            self.cache.revalidated += 1
+                            self.cache.refresh(entry)
+                            return _result_from_entry(entry)
+                        self.cache.misses += 1
+                        self.cache.store(url, params, result.status_code, result.headers, result.content)
+                    return result
+                last_error = FetchError(url, result.status_code)
+            if attempt < self.max_retries:
+                sleep_s = delay + random.uniform(0, delay / 4)
+                logger.warning(f"{last_error} (attempt {attempt}/{self.max_retries}); retrying in {sleep_s:.1f}s")
+                await asyncio.sleep(sleep_s)
+                delay *= 2
+        raise last_error
+
+    async def download(self, url: str, path: str, headers: Optional[Dict[str, str]] = None,
+                       chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> int:
+        """Stream a response body to path, chunk by chunk, through a temp file that is
+        renamed into place once complete; returns the number of bytes written.
+        Downloads bypass the response cache."""
+        await self.open()
+        host = host_of(url)
+        semaphore = self._semaphore(host)
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        delay = self.retry_delay
+        last_error = None
+        for attempt in range(1, self.max_retries + 1):
+            status = None
+            async with semaphore:
+                await self.limiter.acquire_async(host)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.download-', suffix='.part')
+                try:
+                    self.request_count += 1
+                    async with self.session.get(self._wire_url(url), headers=headers) as resp:
+                        status = resp.status
+                        retry_after = resp.headers.get('Retry-After')
+                        if status < 400:
+                            size = 0
+                            with os.fdopen(fd, 'wb') as f:
+                                fd = None
+                                async for chunk in resp.content.iter_chunked(chunk_size):
+                                    f.write(chunk)
+                                    size += len(chunk)
+                            os.replace(tmp_path, path)
+                            tmp_path = None
+                            self.rate_controller.on_success(host)
+                            return size
+                except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                    last_error = FetchError(url, status, f"Download error for {url}: {e}")
+                    status = None
+                finally:
+                    if fd is not None:
+                        os.close(fd)
+                    if tmp_path is not None and os.path.exists(tmp_path):
+                        os.unlink(tmp_path)
+            if status in (429, 503):
+                self.rate_controller.on_throttled(host, retry_after)
+                last_error = FetchError(url, status)
+                continue
+            if status is not None and status < 500:
+                self.rate_controller.on_success(host)
+                raise FetchError(url, status)
+            if status is not None:
+                last_error = FetchError(url, status)
+            if attempt < self.max_retries:
+                sleep_s = delay + random.uniform(0, delay / 4)
+                logger.warning(f"{last_error} (attempt {attempt}/{self.max_retries}); retrying in {sleep_s:.1f}s")
+                await asyncio.sleep(sleep_s)
+                delay *= 2
+        raise last_error
+
+    async def fetch_text(self, url: str, params: Optional[Dict[str, Any]] = None,
+                         encoding: Optional[str] = None) -> str:
+        """Fetch a page and return its decoded body, raising on HTTP errors"""
+        result = await self.fetch(url, params=params)
+        result.raise_for_status()
+        if encoding:
+            result.encoding = encoding
+        return result.text
+
+    async def map(self, func: Callable[[Any], Awaitable[Any]], items: Iterable[Any],
+                  max_in_flight: int = 8) -> List[Any]:
+        """Run func over items concurrently; exceptions are returned in place of results"""
+        gate = asyncio.Semaphore(max_in_flight)
+
+        async def run(item):
+            async with gate:
+                try:
+                    return await func(item)
+                except Exception as e:
+                    logger.error(f"Task failed for {item!r}: {e}")
+                    return e
+
+        return await asyncio.gather(*(run(item) for item in items))
@@ -4,12 +4,15 @@
 基于官方规格和权威网站信息
 """
 
-import psycopg2
+from change_buffer import ChangeBuffer
+from db_pool import pooled_connect
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DB_CONFIG = {'host': 'localhost', 'database': 'mobilephone_db', 'user': 'postgres'}
+
 # 缺失Dimensions的手机规格数据库
 MISSING_DIMENSIONS = {
     # Huawei系列
@@ -93,7 +96,7 @@ MISSING_DIMENSIONS = {
 def get_phones_missing_dimensions():
     """Get phones that are missing dimensions"""
     try:
-        conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+        conn = pooled_connect(**DB_CONFIG)
         cur = conn.cursor()
         
         cur.execute('''
@@ -114,24 +117,13 @@ def get_phones_missing_dimensions():
         logger.error(f"Database error: {e}")
         return []
 
-def update_dimensions(phone_id, brand, model, dimensions):
-    """Update phone with dimensions data"""
-    try:
-        conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
-        cur = conn.cursor()
-        
-        cur.execute('UPDATE "Phones" SET "Dimensions" = %s WHERE "Id" = %s', (dimensions, phone_id))
-        conn.commit()
-        
-        cur.close()
-        conn.close()
-        
+def update_dimensions(buffer, phone_id, brand, model, dimensions):
+    """Propose dimensions data for a phone; identical values are not rewritten"""
+    if buffer.propose(phone_id, {'Dimensions': dimensions}):
         logger.info(f"✅ Updated {brand} {model}: {dimensions}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Database update error for {brand} {model}: {e}")
-        return False
+    else:
+        logger.info(f"➖ {brand} {model} already up to date")
+    return True
 
 def fill_missing_dimensions():
     """Main function to fill missing dimensions"""
@@ -144,19 +136,21 @@ def fill_missing_dimensions():
     success_count = 0
     no_data_count = 0
     
-    for phone_id, brand, model in phones:
-        full_name = f"{brand} {model}"
-        logger.info(f"\n📱 Processing: {full_name}")
+    with ChangeBuffer(DB_CONFIG, ('Dimensions',)) as buffer:
+        buffer.load(phone_id for phone_id, _, _ in phones)
+        for phone_id, brand, model in phones:
+            full_name = f"{brand} {model}"
+            logger.info(f"\n📱 Processing: {full_name}")
         
-        if full_name in MISSING_DIMENSIONS:
-            dimensions = MISSING_DIMENSIONS[full_name]
-            if update_dimensions(phone_id, brand, model, dimensions):
-                success_count += 1
+            if full_name in MISSING_DIMENSIONS:
+                dimensions = MISSING_DIMENSIONS[full_name]
+                if update_dimensions(buffer, phone_id, brand, model, dimensions):
+                    success_count += 1
+                else:
+                    logger.error(f"❌ Failed to update {full_name}")
             else:
-                logger.error(f"❌ Failed to update {full_name}")
-        else:
-            logger.warning(f"⚠️ No dimensions data for {full_name}")
-            no_data_count += 1
+                logger.warning(f"⚠️ No dimensions data for {full_name}")
+                no_data_count += 1
     
     logger.info(f"\n🎯 Missing Dimensions Fill completed!")
     logger.info(f"✅ Updated: {success_count}")
@@ -5,14 +5,15 @@ Correctly extracts internal memory specs from GSMArena
 """
 
 import requests
-import time
 import json
-import psycopg2
+from db_pool import pooled_connect
 import os
-from bs4 import BeautifulSoup
 import logging
-from urllib.parse import urljoin, quote
-import re
+from urllib.parse import quote
+from model_matcher import best_match
+from phone_index import indexed_search, search_candidates
+from response_cache import CachedSession
+from gsmarena_parser import get_spec_store
 
 # Configure logging
 logging.basicConfig(
@@ -28,7 +29,7 @@ logger = logging.getLogger(__name__)
 class FinalStorageFix:
     def __init__(self, db_config):
         self.db_config = db_config
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -38,11 +39,12 @@ class FinalStorageFix:
             'Upgrade-Insecure-Requests': '1',
         })
         self.base_url = "https://www.gsmarena.com"
+        self.spec_records = get_spec_store()
         
     def get_phones_with_wrong_storage(self):
         """Get phones that have 'Card slot' as Storage"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cur = conn.cursor()
             
             query = '''
@@ -66,6 +68,7 @@ class FinalStorageFix:
             logger.error(f"Database error: {e}")
             return []
     
+    @indexed_search()
     def search_phone_on_gsmarena(self, brand, model):
         """Search for phone on GSMArena"""
         try:
@@ -78,36 +81,10 @@ class FinalStorageFix:
             response = self.session.get(search_url, timeout=10)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for phone links in search results
-            phone_links = soup.find_all('a', href=re.compile(r'\.php$'))
-            
-            for link in phone_links:
-                href = link.get('href', '')
-                link_text = link.get_text(strip=True).lower()
-                
-                # Check if this link matches our phone
-                brand_lower = brand.lower()
-                model_lower = model.lower()
-                
-                # Handle special cases
-                if brand_lower == 'oneplus':
-                    brand_patterns = ['oneplus', 'one plus']
-                elif brand_lower == 'oppo':
-                    brand_patterns = ['oppo']
-                elif brand_lower == 'samsung':
-                    brand_patterns = ['samsung']
-                else:
-                    brand_patterns = [brand_lower]
-                
-                # Check if brand matches
-                brand_match = any(pattern in link_text for pattern in brand_patterns)
-                
-                if brand_match and any(word in link_text for word in model_lower.split()):
-                    phone_url = urljoin(self.base_url, href)
-                    logger.info(f"Found match: {phone_url}")
-                    return phone_url
+            match = best_match(brand, model, search_candidates(response.content, self.base_url))
+            if match:
+                logger.info(f"Found match: {match.name} -> {match.url} (confidence {match.confidence:.2f})")
+                return match.url
             
             logger.warning(f"No product page found for {brand} {model}")
             return None
@@ -125,49 +102,33 @@ class FinalStorageFix:
     def extract_correct_storage_specs(self, phone_url):
         """Extract correct internal memory specs from GSMArena phone page"""
         try:
-            response = self.session.get(phone_url, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            record = self.spec_records.get(self.session, phone_url)
             
             specs = {}
             
             # Method 1: Look for data-spec="internalmemory"
-            internal_memory_cell = soup.find('td', {'data-spec': 'internalmemory'})
-            if internal_memory_cell:
-                internal_memory = internal_memory_cell.get_text(strip=True)
+            internal_memory = record.spec('internalmemory')
+            if internal_memory:
                 specs['storage'] = internal_memory
                 logger.info(f"✅ Found internal memory: {internal_memory}")
             
             # Method 2: Look for data-spec="memoryslot" for RAM info
-            memory_slot_cell = soup.find('td', {'data-spec': 'memoryslot'})
-            if memory_slot_cell:
-                memory_slot = memory_slot_cell.get_text(strip=True)
+            memory_slot = record.spec('memoryslot')
+            if memory_slot:
                 specs['ram'] = memory_slot
                 logger.info(f"✅ Found memory slot: {memory_slot}")
             
             # Method 3: If method 1 failed, look in table structure
             if not specs.get('storage'):
                 # Look for "Internal" row in the specs table
-                tables = soup.find_all('table')
-                for table in tables:
-                    rows = table.find_all('tr')
-                    for row in rows:
-                        cells = row.find_all(['td', 'th'])
-                        if len(cells) >= 2:
-                            key_cell = cells[0]
-                            value_cell = cells[1]
-                            
-                            # Check if this is the internal memory row
-                            if 'internal' in key_cell.get_text().lower():
-                                internal_value = value_cell.get_text(strip=True)
-                                # Validate that this looks like memory specs (contains GB and RAM)
-                                if 'GB' in internal_value and 'RAM' in internal_value:
-                                    specs['storage'] = internal_value
-                                    logger.info(f"✅ Found internal memory (table method): {internal_value}")
-                                    break
-                    if specs.get('storage'):
-                        break
+                for key, internal_value in record.pairs():
+                    # Check if this is the internal memory row
+                    if 'internal' in key.lower():
+                        # Validate that this looks like memory specs (contains GB and RAM)
+                        if 'GB' in internal_value and 'RAM' in internal_value:
+                            specs['storage'] = internal_value
+                            logger.info(f"✅ Found internal memory (table method): {internal_value}")
+                            break
             
             logger.info(f"Extracted specs for {phone_url}: {specs}")
             return specs
@@ -179,7 +140,7 @@ class FinalStorageFix:
     def update_phone_correct_storage(self, phone_id, specs):
         """Update phone with correct Storage and RAM data"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cur = conn.cursor()
             
             # Build update query for Storage and RAM
@@ -253,9 +214,6 @@ class FinalStorageFix:
             else:
                 fail_count += 1
                 logger.error(f"❌ Failed to update {brand} {model}")
-            
-            # Add delay between requests
-            time.sleep(4)
         
         logger.info(f"\n🎯 Storage Fix completed!")
         logger.info(f"✅ Success: {success_count}")
@@ -4,12 +4,14 @@
 按照Samsung Note20的标准进行修复
 """
 
-import requests
-import time
-import psycopg2
-from bs4 import BeautifulSoup
+from batch_writer import PhoneBatchWriter
+from db_pool import pooled_connect
 import logging
 import re
+from model_matcher import best_match
+from phone_index import indexed_search, search_candidates
+from response_cache import CachedSession
+from gsmarena_parser import get_spec_store
 
 # Configure logging
 logging.basicConfig(
@@ -22,9 +24,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+DB_CONFIG = {'host': 'localhost', 'database': 'mobilephone_db', 'user': 'postgres'}
+
 class AppleSpecsFixer:
     def __init__(self):
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -32,15 +36,13 @@ class AppleSpecsFixer:
             'Connection': 'keep-alive',
         })
         self.base_url = "https://www.gsmarena.com"
+        self.spec_records = get_spec_store()
+        self.writer = PhoneBatchWriter(DB_CONFIG)
         
     def get_apple_phones(self):
         """Get Apple phones that need fixing"""
         try:
-            conn = psycopg2.connect(
-                host='localhost',
-                database='mobilephone_db',
-                user='postgres'
-            )
+            conn = pooled_connect(**DB_CONFIG)
             cur = conn.cursor()
             
             cur.execute('''
@@ -63,6 +65,7 @@ class AppleSpecsFixer:
             logger.error(f"Database error: {e}")
             return []
     
+    @indexed_search(brand='Apple')
     def search_iphone_on_gsmarena(self, model):
         """Search for iPhone on GSMArena"""
         try:
@@ -74,22 +77,10 @@ class AppleSpecsFixer:
             response = self.session.get(search_url, timeout=10)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for iPhone links
-            phone_links = soup.find_all('a', href=re.compile(r'apple.*\.php$'))
-            
-            for link in phone_links:
-                href = link.get('href', '')
-                link_text = link.get_text(strip=True).lower()
-                
-                # Check if this matches our iPhone model
-                model_lower = model.lower()
-                
-                if 'iphone' in link_text and any(word in link_text for word in model_lower.split()):
-                    phone_url = f"{self.base_url}/{href}"
-                    logger.info(f"Found match: {phone_url}")
-                    return phone_url
+            match = best_match('Apple', model, search_candidates(response.content, self.base_url))
+            if match:
+                logger.info(f"Found match: {match.name} -> {match.url} (confidence {match.confidence:.2f})")
+                return match.url
             
             logger.warning(f"No product page found for Apple {model}")
             return None
@@ -101,45 +92,34 @@ class AppleSpecsFixer:
     def extract_iphone_specs(self, phone_url):
         """Extract iPhone specs from GSMArena"""
         try:
-            response = self.session.get(phone_url, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            record = self.spec_records.get(self.session, phone_url)
             data = {}
             
             # Extract Screen Size
-            screen_elem = soup.find('span', {'data-spec': 'displaysize-hl'})
-            if screen_elem:
-                screen_text = screen_elem.get_text(strip=True)
+            screen_text = record.spec('displaysize-hl')
+            if screen_text:
                 screen_match = re.search(r'(\d+\.?\d*)"', screen_text)
                 if screen_match:
                     data['screen_size'] = screen_match.group(1) + '"'
                     logger.info(f"✅ Screen Size: {data['screen_size']}")
             
             # Extract RAM - for iPhones this might be in different places
-            ram_elem = soup.find('span', {'data-spec': 'ramsize-hl'})
-            if ram_elem:
-                ram_text = ram_elem.get_text(strip=True)
+            ram_text = record.spec('ramsize-hl')
+            if ram_text:
                 data['ram'] = ram_text
                 logger.info(f"✅ RAM: {data['ram']}")
             else:
                 # For iPhones, RAM might not be prominently displayed
                 # Let's try to extract from specs table
-                specs_tables = soup.find_all('table')
-                for table in specs_tables:
-                    for row in table.find_all('tr'):
-                        cells = row.find_all(['td', 'th'])
-                        if len(cells) >= 2:
-                            if 'memory' in cells[0].get_text().lower() and 'ram' in cells[0].get_text().lower():
-                                ram_text = cells[1].get_text(strip=True)
-                                data['ram'] = ram_text
-                                logger.info(f"✅ RAM (from table): {data['ram']}")
-                                break
+                for key, value in record.pairs():
+                    if 'memory' in key.lower() and 'ram' in key.lower():
+                        data['ram'] = value
+                        logger.info(f"✅ RAM (from table): {data['ram']}")
+                        break
             
             # Extract Battery
-            battery_elem = soup.find('span', {'data-spec': 'batsize-hl'})
-            if battery_elem:
-                battery_text = battery_elem.get_text(strip=True)
+            battery_text = record.spec('batsize-hl')
+            if battery_text:
                 # Extract mAh value
                 battery_match = re.search(r'(\d+)\s*mAh', battery_text)
                 if battery_match:
@@ -147,9 +127,8 @@ class AppleSpecsFixer:
                     logger.info(f"✅ Battery: {data['battery']}")
             
             # Extract Storage (Internal Memory)
-            storage_elem = soup.find('span', {'data-spec': 'internalmemory'})
-            if storage_elem:
-                storage_text = storage_elem.get_text(strip=True)
+            storage_text = record.spec('internalmemory')
+            if storage_text:
                 data['storage'] = storage_text
                 logger.info(f"✅ Storage: {data['storage']}")
             
@@ -160,51 +139,27 @@ class AppleSpecsFixer:
             return {}
     
     def update_iphone_specs(self, phone_id, data):
-        """Update iPhone with extracted specs"""
-        try:
-            conn = psycopg2.connect(
-                host='localhost',
-                database='mobilephone_db',
-                user='postgres'
-            )
-            cur = conn.cursor()
-            
-            update_fields = []
-            values = []
-            
-            if data.get('screen_size'):
-                update_fields.append('"ScreenSize" = %s')
-                values.append(data['screen_size'])
-            
-            if data.get('ram'):
-                update_fields.append('"Ram" = %s')
-                values.append(data['ram'])
-            
-            if data.get('battery'):
-                update_fields.append('"Battery" = %s')
-                values.append(data['battery'])
-            
-            if data.get('storage'):
-                update_fields.append('"Storage" = %s')
-                values.append(data['storage'])
-            
-            if update_fields:
-                query = f'UPDATE "Phones" SET {", ".join(update_fields)} WHERE "Id" = %s'
-                values.append(phone_id)
-                
-                cur.execute(query, values)
-                conn.commit()
-                
-                logger.info(f"✅ Updated phone {phone_id} with {len(update_fields)} fields")
-                return True
-            
-            cur.close()
-            conn.close()
-            return False
-                
-        except Exception as e:
-            logger.error(f"Database update error for phone {phone_id}: {e}")
+        """Queue the extracted specs for the next batched write"""
+        fields = {}
+        
+        if data.get('screen_size'):
+            fields['ScreenSize'] = data['screen_size']
+        
+        if data.get('ram'):
+            fields['Ram'] = data['ram']
+        
+        if data.get('battery'):
+            fields['Battery'] = data['battery']
+        
+        if data.get('storage'):
+            fields['Storage'] = data['storage']
+        
+        if not fields:
             return False
+        
+        self.writer.update(phone_id, fields)
+        logger.info(f"✅ Queued update of phone {phone_id} with {len(fields)} fields")
+        return True
     
     def fix_apple_specs(self):
         """Main method to fix Apple iPhone specs"""
@@ -243,10 +198,8 @@ class AppleSpecsFixer:
             else:
                 fail_count += 1
                 logger.error(f"❌ Failed to update Apple {model}")
-            
-            # Add delay between requests
-            time.sleep(4)
         
+        self.writer.flush()
         logger.info(f"\n🎯 Apple iPhone Fix completed!")
         logger.info(f"✅ Success: {success_count}")
         logger.info(f"❌ Failed: {fail_count}")
@@ -7,14 +7,15 @@
 """
 
 import requests
-import time
 import json
-import psycopg2
+from db_pool import pooled_connect
 import os
-from bs4 import BeautifulSoup
 import logging
-from urllib.parse import urljoin, quote
-import re
+from urllib.parse import quote
+from model_matcher import best_match
+from phone_index import indexed_search, search_candidates
+from response_cache import CachedSession
+from gsmarena_parser import get_spec_store
 
 # Configure logging
 logging.basicConfig(
@@ -30,7 +31,7 @@ logger = logging.getLogger(__name__)
 class CameraOSImagesFixer:
     def __init__(self, db_config):
         self.db_config = db_config
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -40,11 +41,12 @@ class CameraOSImagesFixer:
             'Upgrade-Insecure-Requests': '1',
         })
         self.base_url = "https://www.gsmarena.com"
+        self.spec_records = get_spec_store()
         
     def get_phones_to_fix(self):
         """Get phones that need Camera/OS/Images fixes"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cur = conn.cursor()
             
             query = '''
@@ -69,6 +71,7 @@ class CameraOSImagesFixer:
             logger.error(f"Database error: {e}")
             return []
     
+    @indexed_search()
     def search_phone_on_gsmarena(self, brand, model):
         """Search for phone on GSMArena"""
         try:
@@ -81,36 +84,10 @@ class CameraOSImagesFixer:
             response = self.session.get(search_url, timeout=10)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for phone links in search results
-            phone_links = soup.find_all('a', href=re.compile(r'\.php$'))
-            
-            for link in phone_links:
-                href = link.get('href', '')
-                link_text = link.get_text(strip=True).lower()
-                
-                # Check if this link matches our phone
-                brand_lower = brand.lower()
-                model_lower = model.lower()
-                
-                # Handle special cases
-                if brand_lower == 'oneplus':
-                    brand_patterns = ['oneplus', 'one plus']
-                elif brand_lower == 'oppo':
-                    brand_patterns = ['oppo']
-                elif brand_lower == 'samsung':
-                    brand_patterns = ['samsung']
-                else:
-                    brand_patterns = [brand_lower]
-                
-                # Check if brand matches
-                brand_match = any(pattern in link_text for pattern in brand_patterns)
-                
-                if brand_match and any(word in link_text for word in model_lower.split()):
-                    phone_url = urljoin(self.base_url, href)
-                    logger.info(f"Found match: {phone_url}")
-                    return phone_url
+            match = best_match(brand, model, search_candidates(response.content, self.base_url))
+            if match:
+                logger.info(f"Found match: {match.name} -> {match.url} (confidence {match.confidence:.2f})")
+                return match.url
             
             logger.warning(f"No product page found for {brand} {model}")
             return None
@@ -128,25 +105,22 @@ class CameraOSImagesFixer:
     def extract_camera_os_image_data(self, phone_url, brand):
         """Extract Camera, OS and Image data from GSMArena phone page"""
         try:
-            response = self.session.get(phone_url, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            record = self.spec_records.get(self.session, phone_url)
+            page_text = record.text
             
             data = {}
             
             # 1. Extract Camera information
             # Method 1: Look for camera specs in highlights
-            camera_elem = soup.find('span', {'data-spec': 'camerapixels-hl'})
-            if camera_elem:
-                camera_text = camera_elem.get_text(strip=True)
+            camera_text = record.spec('camerapixels-hl')
+            if camera_text:
                 # Try to determine camera count based on MP info
                 if 'MP' in camera_text:
                     mp_value = camera_text.replace('MP', '').strip()
                     # This is a simplified approach - could be improved
-                    if '+' in mp_value or 'Triple' in soup.get_text() or 'triple' in soup.get_text().lower():
+                    if '+' in mp_value or 'Triple' in page_text or 'triple' in page_text.lower():
                         data['camera'] = 'Triple'
-                    elif 'Dual' in soup.get_text() or 'dual' in soup.get_text().lower():
+                    elif 'Dual' in page_text or 'dual' in page_text.lower():
                         data['camera'] = 'Dual'
                     else:
                         data['camera'] = 'Single'
@@ -155,19 +129,18 @@ class CameraOSImagesFixer:
             # Method 2: Look for camera info in detailed specs
             if not data.get('camera'):
                 # Search for camera specifications in the page
-                page_text = soup.get_text().lower()
-                if 'triple' in page_text or '3 cam' in page_text:
+                lower_text = page_text.lower()
+                if 'triple' in lower_text or '3 cam' in lower_text:
                     data['camera'] = 'Triple'
-                elif 'dual' in page_text or '2 cam' in page_text:
+                elif 'dual' in lower_text or '2 cam' in lower_text:
                     data['camera'] = 'Dual'
                 else:
                     data['camera'] = 'Single'  # Default assumption
                 logger.info(f"✅ Camera (from text): {data['camera']}")
             
             # 2. Extract Operating System
-            os_elem = soup.find('span', {'data-spec': 'os-hl'})
-            if os_elem:
-                os_text = os_elem.get_text(strip=True)
+            os_text = record.spec('os-hl')
+            if os_text:
                 data['os'] = os_text
                 logger.info(f"✅ OS: {os_text}")
             else:
@@ -180,10 +153,9 @@ class CameraOSImagesFixer:
             
             # 3. Extract Product Image
             # Look for the main product image
-            img_elements = soup.find_all('img')
-            for img in img_elements:
-                src = img.get('src', '')
-                alt = img.get('alt', '').lower()
+            for img in record.images:
+                src = img['src']
+                alt = img['alt'].lower()
                 
                 # Look for main product images
                 if (('phone' in alt or 'smartphone' in alt or brand.lower() in alt) 
@@ -198,8 +170,8 @@ class CameraOSImagesFixer:
             
             # Fallback: look for any large image
             if not data.get('image_url'):
-                for img in img_elements:
-                    src = img.get('src', '')
+                for img in record.images:
+                    src = img['src']
                     if (('.jpg' in src or '.png' in src or '.webp' in src)
                         and src.startswith('http')
                         and 'logo' not in src.lower()
@@ -218,7 +190,7 @@ class CameraOSImagesFixer:
     def update_phone_data(self, phone_id, data):
         """Update phone with Camera, OS and Image data"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cur = conn.cursor()
             
             # Build update query
@@ -296,9 +268,6 @@ class CameraOSImagesFixer:
             else:
                 fail_count += 1
                 logger.error(f"❌ Failed to update {brand} {model}")
-            
-            # Add delay between requests
-            time.sleep(4)
         
         logger.info(f"\n🎯 Camera/OS/Images Fix completed!")
         logger.info(f"✅ Success: {success_count}")
@@ -4,7 +4,7 @@ Fix database schema for flagship phones
 Expand field lengths to accommodate detailed specifications from GSMArena
 """
 
-import psycopg2
+from db_pool import pooled_connect
 
 def fix_database_schema():
     """Fix database field lengths for flagship phone specifications"""
@@ -33,7 +33,7 @@ def fix_database_schema():
     ]
     
     try:
-        with psycopg2.connect(connection_string) as conn:
+        with pooled_connect(connection_string) as conn:
             with conn.cursor() as cur:
                 print("Expanding field lengths...")
                 
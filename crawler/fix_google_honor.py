@@ -5,7 +5,7 @@
 
 import requests
 import time
-import psycopg2
+from db_pool import pooled_connect
 from bs4 import BeautifulSoup
 import logging
 import re
@@ -59,7 +59,7 @@ def main():
     
     # Show current missing data status
     try:
-        conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+        conn = pooled_connect(host='localhost', database='mobilephone_db', user='postgres')
         cur = conn.cursor()
         
         cur.execute('''
@@ -4,7 +4,7 @@
 使用官方iPhone规格数据，不依赖GSMArena抓取
 """
 
-import psycopg2
+from db_pool import pooled_connect
 import logging
 
 # Configure logging
@@ -145,7 +145,7 @@ IPHONE_SPECS = {
 def get_iphones_to_fix():
     """Get iPhone models that need fixing"""
     try:
-        conn = psycopg2.connect(
+        conn = pooled_connect(
             host='localhost',
             database='mobilephone_db',
             user='postgres'
@@ -174,7 +174,7 @@ def get_iphones_to_fix():
 def update_iphone_specs(phone_id, model, specs):
     """Update iPhone with correct specs"""
     try:
-        conn = psycopg2.connect(
+        conn = pooled_connect(
             host='localhost',
             database='mobilephone_db',
             user='postgres'
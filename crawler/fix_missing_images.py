@@ -4,17 +4,20 @@ Fix missing image paths
 Change non-existent local image paths to appropriate placeholders
 """
 
-import psycopg2
-import os
+from db_pool import pooled_connect
 import logging
+from batch_writer import PhoneBatchWriter
+from image_manifest import get_image_manifest
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DB_CONFIG = {'host': 'localhost', 'database': 'mobilephone_db', 'user': 'postgres'}
+
 def fix_missing_image_paths():
     """修复缺失的图片路径"""
     try:
-        conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+        conn = pooled_connect(**DB_CONFIG)
         cur = conn.cursor()
         
         # 获取所有本地图片路径
@@ -25,28 +28,22 @@ def fix_missing_image_paths():
         ''')
         
         local_images = cur.fetchall()
-        images_dir = "/Users/shenmeidun/UoW_IT/COMPX576/MobilePhone/images/phones"
+        cur.close()
+        conn.close()
         
+        # 一次扫描 images/ 目录, 逐行检查只是字典查找
+        manifest = get_image_manifest()
         fixed_count = 0
         
-        for phone_id, brand, model, image_url in local_images:
-            # 提取文件名
-            filename = image_url.split('/')[-1]
-            local_path = os.path.join(images_dir, filename)
-            
-            # 检查文件是否存在
-            if not os.path.exists(local_path):
-                # 生成一个更好的placeholder
-                placeholder_url = f"https://via.placeholder.com/400x600/667eea/FFFFFF?text={brand}+{model}".replace(' ', '+')
-                
-                # 更新数据库
-                cur.execute('UPDATE "Phones" SET "ImageUrl" = %s WHERE "Id" = %s', (placeholder_url, phone_id))
-                logger.info(f"Fixed missing image: {brand} {model}")
-                fixed_count += 1
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        with PhoneBatchWriter(DB_CONFIG) as writer:
+            for phone_id, brand, model, image_url in local_images:
+                # 检查文件是否存在
+                if not manifest.exists(image_url):
+                    # 生成一个更好的placeholder
+                    placeholder_url = f"https://via.placeholder.com/400x600/667eea/FFFFFF?text={brand}+{model}".replace(' ', '+')
+                    writer.update(phone_id, {'ImageUrl': placeholder_url})
+                    logger.info(f"Fixed missing image: {brand} {model}")
+                    fixed_count += 1
         
         logger.info(f"✅ Fixed {fixed_count} missing image paths")
         
@@ -5,7 +5,7 @@ Change phones with corresponding image files from placeholder to local image pat
 """
 
 import os
-import psycopg2
+from db_pool import pooled_connect
 import logging
 from pathlib import Path
 
@@ -16,7 +16,7 @@ def fix_placeholder_images():
     """将有图片文件的placeholder链接改为本地路径"""
     try:
         # 连接数据库
-        conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+        conn = pooled_connect(host='localhost', database='mobilephone_db', user='postgres')
         cur = conn.cursor()
         
         # 获取所有placeholder记录
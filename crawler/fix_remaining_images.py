@@ -5,7 +5,7 @@ Handle filename format mismatches
 """
 
 import os
-import psycopg2
+from db_pool import pooled_connect
 import logging
 from pathlib import Path
 
@@ -16,7 +16,7 @@ def fix_remaining_images():
     """Fix remaining image path matching issues"""
     try:
         # Connect to database
-        conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+        conn = pooled_connect(host='localhost', database='mobilephone_db', user='postgres')
         cur = conn.cursor()
         
         # 图片目录
@@ -5,14 +5,17 @@ Specifically targets Storage and RAM data for Samsung/OnePlus/OPPO phones
 """
 
 import requests
-import time
 import json
-import psycopg2
+from db_pool import pooled_connect
 import os
-from bs4 import BeautifulSoup
 import logging
-from urllib.parse import urljoin, quote
+from urllib.parse import quote
 import re
+from model_matcher import best_match
+from phone_index import indexed_search, search_candidates
+from response_cache import CachedSession
+from spec_fields import STORAGE_RAM_RULES
+from gsmarena_parser import get_spec_store
 
 # Configure logging
 logging.basicConfig(
@@ -28,7 +31,7 @@ logger = logging.getLogger(__name__)
 class FixStorageRamCrawler:
     def __init__(self, db_config):
         self.db_config = db_config
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -38,11 +41,12 @@ class FixStorageRamCrawler:
             'Upgrade-Insecure-Requests': '1',
         })
         self.base_url = "https://www.gsmarena.com"
+        self.spec_records = get_spec_store()
         
     def get_phones_missing_storage_ram(self):
         """Get phones that have NetworkType but missing Storage/RAM"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cur = conn.cursor()
             
             query = '''
@@ -67,6 +71,7 @@ class FixStorageRamCrawler:
             logger.error(f"Database error: {e}")
             return []
     
+    @indexed_search()
     def search_phone_on_gsmarena(self, brand, model):
         """Search for phone on GSMArena"""
         try:
@@ -79,36 +84,10 @@ class FixStorageRamCrawler:
             response = self.session.get(search_url, timeout=10)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for phone links in search results
-            phone_links = soup.find_all('a', href=re.compile(r'\.php$'))
-            
-            for link in phone_links:
-                href = link.get('href', '')
-                link_text = link.get_text(strip=True).lower()
-                
-                # Check if this link matches our phone
-                brand_lower = brand.lower()
-                model_lower = model.lower()
-                
-                # Handle special cases
-                if brand_lower == 'oneplus':
-                    brand_patterns = ['oneplus', 'one plus']
-                elif brand_lower == 'oppo':
-                    brand_patterns = ['oppo']
-                elif brand_lower == 'samsung':
-                    brand_patterns = ['samsung']
-                else:
-                    brand_patterns = [brand_lower]
-                
-                # Check if brand matches
-                brand_match = any(pattern in link_text for pattern in brand_patterns)
-                
-                if brand_match and any(word in link_text for word in model_lower.split()):
-                    phone_url = urljoin(self.base_url, href)
-                    logger.info(f"Found match: {phone_url}")
-                    return phone_url
+            match = best_match(brand, model, search_candidates(response.content, self.base_url))
+            if match:
+                logger.info(f"Found match: {match.name} -> {match.url} (confidence {match.confidence:.2f})")
+                return match.url
             
             logger.warning(f"No product page found for {brand} {model}")
             return None
@@ -126,71 +105,24 @@ class FixStorageRamCrawler:
     def extract_storage_ram_specs(self, phone_url):
         """Extract Storage and RAM specs from phone page"""
         try:
-            response = self.session.get(phone_url, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            specs = {}
+            record = self.spec_records.get(self.session, phone_url)
             
             # Look for memory/storage information in various places
-            # Method 1: Look in the main specs table
-            spec_tables = soup.find_all('table')
-            for table in spec_tables:
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    if len(cells) >= 2:
-                        key = cells[0].get_text(strip=True).lower()
-                        value = cells[1].get_text(strip=True)
-                        
-                        # Look for internal storage / memory
-                        if any(term in key for term in ['internal', 'storage', 'memory']) and not any(term in key for term in ['card', 'external', 'slot']):
-                            if not specs.get('storage'):
-                                specs['storage'] = value
-                                logger.info(f"Found storage: {value}")
-                        
-                        # Look for card slot / RAM info
-                        elif any(term in key for term in ['card slot', 'microsd', 'memory card']):
-                            if not specs.get('ram'):
-                                specs['ram'] = value
-                                logger.info(f"Found RAM info: {value}")
+            # Method 1: Look in the main specs table (internal memory vs. card slot rows)
+            specs = STORAGE_RAM_RULES.apply(record.pairs())
             
             # Method 2: Look for memory info in the quick specs section
-            quick_spec_divs = soup.find_all('div', class_='help-display')
-            for div in quick_spec_divs:
-                text = div.get_text(strip=True)
+            for text in record.quick_specs:
                 # Look for patterns like "128GB 6GB RAM"
                 if re.search(r'\d+GB.*RAM', text, re.IGNORECASE):
                     if not specs.get('storage'):
                         specs['storage'] = text
                         logger.info(f"Found storage in quick specs: {text}")
             
-            # Method 3: Look in the detailed specifications sections
-            spec_sections = soup.find_all(['table', 'div'], class_=['st', 'specs'])
-            for section in spec_sections:
-                section_text = section.get_text().lower()
-                if 'memory' in section_text or 'storage' in section_text:
-                    rows = section.find_all('tr')
-                    for row in rows:
-                        cells = row.find_all(['td', 'th'])
-                        if len(cells) >= 2:
-                            key = cells[0].get_text(strip=True).lower()
-                            value = cells[1].get_text(strip=True)
-                            
-                            if 'internal' in key and not specs.get('storage'):
-                                specs['storage'] = value
-                                logger.info(f"Found detailed storage: {value}")
-                            elif 'card slot' in key and not specs.get('ram'):
-                                specs['ram'] = value  
-                                logger.info(f"Found detailed RAM: {value}")
-            
-            # Method 4: Try to extract from the phone title/header area
-            title_area = soup.find('div', class_='specs-phone-name-title')
-            if title_area:
-                title_text = title_area.get_text()
+            # Method 3: Try to extract from the phone title/header area
+            if record.name:
                 # Look for storage patterns in title
-                storage_match = re.search(r'(\d+GB[^,]*)', title_text)
+                storage_match = re.search(r'(\d+GB[^,]*)', record.name)
                 if storage_match and not specs.get('storage'):
                     specs['storage'] = storage_match.group(1)
                     logger.info(f"Found storage in title: {storage_match.group(1)}")
@@ -205,7 +137,7 @@ class FixStorageRamCrawler:
     def update_phone_storage_ram(self, phone_id, specs):
         """Update phone with Storage and RAM data"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cur = conn.cursor()
             
             # Build update query for Storage and RAM only
@@ -279,9 +211,6 @@ class FixStorageRamCrawler:
             else:
                 fail_count += 1
                 logger.error(f"❌ Failed to update {brand} {model}")
-            
-            # Add delay between requests
-            time.sleep(4)  # Slightly longer delay for safety
         
         logger.info(f"\n🎯 Storage/RAM Fix completed!")
         logger.info(f"✅ Success: {success_count}")
@@ -4,7 +4,7 @@ Flagship Phone Database Rebuild for 2020-2024
 Includes flagship models from Apple, Samsung, Google, Sony, Xiaomi, OPPO, vivo, OnePlus, ASUS, Huawei, Honor
 """
 
-import psycopg2
+from db_pool import pooled_connect
 import json
 
 def get_flagship_phones_2020_2024():
@@ -328,7 +328,7 @@ def rebuild_flagship_database(connection_string: str):
         print(f"   {year}: {years[year]} models")
     
     try:
-        with psycopg2.connect(connection_string) as conn:
+        with pooled_connect(connection_string) as conn:
             with conn.cursor() as cur:
                 # Clear existing data
                 cur.execute('DELETE FROM "Phones"')
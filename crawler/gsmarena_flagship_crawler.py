@@ -5,16 +5,31 @@ Crawls detailed specifications and images for 167 flagship phones from GSMArena
 Optimized for the standardized flagship phone database (2020-2024)
 """
 
+import argparse
+import asyncio
+from functools import partial
 import requests
-import time
 import json
-import psycopg2
+from db_pool import pooled_connect
 import os
-from bs4 import BeautifulSoup
 import logging
-from urllib.parse import urljoin, quote
+from urllib.parse import quote
 import re
 
+from batch_writer import PhoneBatchWriter
+from crawl_jobs import DONE, get_job_ledger
+from crawl_scheduler import get_crawl_scheduler
+from fetch_engine import FetchEngine
+from gsmarena_parser import get_spec_store
+from image_downloads import save_response
+from image_store import store_download
+from model_matcher import best_match
+from page_fingerprint import get_fingerprint_store, spec_fingerprint
+from pipeline import Pipeline, Stage
+from phone_index import get_phone_index, indexed_search, search_candidates
+from response_cache import CachedSession
+from spec_fields import GSMARENA_RULES, YEAR_RE, parse_year
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,10 +41,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+FINGERPRINT_SOURCE = 'gsmarena'
+
 class GSMArenaFlagshipCrawler:
-    def __init__(self, db_config):
+    def __init__(self, db_config, refresh=False, budget=None):
         self.db_config = db_config
-        self.session = requests.Session()
+        # refresh: re-check every phone's page, skipping those whose content fingerprint is unchanged
+        # budget: re-check only the phones the staleness scheduler picks within this many requests
+        self.refresh = refresh or budget is not None
+        self.budget = budget
+        self._reserved = 0          # estimated requests of the phones admitted under the budget
+        self._over_budget = 0       # scheduled phones turned away once it was spent
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -41,6 +64,13 @@ class GSMArenaFlagshipCrawler:
         })
         self.base_url = "https://www.gsmarena.com"
         self.search_url = "https://www.gsmarena.com/results.php3"
+        self.spec_records = get_spec_store()
+        self.phone_index = get_phone_index()
+        self.writer = PhoneBatchWriter(db_config)
+        self.jobs = get_job_ledger('gsmarena_flagship')
+        self.fingerprints = get_fingerprint_store()
+        self.scheduler = get_crawl_scheduler('gsmarena_flagship', list(self.FIELD_MAPPING.values()))
+        self._queued_fingerprints = {}
         
         # Create images directory
         self.images_dir = os.path.join("..", "..", "images", "phones")
@@ -78,87 +108,15 @@ class GSMArenaFlagshipCrawler:
         
         return model.strip()
     
+    @indexed_search()
     def search_phone_on_gsmarena(self, brand, model):
         """Search for phone on GSMArena and return the product page URL"""
         try:
-            # Normalize model for search
-            search_model = self.normalize_model_for_search(brand, model)
-            search_query = f"{brand} {search_model}"
-            
-            logger.info(f"Searching GSMArena for: {search_query}")
-            
             # Search on GSMArena
-            params = {
-                'sQuickSearch': 'yes',
-                'sName': search_query
-            }
-            
-            response = self.session.get(self.search_url, params=params, timeout=15)
+            response = self.session.get(self.search_url, params=self.search_params(brand, model), timeout=15)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for phone links in search results
-            phone_links = soup.find_all('a', href=True)
-            
-            for link in phone_links:
-                href = link.get('href')
-                if href and href.endswith('.php'):
-                    # Check if this is a phone detail page
-                    link_text = link.get_text(strip=True).lower()
-                    
-                    # Match criteria: contains brand and key model terms
-                    brand_match = brand.lower() in link_text
-                    
-                    # Extract key model identifiers
-                    model_keywords = []
-                    if 'iPhone' in model:
-                        numbers = re.findall(r'\d+', model)
-                        if numbers:
-                            model_keywords.append(numbers[0])
-                        if 'Pro' in model:
-                            model_keywords.append('pro')
-                        if 'Max' in model:
-                            model_keywords.append('max')
-                        if 'mini' in model:
-                            model_keywords.append('mini')
-                    elif 'Galaxy' in model:
-                        if 'S' in model:
-                            numbers = re.findall(r'S(\d+)', model)
-                            if numbers:
-                                model_keywords.extend(['s', numbers[0]])
-                        if 'Note' in model:
-                            model_keywords.append('note')
-                        if 'Fold' in model:
-                            model_keywords.append('fold')
-                        if 'Flip' in model:
-                            model_keywords.append('flip')
-                        if 'Ultra' in model:
-                            model_keywords.append('ultra')
-                    elif 'Pixel' in model:
-                        numbers = re.findall(r'\d+', model)
-                        if numbers:
-                            model_keywords.extend(['pixel', numbers[0]])
-                        if 'Pro' in model:
-                            model_keywords.append('pro')
-                    else:
-                        # Generic approach: extract numbers and key words
-                        numbers = re.findall(r'\d+', model)
-                        model_keywords.extend(numbers)
-                        for keyword in ['pro', 'max', 'ultra', 'plus', 'mini']:
-                            if keyword in model.lower():
-                                model_keywords.append(keyword)
-                    
-                    # Check if link text contains model keywords
-                    model_match = all(keyword.lower() in link_text for keyword in model_keywords) if model_keywords else False
-                    
-                    if brand_match and (model_match or len(model_keywords) == 0):
-                        full_url = urljoin(self.base_url, href)
-                        logger.info(f"Found potential match: {link_text} -> {full_url}")
-                        return full_url
-            
-            logger.warning(f"No product page found for {brand} {model}")
-            return None
+            return self.parse_search_results(response.content, brand, model)
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Search failed for {brand} {model}: {e}")
@@ -167,99 +125,36 @@ class GSMArenaFlagshipCrawler:
             logger.error(f"Unexpected error searching {brand} {model}: {e}")
             return None
     
+    def search_params(self, brand, model):
+        """Build GSMArena quick-search query parameters"""
+        search_model = self.normalize_model_for_search(brand, model)
+        search_query = f"{brand} {search_model}"
+        logger.info(f"Searching GSMArena for: {search_query}")
+        return {
+            'sQuickSearch': 'yes',
+            'sName': search_query
+        }
+    
+    def parse_search_results(self, html, brand, model):
+        """Pick the product page URL for a phone out of a search results page"""
+        self.phone_index.index_search_page(html)
+        
+        search_model = self.normalize_model_for_search(brand, model)
+        match = best_match(brand, search_model, search_candidates(html, self.base_url))
+        if match:
+            logger.info(f"Found match: {match.name} -> {match.url} (confidence {match.confidence:.2f})")
+            return match.url
+        
+        logger.warning(f"No product page found for {brand} {model}")
+        return None
+    
     def extract_phone_details(self, product_url):
         """Extract detailed specifications from GSMArena product page"""
         try:
             logger.info(f"Extracting details from: {product_url}")
             
-            response = self.session.get(product_url, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            details = {}
-            
-            # Extract basic info from specs table
-            spec_tables = soup.find_all('table')
-            
-            for table in spec_tables:
-                rows = table.find_all('tr')
-                current_category = None
-                
-                for row in rows:
-                    # Check if this is a category header
-                    th = row.find('th')
-                    if th and th.get('colspan'):
-                        current_category = th.get_text(strip=True)
-                        continue
-                    
-                    # Extract spec data
-                    cells = row.find_all(['td', 'th'])
-                    if len(cells) >= 2:
-                        key = cells[0].get_text(strip=True)
-                        value = cells[1].get_text(strip=True)
-                        
-                        # Map specifications based on key
-                        if 'OS' in key or 'operating system' in key.lower():
-                            details['os'] = value
-                        elif 'Chipset' in key or 'chipset' in key.lower():
-                            details['processor'] = value
-                        elif 'CPU' in key and 'processor' not in details:
-                            details['processor'] = value
-                        elif 'Dimensions' in key or 'dimensions' in key.lower():
-                            details['dimensions'] = value
-                        elif 'Weight' in key or 'weight' in key.lower():
-                            # Extract numeric weight
-                            weight_match = re.search(r'(\d+(?:\.\d+)?)', value)
-                            if weight_match:
-                                details['weight'] = float(weight_match.group(1))
-                        elif 'Battery' in key or 'battery' in key.lower():
-                            details['battery'] = value
-                        elif 'Charging' in key or 'charging' in key.lower():
-                            details['charging_power'] = value
-                        elif 'protection' in key.lower() or 'water' in key.lower():
-                            details['water_resistance'] = value
-                        elif 'Build' in key or 'build' in key.lower():
-                            details['material'] = value
-                        elif 'Colors' in key or 'colors' in key.lower():
-                            details['colors'] = value
-                        elif 'Network' in key or '2G' in key or '3G' in key or '4G' in key or '5G' in key:
-                            if 'network_type' not in details:
-                                details['network_type'] = value
-                        elif 'Display' in key and 'Size' in key:
-                            details['screen_size'] = value
-                        elif 'Internal' in key or 'internal' in key.lower():
-                            if 'storage' not in details:
-                                details['storage'] = value
-                        elif 'RAM' in key or 'Memory' in key:
-                            if 'ram' not in details:
-                                details['ram'] = value
-                        elif 'Camera' in key and ('Main' in key or 'Primary' in key):
-                            details['camera'] = value
-            
-            # Extract release year from announcement date
-            announced_elem = soup.find('span', {'data-spec': 'released-hl'})
-            if not announced_elem:
-                # Alternative search for announcement info
-                for elem in soup.find_all(['td', 'span'], string=re.compile(r'20\d{2}')):
-                    text = elem.get_text()
-                    year_match = re.search(r'(20\d{2})', text)
-                    if year_match:
-                        details['release_year'] = int(year_match.group(1))
-                        break
-            else:
-                year_text = announced_elem.get_text()
-                year_match = re.search(r'(20\d{2})', year_text)
-                if year_match:
-                    details['release_year'] = int(year_match.group(1))
-            
-            # Extract images
-            image_urls = self.extract_product_images(soup, product_url)
-            if image_urls:
-                details.update(image_urls)
-            
-            logger.info(f"Extracted {len(details)} specifications")
-            return details
+            record = self.spec_records.get(self.session, product_url)
+            return self.details_from_record(record)
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to extract details from {product_url}: {e}")
@@ -268,54 +163,45 @@ class GSMArenaFlagshipCrawler:
             logger.error(f"Unexpected error extracting details: {e}")
             return {}
     
-    def extract_product_images(self, soup, base_url):
-        """Extract product images from GSMArena page"""
+    def details_from_record(self, record):
+        """Map a parsed GSMArena spec record onto our database fields"""
+        # Extract basic info from specs table
+        details = GSMARENA_RULES.apply(record.pairs())
+        
+        # Extract release year from announcement date
+        year_text = record.spec('released-hl')
+        if not year_text:
+            # Alternative search for announcement info
+            year_text = next((cell for cells in record.rows for cell in cells if YEAR_RE.search(cell)), '')
+        release_year = parse_year(year_text)
+        if release_year:
+            details['release_year'] = release_year
+        
+        # Extract images
+        details.update(self.product_images_from_record(record))
+        
+        logger.info(f"Extracted {len(details)} specifications")
+        return details
+    
+    def product_images_from_record(self, record):
+        """Pick front/back/side image URLs from a parsed spec record"""
         image_urls = {}
+        if record.main_image:
+            image_urls['image_front'] = record.main_image
         
-        try:
-            # Look for main product image
-            main_img = soup.find('div', class_='specs-photo-main')
-            if main_img:
-                img = main_img.find('img')
-                if img:
-                    src = img.get('src')
-                    if src:
-                        full_url = urljoin(base_url, src)
-                        image_urls['image_front'] = full_url
-            
-            # Look for additional images in gallery
-            gallery = soup.find('div', class_='specs-photo-gallery')
-            if gallery:
-                imgs = gallery.find_all('img')
-                count = 0
-                for img in imgs:
-                    if count >= 2:  # Limit to 2 additional images
-                        break
-                    
-                    src = img.get('src')
-                    if src and src != image_urls.get('image_front'):
-                        full_url = urljoin(base_url, src)
-                        if count == 0:
-                            image_urls['image_back'] = full_url
-                        elif count == 1:
-                            image_urls['image_side'] = full_url
-                        count += 1
-            
-            return image_urls
-            
-        except Exception as e:
-            logger.error(f"Error extracting images: {e}")
-            return {}
+        # Up to 2 additional images from the gallery
+        extra = [src for src in record.gallery_images if src != image_urls.get('image_front')][:2]
+        for field, src in zip(('image_back', 'image_side'), extra):
+            image_urls[field] = src
+        return image_urls
     
     def download_image(self, url, filename):
         """Download image and save locally"""
         try:
-            response = self.session.get(url, timeout=30)
+            response = self.session.get(url, timeout=30, stream=True)
             response.raise_for_status()
             
-            filepath = os.path.join(self.images_dir, filename)
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+            save_response(response, os.path.join(self.images_dir, filename))
             
             # Return relative path for database storage
             return f"/images/phones/{filename}"
@@ -324,17 +210,34 @@ class GSMArenaFlagshipCrawler:
             logger.error(f"Failed to download image {url}: {e}")
             return None
     
+    async def download_image_async(self, engine, url, filename):
+        """Download image through the shared fetch engine into the content-addressed image store"""
+        try:
+            stored = await store_download(engine, url, filename)
+            return f"/{stored.relative_path}"
+            
+        except Exception as e:
+            logger.error(f"Failed to download image {url}: {e}")
+            return None
+    
+    def image_filename(self, phone, field):
+        """Generate local filename for one of a phone's images"""
+        brand_clean = re.sub(r'[^\w\-_]', '_', phone['brand'])
+        model_clean = re.sub(r'[^\w\-_\s]', '_', phone['model'])
+        model_clean = re.sub(r'\s+', '_', model_clean)
+        return f"{brand_clean}_{model_clean}_{field.split('_')[1]}.jpg"
+    
     def get_flagship_phones_from_database(self):
-        """Get all 167 flagship phones from database that need details"""
+        """Get all 167 flagship phones from database that need details (all of them when refreshing)"""
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            with pooled_connect(**self.db_config) as conn:
                 with conn.cursor() as cur:
                     cur.execute('''
                         SELECT "Id", "Brand", "Model", "ReleaseYear"
                         FROM "Phones" 
-                        WHERE ("Processor" IS NULL OR "Processor" = 'TBD')
+                        WHERE %s OR ("Processor" IS NULL OR "Processor" = 'TBD')
                         ORDER BY "Brand", "Model"
-                    ''')
+                    ''', (self.refresh,))
                     
                     phones = []
                     for row in cur.fetchall():
@@ -352,138 +255,288 @@ class GSMArenaFlagshipCrawler:
             logger.error(f"Database query failed: {e}")
             return []
     
+    def get_phones_by_id(self, phone_ids):
+        """Load specific phones, e.g. the ones a queue worker claimed"""
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    SELECT "Id", "Brand", "Model", "ReleaseYear"
+                    FROM "Phones"
+                    WHERE "Id" = ANY(%s)
+                    ORDER BY "Brand", "Model"
+                ''', (list(phone_ids),))
+                return [{'id': row[0], 'brand': row[1], 'model': row[2], 'year': row[3]}
+                        for row in cur.fetchall()]
+    
+    def get_scheduled_phones(self, budget):
+        """The phones most in need of a check (missing fields, then the stalest data) that
+        fit in a budget of `budget` requests"""
+        columns = ', '.join(f'"{field}"' for field in self.scheduler.fields)
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f'SELECT "Id", "Brand", "Model", "ReleaseYear", {columns} FROM "Phones"')
+                phones = [{'id': row[0], 'brand': row[1], 'model': row[2], 'year': row[3],
+                           'values': dict(zip(self.scheduler.fields, row[4:]))}
+                          for row in cur.fetchall()]
+        plan = self.scheduler.plan(phones, budget, self.estimate_requests)
+        for entry in plan:
+            missing = f", missing {', '.join(entry.missing)}" if entry.missing else ''
+            logger.info(f"Scheduled {entry.phone['brand']} {entry.phone['model']}: priority {entry.priority:.1f} "
+                        f"({entry.overdue:.1f} intervals old{missing})")
+        return [dict(entry.phone, cost=entry.cost) for entry in plan]
+    
+    def estimate_requests(self, phone, missing):
+        """Requests one phone is expected to take: the spec page (always revalidated when
+        refreshing), a search unless the product page is already known, and the images still
+        missing. A changed page re-downloads all its images, so admit() also counts the
+        requests actually made."""
+        known = self.jobs.result(phone['id'], 'resolve') or self.phone_index.lookup(phone['brand'], phone['model'])
+        images = sum(1 for field in ('ImageFront', 'ImageBack', 'ImageSide') if field in missing)
+        return 1 + (0 if known else 1) + images
+    
+    def admit(self, engine, phone):
+        """Reserve a scheduled phone's estimated requests, or refuse it once they would not fit
+        in the budget. Requests made beyond the reservations (estimates that ran short) count
+        against it too. Only admitted phones are marked scheduled."""
+        cost = phone.get('cost', 1)
+        if max(self._reserved, engine.request_count) + cost > self.budget:
+            self._over_budget += 1
+            return False
+        self._reserved += cost
+        self.scheduler.mark_scheduled([phone['id']])
+        return True
+    
+    # Per-phone stages recorded in the job ledger
+    STAGES = ('resolve', 'details', 'images', 'write')
+    
+    def last_error(self, phone_id):
+        """Why a phone did not make it through the pipeline, from the job ledger"""
+        for stage in self.STAGES:
+            record = self.jobs.get(phone_id, stage)
+            if record is None or record.status != DONE:
+                return f"{stage}: {record.last_error if record and record.last_error else 'not reached'}"
+        return 'not written'
+    
+    # Extracted detail key -> "Phones" column
+    FIELD_MAPPING = {
+        'processor': 'Processor',
+        'os': 'Os',
+        'dimensions': 'Dimensions',
+        'weight': 'Weight',
+        'battery': 'Battery',
+        'charging_power': 'ChargingPower',
+        'water_resistance': 'WaterResistance',
+        'material': 'Material',
+        'colors': 'Colors',
+        'network_type': 'NetworkType',
+        'screen_size': 'ScreenSize',
+        'storage': 'Storage',
+        'ram': 'Ram',
+        'camera': 'Camera',
+        'image_front': 'ImageFront',
+        'image_back': 'ImageBack',
+        'image_side': 'ImageSide',
+        'release_year': 'ReleaseYear'
+    }
+    
     def update_phone_details(self, phone_id, details):
-        """Update phone details in database"""
+        """Queue phone details for the next batched database write"""
+        fields = {db_field: details[detail_key] for detail_key, db_field in self.FIELD_MAPPING.items()
+                  if details.get(detail_key)}
+        if not fields:
+            logger.warning(f"No valid details to update for phone ID {phone_id}")
+            return False
+        
         try:
-            with psycopg2.connect(**self.db_config) as conn:
-                with conn.cursor() as cur:
-                    update_fields = []
-                    values = []
-                    
-                    # Map extracted details to database fields
-                    field_mapping = {
-                        'processor': 'Processor',
-                        'os': 'Os',
-                        'dimensions': 'Dimensions',
-                        'weight': 'Weight',
-                        'battery': 'Battery',
-                        'charging_power': 'ChargingPower',
-                        'water_resistance': 'WaterResistance',
-                        'material': 'Material',
-                        'colors': 'Colors',
-                        'network_type': 'NetworkType',
-                        'screen_size': 'ScreenSize',
-                        'storage': 'Storage',
-                        'ram': 'Ram',
-                        'camera': 'Camera',
-                        'image_front': 'ImageFront',
-                        'image_back': 'ImageBack',
-                        'image_side': 'ImageSide',
-                        'release_year': 'ReleaseYear'
-                    }
-                    
-                    for detail_key, db_field in field_mapping.items():
-                        if detail_key in details and details[detail_key]:
-                            update_fields.append(f'"{db_field}" = %s')
-                            values.append(details[detail_key])
-                    
-                    if update_fields:
-                        values.append(phone_id)
-                        query = f'''
-                            UPDATE "Phones" 
-                            SET {", ".join(update_fields)}
-                            WHERE "Id" = %s
-                        '''
-                        
-                        cur.execute(query, values)
-                        conn.commit()
-                        
-                        logger.info(f"Updated phone ID {phone_id} with {len(update_fields)} fields")
-                        return True
-                    
-                    logger.warning(f"No valid details to update for phone ID {phone_id}")
-                    return False
-                    
+            self.writer.update(phone_id, fields)
         except Exception as e:
             logger.error(f"Failed to update phone {phone_id}: {e}")
             return False
+        logger.info(f"Queued update of phone ID {phone_id} with {len(fields)} fields")
+        return True
     
-    def crawl_flagship_phones(self):
-        """Main crawling function for 167 flagship phones"""
+    # Pipeline stages: each takes the phone dict and returns it, or None to drop the phone.
+    # Stages already finished in an earlier run are resumed from the job ledger.
+    
+    async def resolve_stage(self, engine, phone):
+        """Find the product page, unless an earlier run or the index already knows it.
+        With a request budget, this is where phones are admitted: nothing has queued up
+        requests for them yet."""
+        if self.budget is not None and not self.admit(engine, phone):
+            return None
+        phone_id = phone['id']
+        product_url = self.jobs.result(phone_id, 'resolve')
+        if not product_url:
+            with self.jobs.track(phone_id, 'resolve'):
+                product_url = self.phone_index.lookup(phone['brand'], phone['model'])
+                if not product_url:
+                    search_html = await engine.fetch_text(self.search_url, params=self.search_params(phone['brand'], phone['model']))
+                    product_url = self.parse_search_results(search_html, phone['brand'], phone['model'])
+                    if not product_url:
+                        self.jobs.fail(phone_id, 'resolve', 'No product page found')
+                        print(f"❌ {phone['brand']} {phone['model']}: No product page found")
+                        return None
+                    self.phone_index.record(phone['brand'], phone['model'], product_url)
+                self.jobs.succeed(phone_id, 'resolve', product_url)
+        phone['product_url'] = product_url
+        return phone
+    
+    async def fetch_stage(self, engine, phone):
+        """Download the spec page (skipped when its parsed record is stored or the page archived,
+        unless refreshing, which also revalidates a cached copy with the site). A page whose
+        fingerprint matches the version last written is marked unchanged and passes through
+        the remaining stages untouched."""
+        url = phone['product_url']
+        phone['record'] = None if self.refresh else self.spec_records.load(url)
+        if phone['record'] is None:
+            page = None if self.refresh else await asyncio.to_thread(self.spec_records.archived_page, url)
+            if page is not None:
+                phone['html'] = page.body
+            else:
+                try:
+                    result = await engine.fetch(url, revalidate=self.refresh)
+                    result.raise_for_status()
+                except Exception as e:
+                    self.jobs.fail(phone['id'], 'details', f"{type(e).__name__}: {e}")
+                    raise
+                phone['html'] = result.content
+            phone['fingerprint'] = spec_fingerprint(phone['html'])
+            if self.fingerprints.is_unchanged(FINGERPRINT_SOURCE, phone['id'], url, phone['fingerprint']):
+                phone['unchanged'] = True
+                del phone['html']
+        return phone
+    
+    def parse_stage(self, phone):
+        """Parse the spec page into details (runs in a worker thread)"""
+        if phone.get('unchanged'):
+            return phone
+        label = f"{phone['brand']} {phone['model']}"
+        logger.info(f"Extracting details from: {phone['product_url']}")
+        with self.jobs.track(phone['id'], 'details'):
+            record = phone.pop('record') or self.spec_records.parse_and_save(phone.pop('html'), phone['product_url'])
+            details = self.details_from_record(record)
+            if not details:
+                self.jobs.fail(phone['id'], 'details', 'No details extracted')
+                print(f"❌ {label}: No details extracted")
+                return None
+        phone['details'] = details
+        return phone
+    
+    async def download_stage(self, engine, phone):
+        """Download the phone's images, all at once (paths from a finished earlier run are reused,
+        except for a changed page found while refreshing)"""
+        if phone.get('unchanged'):
+            return phone
+        details = phone['details']
+        image_fields = [f for f in ('image_front', 'image_back', 'image_side') if details.get(f)]
+        local_paths = None if self.refresh else self.jobs.result(phone['id'], 'images')
+        if local_paths is None:
+            with self.jobs.track(phone['id'], 'images'):
+                paths = await asyncio.gather(*(
+                    self.download_image_async(engine, details[f], self.image_filename(phone, f))
+                    for f in image_fields
+                ))
+                local_paths = {field: path for field, path in zip(image_fields, paths) if path}
+                self.jobs.succeed(phone['id'], 'images', local_paths)
+        for field in image_fields:
+            if local_paths.get(field):
+                details[field] = local_paths[field]
+            else:
+                del details[field]
+        return phone
+    
+    def write_stage(self, phone):
+        """Queue the update; rows are written in batches and 'write' is marked done after the flush"""
+        label = f"{phone['brand']} {phone['model']}"
+        if phone.get('unchanged'):
+            self.jobs.succeed(phone['id'], 'write')
+            self.scheduler.mark_verified(phone['id'])
+            print(f"⏭️ {label}: Page unchanged since the last update")
+            return phone
+        if self.update_phone_details(phone['id'], phone['details']):
+            if phone.get('fingerprint'):
+                self._queued_fingerprints[phone['id']] = (phone['product_url'], phone['fingerprint'])
+            print(f"✅ {label}: Successfully updated with {len(phone['details'])} details")
+            return phone
+        self.jobs.fail(phone['id'], 'write', 'No valid details to update')
+        print(f"❌ {label}: Failed to update database")
+        return None
+    
+    def finish_writes(self):
+        """Flush queued updates; the rows written get 'write' marked done, their fields marked
+        verified and their page fingerprint remembered. Returns the ids written."""
+        written = [phone_id for (phone_id,) in self.writer.flush()]
+        for phone_id in written:
+            self.jobs.succeed(phone_id, 'write')
+            self.scheduler.mark_verified(phone_id)
+            fingerprint = self._queued_fingerprints.pop(phone_id, None)
+            if fingerprint:
+                self.fingerprints.record(FINGERPRINT_SOURCE, phone_id, *fingerprint)
+        return written
+    
+    def build_pipeline(self, engine):
+        return Pipeline([
+            Stage('resolve', partial(self.resolve_stage, engine), workers=4),
+            Stage('fetch', partial(self.fetch_stage, engine), workers=4),
+            Stage('parse', self.parse_stage, workers=2),
+            Stage('download', partial(self.download_stage, engine), workers=4),
+            Stage('write', self.write_stage, workers=1),
+        ], describe=lambda phone: f"{phone['brand']} {phone['model']}")
+    
+    async def crawl_flagship_phones_async(self):
+        """Run phones through the resolve -> fetch -> parse -> download -> write pipeline;
+        per-host politeness is enforced by the fetch engine"""
         logger.info("Starting GSMArena flagship phone crawling")
         
-        phones = self.get_flagship_phones_from_database()
+        if self.budget is not None:
+            phones = await asyncio.to_thread(self.get_scheduled_phones, self.budget)
+        else:
+            phones = self.get_flagship_phones_from_database()
         if not phones:
             logger.warning("No phones found to crawl")
             return
+        if not self.refresh:
+            phones = self.jobs.runnable(phones, 'write', stages=self.STAGES)
         
         total_phones = len(phones)
-        updated_count = 0
-        failed_count = 0
+        print(f"🚀 Starting to {'refresh' if self.refresh else 'crawl'} {total_phones} flagship phones from GSMArena")
         
-        print(f"🚀 Starting to crawl {total_phones} flagship phones from GSMArena")
+        async with FetchEngine(headers=self.session.headers) as engine:
+            pipeline = self.build_pipeline(engine)
+            self._reserved = self._over_budget = 0
+            finished = await pipeline.run(phones)
+        await asyncio.to_thread(self.finish_writes)
         
-        for i, phone in enumerate(phones, 1):
-            print(f"\n📱 Processing {i}/{total_phones}: {phone['brand']} {phone['model']}")
-            logger.info(f"Processing phone {i}/{total_phones}: {phone['brand']} {phone['model']}")
-            
-            try:
-                # Search for product page
-                product_url = self.search_phone_on_gsmarena(phone['brand'], phone['model'])
-                
-                if not product_url:
-                    print(f"❌ No product page found")
-                    failed_count += 1
-                    continue
-                
-                # Extract details
-                details = self.extract_phone_details(product_url)
-                
-                if not details:
-                    print(f"❌ No details extracted")
-                    failed_count += 1
-                    continue
-                
-                # Download images if found
-                image_fields = ['image_front', 'image_back', 'image_side']
-                for field in image_fields:
-                    if field in details and details[field]:
-                        # Generate local filename
-                        brand_clean = re.sub(r'[^\w\-_]', '_', phone['brand'])
-                        model_clean = re.sub(r'[^\w\-_\s]', '_', phone['model'])
-                        model_clean = re.sub(r'\s+', '_', model_clean)
-                        filename = f"{brand_clean}_{model_clean}_{field.split('_')[1]}.jpg"
-                        
-                        local_path = self.download_image(details[field], filename)
-                        if local_path:
-                            details[field] = local_path
-                        else:
-                            del details[field]
-                
-                # Update database
-                if self.update_phone_details(phone['id'], details):
-                    updated_count += 1
-                    print(f"✅ Successfully updated with {len(details)} details")
-                else:
-                    failed_count += 1
-                    print(f"❌ Failed to update database")
-                
-                # Rate limiting - be respectful to GSMArena
-                time.sleep(3)  # 3 seconds between requests
-                
-            except Exception as e:
-                logger.error(f"Error processing {phone['brand']} {phone['model']}: {e}")
-                print(f"❌ Error: {e}")
-                failed_count += 1
-                continue
+        unchanged_count = sum(1 for phone in finished if phone.get('unchanged'))
+        updated_count = len(finished) - unchanged_count
+        # Phones turned away by the request budget are dropped by the first stage, not failed
+        failed_count = total_phones - len(finished) - self._over_budget
+        if self._over_budget:
+            logger.warning(f"Request budget of {self.budget} used up; "
+                           f"{self._over_budget} scheduled phones wait for the next run")
         
         print(f"\n🎉 Crawling completed!")
         print(f"✅ Successfully updated: {updated_count} phones")
+        print(f"⏭️ Unchanged: {unchanged_count} phones")
         print(f"❌ Failed: {failed_count} phones")
-        logger.info(f"Crawling completed: {updated_count} updated, {failed_count} failed")
+        budget = f" of a budget of {self.budget}" if self.budget is not None else ''
+        logger.info(f"Crawling completed: {updated_count} updated, {unchanged_count} unchanged, {failed_count} failed "
+                    f"({engine.request_count} requests{budget})")
+        pipeline.log_report()
+    
+    def crawl_flagship_phones(self):
+        """Main crawling function for 167 flagship phones"""
+        asyncio.run(self.crawl_flagship_phones_async())
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description='GSMArena flagship phone crawler')
+    parser.add_argument('--refresh', action='store_true',
+                        help='re-check every phone; pages whose content is unchanged are skipped')
+    parser.add_argument('--budget', type=int, default=None,
+                        help='re-check only the stalest phones, within this many requests')
+    args = parser.parse_args()
+    
     print("🚀 GSMArena Flagship Phone Crawler")
     print("Crawling detailed specifications for 167 flagship phones (2020-2024)")
     
@@ -494,7 +547,7 @@ def main():
         'password': 'postgres'
     }
     
-    crawler = GSMArenaFlagshipCrawler(db_config)
+    crawler = GSMArenaFlagshipCrawler(db_config, refresh=args.refresh, budget=args.budget)
     crawler.crawl_flagship_phones()
 
 if __name__ == "__main__":
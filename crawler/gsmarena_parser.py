@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Single-pass GSMArena spec page parser
+Parses a product page once into a PhoneSpecRecord (every data-spec value,
+every spec-table row, images and page text) and keeps it in a local store,
+so each fixer reads its fields from the record instead of fetching and
+parsing the same page again.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+from html_parsing import by_class, data_specs, first, images, node_text, page_text, parse_html, table_rows
+from page_archive import ArchivedPage, get_page_archive
+from rate_limiter import STATE_DIR
+from response_cache import normalize_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(STATE_DIR, 'spec_records.sqlite')
+
+# Bump when parse_spec_page changes so stored records are re-parsed
+PARSER_VERSION = 2
+
+
+class PhoneSpecRecord:
+    """Everything the fixers read from one GSMArena product page"""
+
+    def __init__(self, url: str, name: str = '', specs: Optional[Dict[str, str]] = None,
+                 tables: Optional[List[List[List[str]]]] = None, main_image: Optional[str] = None,
+                 gallery_images: Optional[List[str]] = None, images: Optional[List[Dict[str, str]]] = None,
+                 quick_specs: Optional[List[str]] = None, text: str = '',
+                 parser_version: int = PARSER_VERSION):
+        self.url = url
+        self.name = name
+        self.specs = specs or {}                    # data-spec attribute -> text (first occurrence)
+        self.tables = tables or []                  # per table, the cell texts of each row
+        self.main_image = main_image
+        self.gallery_images = gallery_images or []
+        self.images = images or []                  # every <img>: src / alt / title
+        self.quick_specs = quick_specs or []        # 'help-display' highlight blocks
+        self.text = text
+        self.parser_version = parser_version
+
+    def spec(self, key: str) -> Optional[str]:
+        """Text of the element carrying data-spec=key, or None"""
+        value = self.specs.get(key)
+        return value if value else None
+
+    @property
+    def rows(self) -> List[List[str]]:
+        """Every table row in page order"""
+        return [cells for table in self.tables for cells in table]
+
+    def pairs(self, tables: Optional[List[List[List[str]]]] = None):
+        """(label, value) for every row with at least two cells, in page order
+        (restricted to `tables`, e.g. record.tables[:1], when given)"""
+        for table in self.tables if tables is None else tables:
+            for cells in table:
+                if len(cells) >= 2:
+                    yield cells[0], cells[1]
+
+    def to_dict(self) -> Dict:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PhoneSpecRecord':
+        return cls(**data)
+
+
+def parse_spec_page(html, url: str) -> PhoneSpecRecord:
+    """Parse a GSMArena product page into a PhoneSpecRecord in one pass"""
+    doc = parse_html(html)
+
+    title = first(doc, by_class('specs-phone-name-title'))
+    main_src = first(doc, by_class('specs-photo-main', 'div') + '/descendant::img[1]/@src')
+    gallery = first(doc, by_class('specs-photo-gallery', 'div'))
+
+    return PhoneSpecRecord(
+        url=url,
+        name=node_text(title) if title is not None else '',
+        specs=data_specs(doc),
+        tables=table_rows(doc),
+        main_image=urljoin(url, main_src) if main_src else None,
+        gallery_images=[urljoin(url, src) for src in gallery.xpath('.//img/@src')] if gallery is not None else [],
+        images=[{'src': img['src'], 'alt': img['alt'], 'title': img['title']} for img in images(doc)],
+        quick_specs=[node_text(div) for div in doc.xpath(by_class('help-display', 'div'))],
+        text=page_text(doc),
+    )
+
+
+class SpecRecordStore:
+    """Parsed spec records keyed by product URL, persisted in SQLite"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, use_archive: bool = True):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Pages already in the archive are re-parsed from there instead of being fetched again
+        self.archive = get_page_archive() if use_archive else None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS spec_records (
+                url TEXT PRIMARY KEY,
+                parser_version INTEGER NOT NULL,
+                parsed_at REAL NOT NULL,
+                record BLOB NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def load(self, url: str) -> Optional[PhoneSpecRecord]:
+        with self._lock:
+            row = self._conn.execute('SELECT parser_version, record FROM spec_records WHERE url = ?',
+                                     (url,)).fetchone()
+        if row is None or row[0] != PARSER_VERSION:
+            return None
+        return PhoneSpecRecord.from_dict(json.loads(zlib.decompress(row[1])))
+
+    def save(self, record: PhoneSpecRecord):
+        blob = zlib.compress(json.dumps(record.to_dict(), ensure_ascii=False).encode('utf-8'), 6)
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO spec_records (url, parser_version, parsed_at, record)
+                VALUES (?, ?, ?, ?)
+            ''', (record.url, record.parser_version, time.time(), blob))
+            self._conn.commit()
+
+    def parse_and_save(self, html, url: str) -> PhoneSpecRecord:
+        """Parse a page that was fetched elsewhere and keep its record"""
+        record = parse_spec_page(html, url)
+        self.save(record)
+        return record
+
+    def archived_page(self, url: str) -> Optional[ArchivedPage]:
+        """Newest archived copy of a product page, if any"""
+        return self.archive.latest(normalize_url(url)) if self.archive is not None else None
+
+    def load_archived(self, url: str) -> Optional[PhoneSpecRecord]:
+        """Parse the archived copy of url (no network), e.g. after PARSER_VERSION changed"""
+        page = self.archived_page(url)
+        return self.parse_and_save(page.body, url) if page is not None else None
+
+    def get(self, session, url: str, refresh: bool = False) -> PhoneSpecRecord:
+        """Stored record for url, fetching and parsing the page once if needed"""
+        record = None if refresh else self.load(url) or self.load_archived(url)
+        if record is None:
+            response = session.get(url, timeout=15)
+            response.raise_for_status()
+            record = self.parse_and_save(response.content, url)
+        return record
+
+    async def get_async(self, engine, url: str, refresh: bool = False) -> PhoneSpecRecord:
+        """Same as get() but fetches through the shared async fetch engine"""
+        record = None if refresh else self.load(url) or self.load_archived(url)
+        if record is None:
+            result = await engine.fetch(url)
+            result.raise_for_status()
+            record = self.parse_and_save(result.content, url)
+        return record
+
+
+_shared_store: Optional[SpecRecordStore] = None
+
+
+def get_spec_store() -> SpecRecordStore:
+    """Process-wide record store backed by the shared state directory"""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = SpecRecordStore()
+    return _shared_store
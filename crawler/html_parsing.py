@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Fast HTML parsing helpers
+lxml-backed replacements for the BeautifulSoup('html.parser') + find_all()
+pattern used across the crawlers. Pages are parsed by libxml2 and only the
+parts a crawler reads (links, table rows, data-spec cells, images) are pulled
+out with XPath, which matters when replaying cached pages in bulk.
+"""
+
+import re
+from typing import Dict, List, Optional, Pattern, Tuple, Union
+
+import lxml.html
+from lxml import etree
+
+HtmlContent = Union[bytes, str]
+
+# Lets XPath filters use re:test(@attr, "pattern") like find_all(attr=re.compile(...))
+XPATH_NAMESPACES = {'re': 'http://exslt.org/regular-expressions'}
+
+
+def parse_html(content: HtmlContent, encoding: Optional[str] = None) -> lxml.html.HtmlElement:
+    """Parse a page into an lxml document; bytes are decoded from their <meta charset> unless encoding is given"""
+    if isinstance(content, str):
+        # lxml refuses str input that still carries an XML encoding declaration
+        content = content.encode('utf-8')
+        encoding = 'utf-8'
+    if not content or not content.strip():
+        return lxml.html.fromstring('<html></html>')
+    parser = lxml.html.HTMLParser(encoding=encoding) if encoding else None
+    try:
+        return lxml.html.document_fromstring(content, parser=parser)
+    except (etree.ParserError, ValueError):
+        return lxml.html.fromstring('<html></html>')
+
+
+# Text nodes as BeautifulSoup's get_text() sees them: script/style bodies are skipped
+_TEXT = etree.XPath('.//text()[not(ancestor::script) and not(ancestor::style)]')
+
+
+def node_text(node, separator: str = '') -> str:
+    """Same result as BeautifulSoup's get_text(separator, strip=True)"""
+    return separator.join(s.strip() for s in _TEXT(node) if s.strip())
+
+
+def page_text(doc) -> str:
+    """Same result as BeautifulSoup's get_text() on the whole page"""
+    return ''.join(_TEXT(doc))
+
+
+def links(doc, href_pattern: Optional[Union[str, Pattern]] = None) -> List[Tuple[str, str]]:
+    """(href, stripped link text) for every <a href>, optionally filtered by a regex on href"""
+    if isinstance(href_pattern, str):
+        href_pattern = re.compile(href_pattern)
+    found = []
+    for a in doc.xpath('//a[@href]'):
+        href = a.get('href')
+        if href_pattern is not None and not href_pattern.search(href):
+            continue
+        found.append((href, node_text(a)))
+    return found
+
+
+def table_rows(doc, xpath: str = '//table') -> List[List[List[str]]]:
+    """For each table matched by xpath, the stripped cell texts of each non-empty row"""
+    tables = []
+    for table in doc.xpath(xpath, namespaces=XPATH_NAMESPACES):
+        rows = []
+        for row in table.iter('tr'):
+            cells = [node_text(cell) for cell in row.iter('td', 'th')]
+            if cells:
+                rows.append(cells)
+        tables.append(rows)
+    return tables
+
+
+def data_specs(doc) -> Dict[str, str]:
+    """data-spec attribute -> text of its first element"""
+    specs = {}
+    for elem in doc.xpath('//*[@data-spec]'):
+        key = elem.get('data-spec')
+        if key not in specs:
+            specs[key] = node_text(elem)
+    return specs
+
+
+IMAGE_ATTRIBUTES = ('src', 'data-src', 'alt', 'title', 'id', 'class')
+
+
+def images(doc, xpath: str = '//img') -> List[Dict[str, str]]:
+    """src / data-src / alt / title / id / class of every image matched by xpath"""
+    return [{attr: img.get(attr, '') for attr in IMAGE_ATTRIBUTES}
+            for img in doc.xpath(xpath, namespaces=XPATH_NAMESPACES)]
+
+
+def by_class(class_name: str, tag: str = '*') -> str:
+    """XPath for elements carrying class_name among their classes (like find(class_=...))"""
+    return f'//{tag}[contains(concat(" ", normalize-space(@class), " "), " {class_name} ")]'
+
+
+def first(doc, xpath: str):
+    """First node matched by xpath, or None"""
+    found = doc.xpath(xpath, namespaces=XPATH_NAMESPACES)
+    return found[0] if found else None
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Image manifest
+One os.scandir pass over images/ builds a path -> (size, mtime, hash) map, so
+existence/size/hash checks are dict lookups instead of a stat per database
+row. Content hashes are cached in .crawl_state and reused while a file's size
+and mtime are unchanged. reconcile() checks every "ImageUrl"/"ColorImages"
+reference from a single query against it.
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from db_pool import pooled_connect
+from image_store import PROJECT_ROOT, hash_file
+from rate_limiter import STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+IMAGES_ROOT = os.path.join(PROJECT_ROOT, 'images')
+DEFAULT_CACHE_PATH = os.path.join(STATE_DIR, 'image_manifest.json')
+LOCAL_IMAGE_PREFIX = 'http://localhost:5198/'
+GENERATED_DIRS = ('images/phones/variants/',)
+
+
+class ManifestEntry(NamedTuple):
+    size: int
+    mtime_ns: int
+    hash: Optional[str] = None
+
+
+def relative_image_path(value: Optional[str]) -> Optional[str]:
+    """Normalise a stored image reference to 'images/...', or None if it is not a local image.
+
+    Accepts 'http://localhost:5198/images/phones/x.jpg', '/images/phones/x.jpg'
+    and 'images/phones/x.jpg'."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.startswith(('http://', 'https://')):
+        if not value.startswith(LOCAL_IMAGE_PREFIX):
+            return None
+        value = urlparse(value).path
+    value = unquote(value).lstrip('/')
+    return value if value.startswith('images/') else None
+
+
+class ImageManifest:
+    """Path -> size/mtime/hash for every file under images/"""
+
+    def __init__(self, root: str = IMAGES_ROOT, cache_path: Optional[str] = DEFAULT_CACHE_PATH):
+        self.root = root
+        self.cache_path = cache_path
+        self.entries: Dict[str, ManifestEntry] = {}
+        self.scanned_at = 0.0
+        self._dirty = False
+        if cache_path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('root') == self.root:
+                self.entries = {path: ManifestEntry(*entry) for path, entry in data['entries'].items()}
+                self.scanned_at = data.get('scanned_at', 0.0)
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries = {}
+
+    def save(self):
+        """Persist entries (with any computed hashes) for the next process"""
+        if not self.cache_path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.cache_path), prefix='.manifest-', suffix='.part')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'root': self.root, 'scanned_at': self.scanned_at,
+                       'entries': {path: list(entry) for path, entry in self.entries.items()}}, f)
+        os.replace(tmp, self.cache_path)
+        self._dirty = False
+
+    def _walk(self, directory: str, prefix: str) -> Iterator[Tuple[str, os.DirEntry]]:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._walk(entry.path, f"{prefix}{entry.name}/")
+                elif entry.is_file():
+                    yield f"{prefix}{entry.name}", entry
+
+    def refresh(self) -> 'ImageManifest':
+        """Rescan the tree; hashes survive for files whose size and mtime are unchanged"""
+        started = time.time()
+        previous, fresh = self.entries, {}
+        base = os.path.basename(self.root.rstrip(os.sep))
+        for path, entry in self._walk(self.root, f"{base}/"):
+            st = entry.stat()
+            old = previous.get(path)
+            digest = old.hash if old and old.size == st.st_size and old.mtime_ns == st.st_mtime_ns else None
+            fresh[path] = ManifestEntry(st.st_size, st.st_mtime_ns, digest)
+        self._dirty = self._dirty or fresh != previous
+        self.entries = fresh
+        self.scanned_at = time.time()
+        logger.info(f"Image manifest: {len(fresh)} files scanned in {(self.scanned_at - started) * 1000:.0f} ms")
+        return self
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, reference) -> bool:
+        return self.exists(reference)
+
+    def get(self, reference: Optional[str]) -> Optional[ManifestEntry]:
+        path = relative_image_path(reference)
+        return self.entries.get(path) if path else None
+
+    def exists(self, reference: Optional[str]) -> bool:
+        return self.get(reference) is not None
+
+    def size(self, reference: Optional[str]) -> Optional[int]:
+        entry = self.get(reference)
+        return entry.size if entry else None
+
+    def hash(self, reference: Optional[str]) -> Optional[str]:
+        """SHA-256 of a file, computed on first request and cached"""
+        path = relative_image_path(reference)
+        entry = self.entries.get(path) if path else None
+        if entry is None:
+            return None
+        if entry.hash is None:
+            entry = entry._replace(hash=hash_file(os.path.join(os.path.dirname(self.root), *path.split('/'))))
+            self.entries[path] = entry
+            self._dirty = True
+        return entry.hash
+
+
+_shared_manifest: Optional[ImageManifest] = None
+
+
+def get_image_manifest(max_age: float = 0.0) -> ImageManifest:
+    """Process-wide manifest, rescanned when older than max_age seconds"""
+    global _shared_manifest
+    if _shared_manifest is None:
+        _shared_manifest = ImageManifest()
+    if time.time() - _shared_manifest.scanned_at > max_age:
+        _shared_manifest.refresh()
+    return _shared_manifest
+
+
+class ReconciliationReport(NamedTuple):
+    phones: int
+    local_references: int
+    missing_main: List[Tuple[int, str, str, str]]     # (id, brand, model, path)
+    missing_colors: List[Tuple[int, str, str, str, str]]  # (id, brand, model, color, path)
+    external: int
+    orphans: List[str]
+
+
+def reconcile(db_config: Dict, manifest: Optional[ImageManifest] = None) -> ReconciliationReport:
+    """Check every local image reference in "Phones" against the manifest with one query"""
+    manifest = manifest or get_image_manifest()
+    with pooled_connect(**db_config) as conn:
+        with conn.cursor() as cur:
+            cur.execute('''
+                SELECT "Id", "Brand", "Model", "ImageUrl", "ColorImages"
+                FROM "Phones"
+                WHERE "ImageUrl" IS NOT NULL OR "ColorImages" IS NOT NULL
+            ''')
+            rows = cur.fetchall()
+
+    referenced = set()
+    missing_main, missing_colors = [], []
+    local = external = 0
+    for phone_id, brand, model, image_url, color_images in rows:
+        references = [(None, image_url)]
+        if color_images:
+            try:
+                colors = color_images if isinstance(color_images, dict) else json.loads(color_images)
+                references.extend(colors.items() if isinstance(colors, dict) else [])
+            except ValueError:
+                logger.warning(f"Unreadable ColorImages for {brand} {model}")
+        for color, reference in references:
+            path = relative_image_path(reference)
+            if path is None:
+                external += bool(reference)
+                continue
+            local += 1
+            referenced.add(path)
+            if path not in manifest.entries:
+                if color is None:
+                    missing_main.append((phone_id, brand, model, path))
+                else:
+                    missing_colors.append((phone_id, brand, model, color, path))
+
+    orphans = sorted(path for path in manifest.entries
+                     if path.startswith('images/phones/') and path not in referenced
+                     and not path.startswith(GENERATED_DIRS))
+    return ReconciliationReport(len(rows), local, missing_main, missing_colors, external, orphans)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Image manifest and database reconciliation')
+    parser.add_argument('--hashes', action='store_true', help='compute content hashes for every file')
+    parser.add_argument('--reconcile', action='store_true', help='check "Phones" image references')
+    args = parser.parse_args()
+
+    manifest = get_image_manifest()
+    if args.hashes:
+        for path in list(manifest.entries):
+            manifest.hash(path)
+    manifest.save()
+    print(f"{len(manifest)} files, {sum(e.size for e in manifest.entries.values()) / 1e6:.1f} MB")
+
+    if args.reconcile:
+        report = reconcile({'host': 'localhost', 'database': 'mobilephone_db', 'user': 'postgres'}, manifest)
+        print(f"{report.phones} phones, {report.local_references} local references, {report.external} external")
+        for phone_id, brand, model, path in report.missing_main:
+            print(f"❌ Id={phone_id} {brand} {model}: missing {path}")
+        for phone_id, brand, model, color, path in report.missing_colors:
+            print(f"❌ Id={phone_id} {brand} {model} [{color}]: missing {path}")
+        print(f"{len(report.missing_main)} missing main images, {len(report.missing_colors)} missing colour images, "
+              f"{len(report.orphans)} unreferenced files")
+
+
+if __name__ == '__main__':
+    main()
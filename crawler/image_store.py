@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Content-addressed image store
+Image bytes are kept once, as images/phones/blobs/<aa>/<sha256><ext>, and a
+manifest maps every logical file name and source URL to its hash. Identical
+front/back/colour images collapse into one blob, and an image whose URL (or
+hash) is already known is never downloaded again.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from fetch_engine import FetchEngine
+from image_downloads import DOWNLOAD_CONCURRENCY, MAX_IN_FLIGHT, DownloadJob
+from rate_limiter import STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+PHONES_DIR = os.path.join(PROJECT_ROOT, 'images', 'phones')
+BLOBS_DIR = os.path.join(PHONES_DIR, 'blobs')
+LOCAL_IMAGE_BASE = 'http://localhost:5198'
+DEFAULT_DB_PATH = os.path.join(STATE_DIR, 'image_store.sqlite')
+
+HASH_CHUNK_SIZE = 1024 * 1024
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.avif')
+
+# Leading bytes -> extension, so a PNG served from a .jpg URL is stored as .png
+MAGIC_EXTENSIONS = [
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+]
+
+
+def sniff_extension(head: bytes, default: Optional[str] = '.jpg') -> Optional[str]:
+    for magic, ext in MAGIC_EXTENSIONS:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return '.webp'
+    if head[4:12] in (b'ftypavif', b'ftypavis'):
+        return '.avif'
+    return default
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StoredImage(NamedTuple):
+    hash: str
+    ext: str
+    size: int
+
+    @property
+    def relative_path(self) -> str:
+        """Path below the project root, as stored in the database ('images/phones/blobs/...')"""
+        return f"images/phones/blobs/{self.hash[:2]}/{self.hash}{self.ext}"
+
+    @property
+    def path(self) -> str:
+        return os.path.join(PROJECT_ROOT, *self.relative_path.split('/'))
+
+    @property
+    def local_url(self) -> str:
+        return f"{LOCAL_IMAGE_BASE}/{self.relative_path}"
+
+
+class ImageStore:
+    """SHA-256 keyed blobs plus a name/URL -> hash manifest in SQLite"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        os.makedirs(BLOBS_DIR, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                ext TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS names (
+                name TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                url TEXT,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                hash TEXT NOT NULL
+            )
+        ''')
+        self._conn.commit()
+        self._blobs: Dict[str, StoredImage] = {
+            h: StoredImage(h, ext, size) for h, ext, size in self._conn.execute('SELECT hash, ext, size FROM blobs')}
+        self._names: Dict[str, str] = dict(self._conn.execute('SELECT name, hash FROM names'))
+        self._urls: Dict[str, str] = dict(self._conn.execute('SELECT url, hash FROM urls'))
+        self.deduplicated = 0
+
+    def temp_path(self) -> str:
+        """A fresh temp file next to the blobs, so adding it is a rename"""
+        fd, path = tempfile.mkstemp(dir=BLOBS_DIR, prefix='.incoming-', suffix='.part')
+        os.close(fd)
+        return path
+
+    def put_file(self, path: str, name: Optional[str] = None, url: Optional[str] = None,
+                 keep_source: bool = False) -> StoredImage:
+        """Add a file's bytes to the store (moved in unless keep_source) and record its name/URL"""
+        digest = hash_file(path)
+        with open(path, 'rb') as f:
+            head = f.read(16)
+        fallback = os.path.splitext(name or path)[1].lower()
+        stored = StoredImage(digest, sniff_extension(head, fallback if fallback in IMAGE_EXTENSIONS else '.jpg'),
+                             os.path.getsize(path))
+
+        with self._lock:
+            existing = self._blobs.get(digest)
+            if existing is not None and os.path.exists(existing.path):
+                stored = existing
+                self.deduplicated += 1
+                if not keep_source:
+                    os.unlink(path)
+            else:
+                os.makedirs(os.path.dirname(stored.path), exist_ok=True)
+                if keep_source:
+                    tmp = self.temp_path()
+                    with open(path, 'rb') as src, open(tmp, 'wb') as dst:
+                        for chunk in iter(lambda: src.read(HASH_CHUNK_SIZE), b''):
+                            dst.write(chunk)
+                    os.replace(tmp, stored.path)
+                else:
+                    os.replace(path, stored.path)
+                self._blobs[digest] = stored
+                self._conn.execute('INSERT OR REPLACE INTO blobs (hash, ext, size, created_at) VALUES (?, ?, ?, ?)',
+                                   (digest, stored.ext, stored.size, time.time()))
+            self._record(stored.hash, name, url)
+            self._conn.commit()
+        return stored
+
+    def put_bytes(self, data: bytes, name: Optional[str] = None, url: Optional[str] = None) -> StoredImage:
+        tmp = self.temp_path()
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        return self.put_file(tmp, name=name, url=url)
+
+    def _record(self, digest: str, name: Optional[str], url: Optional[str]):
+        now = time.time()
+        if name:
+            self._names[name] = digest
+            self._conn.execute('INSERT OR REPLACE INTO names (name, hash, url, updated_at) VALUES (?, ?, ?, ?)',
+                               (name, digest, url, now))
+        if url:
+            self._urls[url] = digest
+            self._conn.execute('INSERT OR REPLACE INTO urls (url, hash) VALUES (?, ?)', (url, digest))
+
+    def _blob(self, digest: Optional[str]) -> Optional[StoredImage]:
+        stored = self._blobs.get(digest) if digest else None
+        return stored if stored is not None and os.path.exists(stored.path) else None
+
+    def get(self, name: str) -> Optional[StoredImage]:
+        """Blob stored under a logical file name"""
+        with self._lock:
+            return self._blob(self._names.get(name))
+
+    def for_url(self, url: str) -> Optional[StoredImage]:
+        """Blob previously downloaded from this URL"""
+        with self._lock:
+            return self._blob(self._urls.get(url))
+
+    def alias(self, stored: StoredImage, name: Optional[str] = None, url: Optional[str] = None):
+        """Record another name/URL for bytes already in the store"""
+        with self._lock:
+            self._record(stored.hash, name, url)
+            self._conn.commit()
+
+    def import_directory(self, directory: str = PHONES_DIR, link: bool = False) -> Dict[str, int]:
+        """Hash every image file in a directory into the store. With link, each
+        original is replaced by a hard link to its blob, so existing paths keep
+        working while duplicate bytes are stored once."""
+        files = saved = 0
+        before = len(self._blobs)
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                stored = self.put_file(entry.path, name=entry.name, keep_source=True)
+                files += 1
+                if link and not os.path.samefile(entry.path, stored.path):
+                    tmp = self.temp_path()
+                    os.unlink(tmp)
+                    os.link(stored.path, tmp)
+                    os.replace(tmp, entry.path)
+                    saved += stored.size
+        return {'files': files, 'new_blobs': len(self._blobs) - before, 'bytes_relinked': saved}
+
+    def discard(self, digest: str) -> bool:
+        """Forget a blob and every name/URL pointing at it, deleting its file"""
+        with self._lock:
+            stored = self._blobs.pop(digest, None)
+            if stored is None:
+                return False
+            for mapping in (self._names, self._urls):
+                for key in [key for key, value in mapping.items() if value == digest]:
+                    del mapping[key]
+            for table in ('blobs', 'names', 'urls'):
+                self._conn.execute(f'DELETE FROM {table} WHERE hash = ?', (digest,))
+            self._conn.commit()
+            if os.path.exists(stored.path):
+                os.unlink(stored.path)
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'blobs': len(self._blobs), 'names': len(self._names), 'urls': len(self._urls),
+                    'bytes': sum(blob.size for blob in self._blobs.values()), 'deduplicated': self.deduplicated}
+
+
+_shared_store: Optional[ImageStore] = None
+
+
+def get_image_store() -> ImageStore:
+    """Process-wide store backed by the shared state directory"""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = ImageStore()
+    return _shared_store
+
+
+async def store_download(engine: FetchEngine, url: str, name: str,
+                         store: Optional[ImageStore] = None) -> StoredImage:
+    """Download one image into the store under name, unless its URL was stored before.
+    The file must decode before it becomes a blob, so no database row or job ledger entry
+    is ever pointed at an image the validation pass would purge."""
+    from image_validation import check_image  # image_validation imports this module
+
+    store = store or get_image_store()
+    stored = store.for_url(url)
+    if stored is not None:
+        store.alias(stored, name=name)
+        return stored
+    tmp = store.temp_path()
+    try:
+        await engine.download(url, tmp)
+        with open(tmp, 'rb') as f:
+            if sniff_extension(f.read(16), default=None) is None:
+                # Error pages served with a 200 must not become blobs
+                raise ValueError(f"Not an image: {url}")
+        check = await asyncio.to_thread(check_image, tmp)
+        if not check.ok:
+            raise ValueError(f"Broken image {url}: {check.error}")
+        stored = await asyncio.to_thread(store.put_file, tmp, name, url)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    logger.info(f"✅ Stored: {name} -> {stored.relative_path}")
+    return stored
+
+
+async def store_all(jobs: Iterable[DownloadJob], store: Optional[ImageStore] = None,
+                    engine: Optional[FetchEngine] = None, headers: Optional[Dict[str, str]] = None,
+                    per_host: int = DOWNLOAD_CONCURRENCY,
+                    max_in_flight: int = MAX_IN_FLIGHT) -> List[Optional[StoredImage]]:
+    """Download jobs into the store (job.path is the logical file name); URLs
+    already in the store are not fetched again. Returns blobs in job order,
+    None for failures."""
+    jobs = list(jobs)
+    store = store or get_image_store()
+    if engine is None:
+        async with FetchEngine(headers=headers, default_concurrency=per_host) as engine:
+            return await store_all(jobs, store, engine, max_in_flight=max_in_flight)
+
+    async def run(job: DownloadJob) -> StoredImage:
+        return await store_download(engine, job.url, os.path.basename(job.path), store)
+
+    results = await engine.map(run, jobs, max_in_flight=max_in_flight)
+    return [result if isinstance(result, StoredImage) else None for result in results]
+
+
+def store_images(jobs: Iterable[DownloadJob], headers: Optional[Dict[str, str]] = None,
+                 per_host: int = DOWNLOAD_CONCURRENCY,
+                 max_in_flight: int = MAX_IN_FLIGHT) -> List[Optional[StoredImage]]:
+    """Blocking wrapper around store_all for the synchronous crawlers"""
+    return asyncio.run(store_all(jobs, headers=headers, per_host=per_host, max_in_flight=max_in_flight))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Content-addressed image store')
+    sub = parser.add_subparsers(dest='command', required=True)
+    imp = sub.add_parser('import', help='hash an image directory into the store')
+    imp.add_argument('directory', nargs='?', default=PHONES_DIR)
+    imp.add_argument('--link', action='store_true', help='replace originals with hard links to their blobs')
+    sub.add_parser('stats', help='show store size')
+    args = parser.parse_args()
+
+    store = get_image_store()
+    if args.command == 'import':
+        print(store.import_directory(args.directory, link=args.link))
+    print(store.stats())
+
+
+if __name__ == '__main__':
+    main()
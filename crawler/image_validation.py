@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Image validation pass
+Decodes every image under images/phones (store blobs included) in a process
+pool with Pillow: verify() catches broken structure, a full decode catches
+truncated data, and HTML error pages saved as .jpg fail to open at all.
+Width/height/format of each file are recorded in .crawl_state so later runs
+only look at new or changed files.
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+from image_store import BLOBS_DIR, IMAGE_EXTENSIONS, PHONES_DIR, get_image_store
+from rate_limiter import STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(STATE_DIR, 'image_validation.sqlite')
+SKIP_DIRS = ('variants',)       # generated by image_variants.py
+CHUNK_SIZE = 16                 # files per worker task
+
+
+class ImageCheck(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+    ok: bool
+    format: Optional[str]
+    width: Optional[int]
+    height: Optional[int]
+    error: Optional[str]
+
+
+def check_image(path: str) -> ImageCheck:
+    """Verify and fully decode one file (runs in a worker process)"""
+    st = os.stat(path)
+    try:
+        with Image.open(path) as image:
+            image.verify()
+        # verify() leaves the image unusable; reopen to decode the pixel data
+        with Image.open(path) as image:
+            fmt, (width, height) = image.format, image.size
+            if fmt == 'JPEG':
+                # A reduced-scale decode still reads every scan, so truncation is still caught
+                image.draft(image.mode, (max(1, width // 8), max(1, height // 8)))
+            image.load()
+        return ImageCheck(path, st.st_size, st.st_mtime_ns, True, fmt, width, height, None)
+    except Exception as e:
+        return ImageCheck(path, st.st_size, st.st_mtime_ns, False, None, None, None, f"{type(e).__name__}: {e}")
+
+
+def _check_many(paths: List[str]) -> List[ImageCheck]:
+    return [check_image(path) for path in paths]
+
+
+def scan_images(root: Optional[str] = None) -> Dict[str, os.stat_result]:
+    """Image files below root, skipping generated variants"""
+    root = root or PHONES_DIR
+    files = {}
+    for directory, subdirs, names in os.walk(root):
+        subdirs[:] = [d for d in subdirs if not (directory == root and d in SKIP_DIRS)]
+        for name in names:
+            if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('.'):
+                path = os.path.join(directory, name)
+                files[path] = os.stat(path)
+    return files
+
+
+class ValidationLedger:
+    """Last validation result per file, reused while size and mtime are unchanged"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS images (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                ok INTEGER NOT NULL,
+                format TEXT,
+                width INTEGER,
+                height INTEGER,
+                error TEXT,
+                checked_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def results(self) -> Dict[str, ImageCheck]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT path, size, mtime_ns, ok, format, width, height, error FROM images').fetchall()
+        return {row[0]: ImageCheck(row[0], row[1], row[2], bool(row[3]), *row[4:]) for row in rows}
+
+    def record(self, checks: Iterable[ImageCheck]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO images (path, size, mtime_ns, ok, format, width, height, error, checked_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(c.path, c.size, c.mtime_ns, int(c.ok), c.format, c.width, c.height, c.error, now) for c in checks])
+            self._conn.commit()
+
+    def forget(self, paths: Iterable[str]):
+        with self._lock:
+            self._conn.executemany('DELETE FROM images WHERE path = ?', [(p,) for p in paths])
+            self._conn.commit()
+
+
+def validate_images(root: Optional[str] = None, workers: Optional[int] = None, force: bool = False,
+                    ledger: Optional[ValidationLedger] = None) -> Tuple[Dict[str, ImageCheck], List[ImageCheck]]:
+    """Validate new/changed files on all cores; returns (all results by path, invalid files)"""
+    ledger = ledger or ValidationLedger()
+    files = scan_images(root)
+    known = ledger.results()
+
+    gone = [path for path in known if path not in files and path.startswith(root or PHONES_DIR)]
+    ledger.forget(gone)
+    for path in gone:
+        del known[path]
+
+    pending = [path for path, st in files.items() if force or path not in known
+               or known[path].size != st.st_size or known[path].mtime_ns != st.st_mtime_ns]
+    if pending:
+        started = time.time()
+        chunks = [pending[i:i + CHUNK_SIZE] for i in range(0, len(pending), CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for checks in pool.map(_check_many, chunks):
+                ledger.record(checks)
+                known.update((check.path, check) for check in checks)
+        logger.info(f"Validated {len(pending)} images in {time.time() - started:.1f}s "
+                    f"({len(files) - len(pending)} unchanged)")
+
+    results = {path: known[path] for path in files}
+    invalid = [check for check in results.values() if not check.ok]
+    for check in invalid:
+        logger.warning(f"❌ Invalid image {os.path.relpath(check.path, root or PHONES_DIR)}: {check.error}")
+    return results, invalid
+
+
+def purge_invalid(invalid: Iterable[ImageCheck]) -> int:
+    """Drop invalid blobs from the image store. Downloads are decoded before they are
+    stored, so only older or damaged blobs get here; database rows already pointing at
+    one keep the dead path and have to be reset by hand."""
+    store = get_image_store()
+    purged = 0
+    for check in invalid:
+        digest = os.path.splitext(os.path.basename(check.path))[0]
+        if os.path.commonpath([check.path, BLOBS_DIR]) == BLOBS_DIR and store.discard(digest):
+            purged += 1
+            logger.info(f"🗑️ Removed invalid blob {digest[:12]} from the image store")
+    return purged
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Validate downloaded phone images')
+    parser.add_argument('directory', nargs='?', default=PHONES_DIR)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='re-check files even if unchanged')
+    parser.add_argument('--purge', action='store_true', help='remove invalid blobs from the image store (rows using them are not reset)')
+    args = parser.parse_args()
+
+    results, invalid = validate_images(os.path.abspath(args.directory), args.workers, args.force)
+    formats: Dict[str, int] = {}
+    for check in results.values():
+        if check.ok:
+            formats[check.format] = formats.get(check.format, 0) + 1
+    print(f"{len(results)} images: {len(results) - len(invalid)} valid {formats}, {len(invalid)} invalid")
+    if args.purge and invalid:
+        print(f"Purged {purge_invalid(invalid)} invalid blobs from the image store")
+
+
+if __name__ == '__main__':
+    main()
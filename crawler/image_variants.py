@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Responsive image variants
+Renders every phone image under images/phones at a few card/detail widths as
+WebP (and AVIF when Pillow supports it) in a process pool, and writes
+images/phones/variants/manifest.json mapping each source path to its
+variants so the backend/frontend can serve small thumbnails instead of the
+full originals. Runs are incremental: unchanged sources are skipped by
+size/mtime, and identical bytes are rendered once (outputs are keyed by the
+source's content hash).
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps, features
+
+from image_store import IMAGE_EXTENSIONS, PHONES_DIR, hash_file
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = os.path.join(PHONES_DIR, 'variants')
+MANIFEST_PATH = os.path.join(VARIANTS_DIR, 'manifest.json')
+
+VARIANT_WIDTHS = (160, 320, 640)
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'avif': {'format': 'AVIF', 'quality': 60, 'speed': 6},
+}
+MANIFEST_VERSION = 1
+
+
+def available_formats() -> List[str]:
+    return [name for name in FORMATS if features.check(name)]
+
+
+def variant_relative_path(digest: str, width: int, fmt: str) -> str:
+    """Variant path below images/phones"""
+    return f"variants/{digest[:2]}/{digest}-{width}.{fmt}"
+
+
+def render_variants(source: str, digest: str, widths: Tuple[int, ...], formats: Tuple[str, ...]) -> Dict:
+    """Worker: decode the source once and write every missing width/format; returns its manifest entry"""
+    variants = []
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        width, height = image.size
+        # Never upscale: sources narrower than a width only get their own size
+        targets = sorted({min(w, width) for w in widths})
+        for target in targets:
+            resized = image if target == width else image.resize(
+                (target, max(1, round(height * target / width))), Image.LANCZOS)
+            for fmt in formats:
+                relative = variant_relative_path(digest, target, fmt)
+                path = os.path.join(PHONES_DIR, *relative.split('/'))
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.variant-', suffix='.part')
+                    os.close(fd)
+                    try:
+                        options = dict(FORMATS[fmt])
+                        resized.save(tmp, options.pop('format'), **options)
+                        os.chmod(tmp, 0o644)
+                        os.replace(tmp, path)
+                    finally:
+                        if os.path.exists(tmp):
+                            os.unlink(tmp)
+                variants.append({'width': resized.width, 'height': resized.height, 'format': fmt,
+                                 'path': f"images/phones/{relative}", 'bytes': os.path.getsize(path)})
+    return {'hash': digest, 'width': width, 'height': height, 'variants': variants}
+
+
+def scan_sources(root: Optional[str] = None) -> Dict[str, os.stat_result]:
+    """Image files below root (excluding generated variants), relative path -> stat"""
+    root = root or PHONES_DIR
+    sources = {}
+    for directory, subdirs, files in os.walk(root):
+        subdirs[:] = [d for d in subdirs if os.path.join(directory, d) != VARIANTS_DIR]
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('.'):
+                path = os.path.join(directory, name)
+                sources[os.path.relpath(path, root).replace(os.sep, '/')] = os.stat(path)
+    return sources
+
+
+def load_manifest(path: Optional[str] = None) -> Dict:
+    try:
+        with open(path or MANIFEST_PATH, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': MANIFEST_VERSION, 'images': {}}
+
+
+def save_manifest(manifest: Dict, path: Optional[str] = None):
+    path = path or MANIFEST_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.manifest-', suffix='.part')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def build_variants(widths: Tuple[int, ...] = VARIANT_WIDTHS, formats: Optional[Tuple[str, ...]] = None,
+                   workers: Optional[int] = None, force: bool = False) -> Dict[str, int]:
+    """Bring variants/ and the manifest up to date with images/phones"""
+    formats = tuple(formats or available_formats())
+    manifest = load_manifest()
+    images = manifest['images']
+    settings = {'widths': list(widths), 'formats': list(formats)}
+    if manifest.get('settings') != settings:
+        force = True
+    manifest['settings'] = settings
+
+    sources = scan_sources()
+    stale = [name for name in images if name not in sources]
+    for name in stale:
+        del images[name]
+
+    # Sources whose size/mtime are unchanged keep their entry without being re-read
+    changed = {}
+    for name, st in sources.items():
+        entry = images.get(name)
+        if not force and entry and entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns:
+            continue
+        changed[name] = st
+
+    by_hash: Dict[str, List[str]] = {}
+    for name in changed:
+        by_hash.setdefault(hash_file(os.path.join(PHONES_DIR, *name.split('/'))), []).append(name)
+
+    rendered = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_variants, os.path.join(PHONES_DIR, *names[0].split('/')),
+                               digest, tuple(widths), formats): digest
+                   for digest, names in by_hash.items()}
+        for future in as_completed(futures):
+            digest = futures[future]
+            names = by_hash[digest]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error(f"❌ Could not render {names[0]}: {e}")
+                continue
+            rendered += 1
+            for name in names:
+                st = changed[name]
+                images[name] = {**result, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+            logger.info(f"✅ {names[0]}: {len(result['variants'])} variants")
+
+    manifest['generated_at'] = time.time()
+    save_manifest(manifest)
+    return {'sources': len(sources), 'changed': len(changed), 'rendered': rendered,
+            'failed': failed, 'removed': len(stale)}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Generate resized WebP/AVIF variants of phone images')
+    parser.add_argument('--widths', type=int, nargs='+', default=list(VARIANT_WIDTHS))
+    parser.add_argument('--formats', nargs='+', choices=list(FORMATS), default=None,
+                        help='output formats (default: all Pillow supports)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='re-check every source')
+    args = parser.parse_args()
+
+    started = time.time()
+    stats = build_variants(tuple(args.widths), tuple(args.formats) if args.formats else None,
+                           args.workers, args.force)
+    logger.info(f"🎯 Variants up to date in {time.time() - started:.1f}s: {stats}")
+
+
+if __name__ == '__main__':
+    main()
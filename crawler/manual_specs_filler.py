@@ -4,12 +4,15 @@ Manual phone specs data filler
 Fill missing ScreenSize, Ram, Battery fields based on publicly available official specifications
 """
 
-import psycopg2
+from change_buffer import ChangeBuffer
+from db_pool import pooled_connect
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DB_CONFIG = {'host': 'localhost', 'database': 'mobilephone_db', 'user': 'postgres'}
+
 # Phone specs database - Based on official public information
 PHONE_SPECS = {
     # ASUS ROG series
@@ -499,7 +502,7 @@ PHONE_SPECS = {
 def get_phones_to_update():
     """Get phones that need specs update"""
     try:
-        conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+        conn = pooled_connect(**DB_CONFIG)
         cur = conn.cursor()
         
         cur.execute('''
@@ -523,48 +526,31 @@ def get_phones_to_update():
         logger.error(f"Database error: {e}")
         return []
 
-def update_phone_specs(phone_id, brand, model, specs):
-    """Update phone with specs data"""
-    try:
-        conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
-        cur = conn.cursor()
-        
-        update_fields = []
-        values = []
-        
-        if specs.get('screen_size'):
-            update_fields.append('"ScreenSize" = %s')
-            values.append(specs['screen_size'])
-        
-        if specs.get('ram'):
-            update_fields.append('"Ram" = %s')
-            values.append(specs['ram'])
-        
-        if specs.get('battery'):
-            update_fields.append('"Battery" = %s')
-            values.append(specs['battery'])
-        
-        if specs.get('storage'):
-            update_fields.append('"Storage" = %s')
-            values.append(specs['storage'])
-        
-        if update_fields:
-            query = f'UPDATE "Phones" SET {", ".join(update_fields)} WHERE "Id" = %s'
-            values.append(phone_id)
-            
-            cur.execute(query, values)
-            conn.commit()
-            
-            logger.info(f"✅ Updated {brand} {model}: {len(update_fields)} fields")
-            return True
-        
-        cur.close()
-        conn.close()
-        return False
-        
-    except Exception as e:
-        logger.error(f"Database update error for {brand} {model}: {e}")
+def update_phone_specs(buffer, phone_id, brand, model, specs):
+    """Propose the specs data for a phone; only values that differ get written"""
+    fields = {}
+    
+    if specs.get('screen_size'):
+        fields['ScreenSize'] = specs['screen_size']
+    
+    if specs.get('ram'):
+        fields['Ram'] = specs['ram']
+    
+    if specs.get('battery'):
+        fields['Battery'] = specs['battery']
+    
+    if specs.get('storage'):
+        fields['Storage'] = specs['storage']
+    
+    if not fields:
         return False
+    
+    changed = buffer.propose(phone_id, fields)
+    if changed:
+        logger.info(f"✅ Updated {brand} {model}: {len(changed)} fields")
+    else:
+        logger.info(f"➖ {brand} {model} already up to date")
+    return True
 
 def fill_manual_specs():
     """Main function to fill specs manually"""
@@ -577,20 +563,22 @@ def fill_manual_specs():
     success_count = 0
     no_data_count = 0
     
-    for phone_id, brand, model in phones:
-        full_name = f"{brand} {model}"
-        logger.info(f"\n📱 Processing: {full_name}")
+    with ChangeBuffer(DB_CONFIG, ('ScreenSize', 'Ram', 'Battery', 'Storage')) as buffer:
+        buffer.load(phone_id for phone_id, _, _ in phones)
+        for phone_id, brand, model in phones:
+            full_name = f"{brand} {model}"
+            logger.info(f"\n📱 Processing: {full_name}")
         
-        if full_name in PHONE_SPECS:
-            specs = PHONE_SPECS[full_name]
-            if update_phone_specs(phone_id, brand, model, specs):
-                success_count += 1
-                logger.info(f"✅ {full_name}: Screen {specs.get('screen_size', 'N/A')}, RAM {specs.get('ram', 'N/A')}, Battery {specs.get('battery', 'N/A')}")
+            if full_name in PHONE_SPECS:
+                specs = PHONE_SPECS[full_name]
+                if update_phone_specs(buffer, phone_id, brand, model, specs):
+                    success_count += 1
+                    logger.info(f"✅ {full_name}: Screen {specs.get('screen_size', 'N/A')}, RAM {specs.get('ram', 'N/A')}, Battery {specs.get('battery', 'N/A')}")
+                else:
+                    logger.error(f"❌ Failed to update {full_name}")
             else:
-                logger.error(f"❌ Failed to update {full_name}")
-        else:
-            logger.warning(f"⚠️ No specs data for {full_name}")
-            no_data_count += 1
+                logger.warning(f"⚠️ No specs data for {full_name}")
+                no_data_count += 1
     
     logger.info(f"\n🎯 Manual Specs Fill completed!")
     logger.info(f"✅ Updated: {success_count}")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Phone model name matcher
+Scores every search result against a brand/model at once instead of taking
+the first link that shares "any word" with the model. Model codes (S24,
+Note20, iPhone 15, Flip5) must agree exactly and variant words
+(Pro / Max / Ultra / + / mini / FE / 5G ...) count against a candidate when
+they appear on only one side, so Galaxy S24 no longer resolves to S24 Ultra.
+"""
+
+import re
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+# Letters, digits and '+' as separate tokens; 5G/4G and one-letter suffixes (12R, 14T) stay whole
+TOKEN_RE = re.compile(r'(?<![a-z0-9])[45]g(?![a-z0-9])|\d+[a-z](?![a-z0-9])|[a-z]+|\d+|\+')
+
+# Words that tell sibling models of the same generation apart
+VARIANT_WORDS = frozenset({
+    'pro', 'max', 'ultra', 'plus', 'mini', 'lite', 'fe', 'se', 'edge', 'neo', 'prime', 'turbo',
+    'active', 'classic', 'explorer', 'fold', 'flip', 'xl', '5g', '4g',
+})
+
+# Makers that head GSMArena search results; a result led by another one is never a match
+KNOWN_BRANDS = frozenset({
+    'apple', 'samsung', 'google', 'xiaomi', 'huawei', 'honor', 'oneplus', 'oppo', 'vivo', 'realme',
+    'sony', 'asus', 'motorola', 'nokia', 'nothing', 'zte', 'nubia', 'meizu', 'lenovo', 'lg',
+    'tecno', 'infinix',
+})
+
+VARIANT_MISSING_PENALTY = 0.3   # query says Pro, candidate does not
+VARIANT_EXTRA_PENALTY = 0.25    # candidate says Ultra, query does not
+WORD_MISMATCH_WEIGHT = 0.2      # scaled by 1 - Jaccard overlap of the remaining words
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+
+class ModelFeatures(NamedTuple):
+    lead: str                   # first token, before the brand is stripped
+    codes: FrozenSet[str]       # tokens carrying digits: s24, iphone15, note20, 14
+    variants: FrozenSet[str]    # pro, max, ultra, plus, 5g ...
+    words: FrozenSet[str]       # everything else: galaxy, redmi, z ...
+
+
+class MatchResult(NamedTuple):
+    url: str
+    name: str
+    score: float
+    confidence: float
+
+
+def tokenize(text: str) -> List[str]:
+    """'Galaxy S24+ 5G' -> ['galaxy', 's', '24', 'plus', '5g']"""
+    return ['plus' if token == '+' else token for token in TOKEN_RE.findall(text.lower())]
+
+
+@lru_cache(maxsize=20000)
+def model_features(text: str, brand: str = '') -> ModelFeatures:
+    """Split a phone name into model codes, variant words and other words, ignoring the brand"""
+    tokens = tokenize(text)
+    lead = tokens[0] if tokens else ''
+    brand_tokens = set(tokenize(brand))
+    tokens = [token for token in tokens if token not in brand_tokens]
+
+    # Glue a word to the number after it, so "Note 20" == "Note20" and "S 24" == "S24"
+    merged = []
+    for token in tokens:
+        if token.isdigit() and merged and merged[-1].isalpha() and merged[-1] not in VARIANT_WORDS:
+            merged[-1] += token
+        else:
+            merged.append(token)
+
+    codes, variants, words = set(), set(), set()
+    for token in merged:
+        if token in VARIANT_WORDS:
+            variants.add(token)
+        elif any(ch.isdigit() for ch in token):
+            codes.add(token)
+        else:
+            words.add(token)
+    return ModelFeatures(lead, frozenset(codes), frozenset(variants), frozenset(words))
+
+
+def score_features(query: ModelFeatures, candidate: ModelFeatures) -> float:
+    """0..1 similarity of a candidate to the query; 0 when the model codes disagree"""
+    if query.codes != candidate.codes:
+        return 0.0
+    if not query.codes and not (query.words & candidate.words):
+        return 0.0
+    score = 1.0
+    score -= VARIANT_MISSING_PENALTY * len(query.variants - candidate.variants)
+    score -= VARIANT_EXTRA_PENALTY * len(candidate.variants - query.variants)
+    union = query.words | candidate.words
+    if union:
+        score -= WORD_MISMATCH_WEIGHT * (1 - len(query.words & candidate.words) / len(union))
+    return max(0.0, score)
+
+
+def score_candidates(brand: str, model: str, candidates: Iterable[Tuple[str, str]]) -> List[MatchResult]:
+    """Score every (name, url) candidate in one pass, best first; zero scores are dropped"""
+    query = model_features(model, brand)
+    brand_tokens = set(tokenize(brand))
+    results = []
+    seen = set()
+    for name, url in candidates:
+        if not name or url in seen:
+            continue
+        seen.add(url)
+        features = model_features(name, brand)
+        if features.lead in KNOWN_BRANDS and features.lead not in brand_tokens:
+            continue
+        score = score_features(query, features)
+        if score > 0:
+            results.append(MatchResult(url, name, score, score))
+    results.sort(key=lambda result: result.score, reverse=True)
+    return results
+
+
+def best_match(brand: str, model: str, candidates: Iterable[Tuple[str, str]],
+               min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> Optional[MatchResult]:
+    """Best candidate if confident enough; a tie with another URL halves the confidence"""
+    results = score_candidates(brand, model, candidates)
+    if not results:
+        return None
+    best = results[0]
+    if len(results) > 1 and results[1].score == best.score:
+        best = best._replace(confidence=best.score / 2)
+    return best if best.confidence >= min_confidence else None
@@ -5,14 +5,16 @@ Specifically targets OnePlus and OPPO phones
 """
 
 import requests
-import time
 import json
-import psycopg2
+from db_pool import pooled_connect
 import os
-from bs4 import BeautifulSoup
 import logging
-from urllib.parse import urljoin, quote
-import re
+from urllib.parse import quote
+from model_matcher import best_match
+from phone_index import indexed_search, search_candidates
+from response_cache import CachedSession
+from spec_fields import ONEPLUS_FALLBACK_RULES, ONEPLUS_RULES
+from gsmarena_parser import get_spec_store
 
 # Configure logging
 logging.basicConfig(
@@ -28,7 +30,7 @@ logger = logging.getLogger(__name__)
 class OnePlusOppoCrawler:
     def __init__(self, db_config):
         self.db_config = db_config
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -38,11 +40,12 @@ class OnePlusOppoCrawler:
             'Upgrade-Insecure-Requests': '1',
         })
         self.base_url = "https://www.gsmarena.com"
+        self.spec_records = get_spec_store()
         
     def get_phones_to_update(self):
         """Get OnePlus and OPPO phones that need detailed specs"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cur = conn.cursor()
             
             query = '''
@@ -66,6 +69,7 @@ class OnePlusOppoCrawler:
             logger.error(f"Database error: {e}")
             return []
     
+    @indexed_search()
     def search_phone_on_gsmarena(self, brand, model):
         """Search for phone on GSMArena"""
         try:
@@ -78,34 +82,10 @@ class OnePlusOppoCrawler:
             response = self.session.get(search_url, timeout=10)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for phone links in search results
-            phone_links = soup.find_all('a', href=re.compile(r'\.php$'))
-            
-            for link in phone_links:
-                href = link.get('href', '')
-                link_text = link.get_text(strip=True).lower()
-                
-                # Check if this link matches our phone
-                brand_lower = brand.lower()
-                model_lower = model.lower()
-                
-                # Handle special cases
-                if brand_lower == 'oneplus':
-                    brand_patterns = ['oneplus', 'one plus']
-                elif brand_lower == 'oppo':
-                    brand_patterns = ['oppo']
-                else:
-                    brand_patterns = [brand_lower]
-                
-                # Check if brand matches
-                brand_match = any(pattern in link_text for pattern in brand_patterns)
-                
-                if brand_match and any(word in link_text for word in model_lower.split()):
-                    phone_url = urljoin(self.base_url, href)
-                    logger.info(f"Found match: {phone_url}")
-                    return phone_url
+            match = best_match(brand, model, search_candidates(response.content, self.base_url))
+            if match:
+                logger.info(f"Found match: {match.name} -> {match.url} (confidence {match.confidence:.2f})")
+                return match.url
             
             logger.warning(f"No product page found for {brand} {model}")
             return None
@@ -123,59 +103,13 @@ class OnePlusOppoCrawler:
     def extract_phone_specs(self, phone_url):
         """Extract detailed specs from phone page"""
         try:
-            response = self.session.get(phone_url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            record = self.spec_records.get(self.session, phone_url)
             
-            specs = {}
+            # Extract specifications from the first specs table
+            specs = ONEPLUS_RULES.apply(record.pairs(record.tables[:1]))
             
-            # Extract specifications from the specs table
-            spec_table = soup.find('table', {'cellspacing': '0'})
-            if spec_table:
-                rows = spec_table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    if len(cells) >= 2:
-                        key = cells[0].get_text(strip=True).lower()
-                        value = cells[1].get_text(strip=True)
-                        
-                        # Map GSMArena fields to our database fields
-                        if 'weight' in key:
-                            specs['weight'] = value
-                        elif 'dimensions' in key:
-                            specs['dimensions'] = value
-                        elif any(word in key for word in ['chipset', 'cpu', 'processor']):
-                            specs['processor'] = value
-                        elif 'os' in key:
-                            specs['os'] = value
-                        elif any(word in key for word in ['network', '2g', '3g', '4g', '5g']):
-                            specs['network_type'] = value
-                        elif any(word in key for word in ['charging', 'battery']):
-                            specs['charging_power'] = value
-                        elif any(word in key for word in ['water', 'protection', 'ip']):
-                            specs['water_resistance'] = value
-                        elif any(word in key for word in ['build', 'body', 'material']):
-                            specs['material'] = value
-            
-            # Also try to extract from detailed specs sections
-            spec_sections = soup.find_all('table', class_='st')
-            for section in spec_sections:
-                rows = section.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    if len(cells) >= 2:
-                        key = cells[0].get_text(strip=True).lower()
-                        value = cells[1].get_text(strip=True)
-                        
-                        if not specs.get('weight') and 'weight' in key:
-                            specs['weight'] = value
-                        elif not specs.get('dimensions') and 'dimensions' in key:
-                            specs['dimensions'] = value
-                        elif not specs.get('processor') and any(word in key for word in ['chipset', 'cpu']):
-                            specs['processor'] = value
-                        elif not specs.get('os') and 'os' in key:
-                            specs['os'] = value
+            # Also try to extract from the detailed specs sections
+            ONEPLUS_FALLBACK_RULES.apply(record.pairs(record.tables[1:]), specs)
             
             logger.info(f"Extracted {len(specs)} specs: {list(specs.keys())}")
             return specs
@@ -187,7 +121,7 @@ class OnePlusOppoCrawler:
     def update_phone_in_db(self, phone_id, specs):
         """Update phone with extracted specs"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cur = conn.cursor()
             
             # Build update query dynamically based on available specs
@@ -269,9 +203,6 @@ class OnePlusOppoCrawler:
             else:
                 fail_count += 1
                 logger.error(f"❌ Failed to update {brand} {model}")
-            
-            # Add delay between requests
-            time.sleep(3)
         
         logger.info(f"\n🎯 OnePlus/OPPO Crawling completed!")
         logger.info(f"✅ Success: {success_count}")
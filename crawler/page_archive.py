@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Raw page archive
+Every page the crawlers fetch is appended, as received, to gzip-compressed
+WARC files in .crawl_state/archive (one gzip member per record, so any record
+can be read on its own) and indexed by URL and fetch time in SQLite. A page
+whose body did not change since its last capture only gets an index row
+pointing at the earlier record.
+
+When an extractor turns out to be wrong, `reparse` runs an extractor over the
+archived pages on all cores without any network access, e.g. after bumping
+gsmarena_parser.PARSER_VERSION:
+
+    python page_archive.py reparse gsmarena_specs          # refresh the spec record store
+    python page_archive.py reparse zol_specs --match '%detail.zol.com.cn%' --output zol.jsonl
+    python page_archive.py reparse mymodule:extract        # any f(body: bytes, url: str) -> JSON value
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.client import responses as HTTP_REASONS
+from typing import Any, Callable, Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+from rate_limiter import STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.path.join(STATE_DIR, 'archive')
+INDEX_NAME = 'index.sqlite'
+SEGMENT_SIZE = 256 * 1024 * 1024    # start a new .warc.gz after this many bytes
+CHUNK_SIZE = 32                     # pages per reparse task
+# Describe the stored (already decoded) body, not the original transfer
+DROPPED_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length', 'connection')
+
+
+class ArchivedPage(NamedTuple):
+    url: str
+    fetched_at: float
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+class PageLocation(NamedTuple):
+    url: str
+    fetched_at: float
+    segment: str
+    offset: int
+    length: int
+    status: int
+    digest: str
+
+
+def is_archivable(status: int, headers: Mapping[str, str]) -> bool:
+    """Successful text/HTML responses; images live in the image store"""
+    content_type = next((v for k, v in headers.items() if k.lower() == 'content-type'), '').lower()
+    return 200 <= status < 300 and (content_type.startswith('text/') or 'html' in content_type
+                                    or 'json' in content_type)
+
+
+def payload_digest(body: bytes) -> str:
+    """WARC-Payload-Digest style SHA-1"""
+    return 'sha1:' + base64.b32encode(hashlib.sha1(body).digest()).decode('ascii')
+
+
+def warc_record(url: str, fetched_at: float, status: int, headers: Mapping[str, str], body: bytes,
+                digest: str) -> bytes:
+    """One WARC/1.0 response record"""
+    http_headers = ''.join(f"{k}: {v}\r\n" for k, v in headers.items() if k.lower() not in DROPPED_HEADERS)
+    block = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n{http_headers}"
+             f"Content-Length: {len(body)}\r\n\r\n").encode('utf-8') + body
+    warc_headers = (
+        'WARC/1.0\r\n'
+        'WARC-Type: response\r\n'
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+        f"WARC-Date: {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(fetched_at))}\r\n"
+        f"WARC-Target-URI: {url}\r\n"
+        f"WARC-Payload-Digest: {digest}\r\n"
+        'Content-Type: application/http; msgtype=response\r\n'
+        f"Content-Length: {len(block)}\r\n\r\n"
+    ).encode('utf-8')
+    return warc_headers + block + b'\r\n\r\n'
+
+
+def parse_record(data: bytes, fetched_at: float = 0.0) -> ArchivedPage:
+    """Split a WARC response record back into URL, status, headers and body"""
+    warc_head, _, rest = data.partition(b'\r\n\r\n')
+    fields = dict(line.split(': ', 1) for line in warc_head.decode('utf-8').split('\r\n')[1:] if ': ' in line)
+    block = rest[:int(fields['Content-Length'])]
+    http_head, _, body = block.partition(b'\r\n\r\n')
+    lines = http_head.decode('utf-8', 'replace').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = dict(line.split(': ', 1) for line in lines[1:] if ': ' in line)
+    return ArchivedPage(fields['WARC-Target-URI'], fetched_at, status, headers, body)
+
+
+def read_page(directory: str, location: PageLocation) -> ArchivedPage:
+    with open(os.path.join(directory, location.segment), 'rb') as f:
+        f.seek(location.offset)
+        member = f.read(location.length)
+    return parse_record(gzip.decompress(member), location.fetched_at)
+
+
+class PageArchive:
+    """Append-only WARC segments plus a URL/fetch-time index"""
+
+    def __init__(self, directory: str = ARCHIVE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, INDEX_NAME), timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                status INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                revisit INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS pages_url ON pages (url, fetched_at)')
+        self._conn.commit()
+        self._segment: Optional[str] = None
+        self._file = None
+        self.written = 0
+        self.revisits = 0
+
+    def _open_segment(self):
+        # One writer per segment: each process appends to files it created itself
+        if self._file is not None:
+            self._file.close()
+        self._segment = f"pages-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:4]}.warc.gz"
+        self._file = open(os.path.join(self.directory, self._segment), 'ab')
+
+    def record(self, url: str, status: int, headers: Mapping[str, str], body: bytes,
+               fetched_at: Optional[float] = None) -> Optional[PageLocation]:
+        """Archive one response under its (normalised) URL; returns where it was stored,
+        or None if the response is not worth keeping"""
+        if not is_archivable(status, headers):
+            return None
+        fetched_at = fetched_at or time.time()
+        digest = payload_digest(body)
+        previous = self.latest_location(url)
+        if previous is not None and previous.digest == digest:
+            location = previous._replace(fetched_at=fetched_at)
+            revisit = 1
+        else:
+            member = gzip.compress(warc_record(url, fetched_at, status, headers, body, digest), compresslevel=6)
+            revisit = 0
+        with self._lock:
+            if not revisit:
+                if self._file is None or self._file.tell() >= SEGMENT_SIZE:
+                    self._open_segment()
+                offset = self._file.tell()
+                self._file.write(member)
+                self._file.flush()
+                location = PageLocation(url, fetched_at, self._segment, offset, len(member), status, digest)
+                self.written += 1
+            else:
+                self.revisits += 1
+            self._conn.execute(
+                'INSERT INTO pages (url, fetched_at, segment, offset, length, status, digest, revisit) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', location[:7] + (revisit,))
+            self._conn.commit()
+        return location
+
+    def latest_location(self, url: str) -> Optional[PageLocation]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, fetched_at, segment, offset, length, status, digest FROM pages '
+                'WHERE url = ? ORDER BY fetched_at DESC LIMIT 1', (url,)).fetchone()
+        return PageLocation(*row) if row else None
+
+    def latest(self, url: str) -> Optional[ArchivedPage]:
+        """Most recent capture of a URL, read from disk"""
+        location = self.latest_location(url)
+        return read_page(self.directory, location) if location else None
+
+    def history(self, url: str) -> List[PageLocation]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT url, fetched_at, segment, offset, length, status, digest FROM pages '
+                'WHERE url = ? ORDER BY fetched_at', (url,)).fetchall()
+        return [PageLocation(*row) for row in rows]
+
+    def locations(self, match: str = '%', latest_only: bool = True) -> List[PageLocation]:
+        """Index entries whose URL matches a LIKE pattern; by default only each URL's newest"""
+        columns = 'url, fetched_at, segment, offset, length, status, digest'
+        if latest_only:
+            query = (f'SELECT {columns} FROM pages p WHERE url LIKE ? AND fetched_at = '
+                     '(SELECT MAX(fetched_at) FROM pages WHERE url = p.url) ORDER BY segment, offset')
+        else:
+            query = f'SELECT {columns} FROM pages WHERE url LIKE ? AND revisit = 0 ORDER BY segment, offset'
+        with self._lock:
+            rows = self._conn.execute(query, (match,)).fetchall()
+        return [PageLocation(*row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            captures, urls, records = self._conn.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT url), SUM(1 - revisit) FROM pages').fetchone()
+        segments = [name for name in os.listdir(self.directory) if name.endswith('.warc.gz')]
+        size = sum(os.path.getsize(os.path.join(self.directory, name)) for name in segments)
+        return {'captures': captures, 'urls': urls, 'records': records or 0, 'segments': len(segments),
+                'mb': round(size / 1e6, 1)}
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_shared_archive: Optional[PageArchive] = None
+
+
+def get_page_archive() -> PageArchive:
+    """Process-wide archive in the shared state directory"""
+    global _shared_archive
+    if _shared_archive is None:
+        _shared_archive = PageArchive()
+    return _shared_archive
+
+
+# Extractors: f(body, url) -> JSON-serialisable value, run in worker processes
+
+def extract_gsmarena_specs(body: bytes, url: str) -> Dict:
+    from gsmarena_parser import parse_spec_page
+    return parse_spec_page(body, url).to_dict()
+
+
+def extract_gsmarena_details(body: bytes, url: str) -> Dict:
+    from gsmarena_parser import parse_spec_page
+    from spec_fields import GSMARENA_RULES
+    return GSMARENA_RULES.apply(parse_spec_page(body, url).pairs())
+
+
+def extract_zol_specs(body: bytes, url: str) -> Dict:
+    from html_parsing import parse_html, table_rows
+    from spec_fields import ZOL_RULES
+    from zol_flagship_crawler import PARAM_TABLE_XPATH
+    doc = parse_html(body)
+    tables = table_rows(doc, PARAM_TABLE_XPATH) or table_rows(doc)
+    return ZOL_RULES.apply((cells[0], cells[1]) for rows in tables for cells in rows if len(cells) >= 2)
+
+
+def save_spec_records(results: List[Tuple[str, float, Any]]):
+    """Parent-side sink for gsmarena_specs: replace stored records with the re-parsed ones"""
+    from gsmarena_parser import PhoneSpecRecord, get_spec_store
+    store = get_spec_store()
+    for _, _, record in results:
+        store.save(PhoneSpecRecord.from_dict(record))
+
+
+# name -> (extractor, sink run in the parent on each finished chunk, or None)
+EXTRACTORS: Dict[str, Tuple[Callable[[bytes, str], Any], Optional[Callable]]] = {
+    'gsmarena_specs': (extract_gsmarena_specs, save_spec_records),
+    'gsmarena_details': (extract_gsmarena_details, None),
+    'zol_specs': (extract_zol_specs, None),
+}
+
+
+def resolve_extractor(name: str) -> Callable[[bytes, str], Any]:
+    """A registered extractor, or 'module:function'"""
+    if name in EXTRACTORS:
+        return EXTRACTORS[name][0]
+    module, _, function = name.partition(':')
+    if not function:
+        raise ValueError(f"Unknown extractor {name!r}; use one of {sorted(EXTRACTORS)} or module:function")
+    return getattr(importlib.import_module(module), function)
+
+
+def _extract_many(task: Tuple[str, str, List[PageLocation]]) -> List[Tuple[str, float, Any, Optional[str]]]:
+    """Worker: read and run the extractor over one chunk of archived pages"""
+    directory, name, locations = task
+    extract = resolve_extractor(name)
+    results = []
+    for location in locations:
+        try:
+            page = read_page(directory, location)
+            results.append((location.url, location.fetched_at, extract(page.body, page.url), None))
+        except Exception as e:
+            results.append((location.url, location.fetched_at, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def reparse(name: str, match: str = '%', latest_only: bool = True, workers: Optional[int] = None,
+            archive: Optional[PageArchive] = None) -> Iterator[Tuple[str, float, Any, Optional[str]]]:
+    """Run an extractor over archived pages on all cores; yields (url, fetched_at, result, error).
+    A registered extractor's sink is applied to each chunk's successful results."""
+    archive = archive or get_page_archive()
+    resolve_extractor(name)  # fail before starting the pool
+    sink = EXTRACTORS[name][1] if name in EXTRACTORS else None
+    locations = archive.locations(match, latest_only)
+    chunks = [(archive.directory, name, locations[i:i + CHUNK_SIZE]) for i in range(0, len(locations), CHUNK_SIZE)]
+    started = time.time()
+    done = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(_extract_many, chunks):
+            ok = [(url, fetched_at, result) for url, fetched_at, result, error in results if error is None]
+            if sink and ok:
+                sink(ok)
+            done += len(results)
+            failed += len(results) - len(ok)
+            yield from results
+    elapsed = time.time() - started
+    logger.info(f"Re-parsed {done} pages with {name} in {elapsed:.1f}s "
+                f"({done / elapsed if elapsed else 0:.0f} pages/s, {failed} failed)")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Raw page archive and offline re-parsing')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('stats', help='archive size')
+    show = sub.add_parser('show', help='print the newest capture of a URL')
+    show.add_argument('url')
+    rp = sub.add_parser('reparse', help='run an extractor over archived pages')
+    rp.add_argument('extractor', help=f"one of {sorted(EXTRACTORS)} or module:function")
+    rp.add_argument('--match', default='%', help='SQL LIKE pattern on the URL')
+    rp.add_argument('--all-captures', action='store_true', help='every distinct capture, not just the newest')
+    rp.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    rp.add_argument('--output', default=None, help='write results as JSON lines')
+    args = parser.parse_args()
+
+    archive = get_page_archive()
+    if args.command == 'stats':
+        print(archive.stats())
+    elif args.command == 'show':
+        page = archive.latest(args.url)
+        if page is None:
+            print(f"Not archived: {args.url}")
+            return
+        print(f"{page.status} {page.url} fetched {time.ctime(page.fetched_at)}")
+        for key, value in page.headers.items():
+            print(f"{key}: {value}")
+        print(f"\n{len(page.body)} bytes")
+    else:
+        out = open(args.output, 'w', encoding='utf-8') if args.output else None
+        try:
+            for url, fetched_at, result, error in reparse(args.extractor, args.match, not args.all_captures,
+                                                          args.workers, archive):
+                if error:
+                    logger.warning(f"❌ {url}: {error}")
+                elif out:
+                    out.write(json.dumps({'url': url, 'fetched_at': fetched_at, 'result': result},
+                                         ensure_ascii=False) + '\n')
+        finally:
+            if out:
+                out.close()
+
+
+if __name__ == '__main__':
+    main()
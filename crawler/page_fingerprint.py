@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Spec page content fingerprints
+Hashes only the parts of a product page the crawlers read (spec tables,
+data-spec elements, product photos), found with a few byte-level regexes
+instead of a full HTML parse, so ads, comment counts and prices changing
+around them do not count as a change. The fingerprint of the page version
+last written to "Phones" is kept per phone; when a re-fetched page hashes the
+same, parsing, image downloads and the database write can be skipped.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from rate_limiter import STATE_DIR
+
+DEFAULT_DB_PATH = os.path.join(STATE_DIR, 'page_fingerprints.sqlite')
+
+# Bump when the sections below change, so every stored fingerprint stops matching
+FINGERPRINT_VERSION = 1
+
+TABLE_RE = re.compile(rb'<table\b.*?</table>', re.IGNORECASE | re.DOTALL)
+DATA_SPEC_RE = re.compile(rb'<(\w+)[^>]*\bdata-spec="([^"]*)"[^>]*>(.*?)</\1>', re.IGNORECASE | re.DOTALL)
+PHOTO_RE = re.compile(rb'<div[^>]*class="[^"]*specs-photo-(?:main|gallery)[^"]*".*?</div>',
+                      re.IGNORECASE | re.DOTALL)
+# data-spec values that change without the phone changing
+VOLATILE_SPECS = (b'price',)
+VOLATILE_RE = re.compile(rb'<(\w+)[^>]*\bdata-spec="(?:' + b'|'.join(VOLATILE_SPECS) + rb')"[^>]*>.*?</\1>',
+                         re.IGNORECASE | re.DOTALL)
+WHITESPACE_RE = re.compile(rb'\s+')
+
+
+def spec_fingerprint(html) -> str:
+    """SHA-256 over the spec tables, data-spec values and photo blocks of a page"""
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+    html = VOLATILE_RE.sub(b'', html)
+    digest = hashlib.sha256(b'v%d' % FINGERPRINT_VERSION)
+    for table in TABLE_RE.findall(html):
+        digest.update(b'\x00table\x00' + WHITESPACE_RE.sub(b' ', table))
+    for _, key, value in DATA_SPEC_RE.findall(html):
+        digest.update(b'\x00spec\x00' + key + b'=' + WHITESPACE_RE.sub(b' ', value).strip())
+    for photos in PHOTO_RE.findall(html):
+        digest.update(b'\x00photo\x00' + WHITESPACE_RE.sub(b' ', photos))
+    return digest.hexdigest()
+
+
+class FingerprintRecord(NamedTuple):
+    url: str
+    fingerprint: str
+    checked_at: float       # last time the page was seen with this fingerprint
+    changed_at: float       # when this fingerprint was first written
+
+
+class FingerprintStore:
+    """(source, phone id) -> fingerprint of the page version last written to the database"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                source TEXT NOT NULL,
+                phone_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                checked_at REAL NOT NULL,
+                changed_at REAL NOT NULL,
+                PRIMARY KEY (source, phone_id)
+            )
+        ''')
+        self._conn.commit()
+        self.unchanged = 0
+        self.changed = 0
+
+    def get(self, source: str, phone_id) -> Optional[FingerprintRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, fingerprint, checked_at, changed_at FROM fingerprints WHERE source = ? AND phone_id = ?',
+                (source, str(phone_id))).fetchone()
+        return FingerprintRecord(*row) if row else None
+
+    def is_unchanged(self, source: str, phone_id, url: str, fingerprint: str) -> bool:
+        """Whether the page still hashes as the version last written for this phone;
+        an unchanged page is marked as checked"""
+        record = self.get(source, phone_id)
+        if record is None or record.url != url or record.fingerprint != fingerprint:
+            self.changed += 1
+            return False
+        with self._lock:
+            self._conn.execute('UPDATE fingerprints SET checked_at = ? WHERE source = ? AND phone_id = ?',
+                               (time.time(), source, str(phone_id)))
+            self._conn.commit()
+        self.unchanged += 1
+        return True
+
+    def record(self, source: str, phone_id, url: str, fingerprint: str):
+        """Remember the fingerprint of a page version that was just written to the database"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('''
+                INSERT INTO fingerprints (source, phone_id, url, fingerprint, checked_at, changed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(source, phone_id) DO UPDATE SET
+                    changed_at = CASE WHEN fingerprints.fingerprint = excluded.fingerprint
+                                      THEN fingerprints.changed_at ELSE excluded.changed_at END,
+                    url = excluded.url, fingerprint = excluded.fingerprint, checked_at = excluded.checked_at
+            ''', (source, str(phone_id), url, fingerprint, now, now))
+            self._conn.commit()
+
+    def forget(self, source: str, phone_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM fingerprints WHERE source = ? AND phone_id = ?', (source, str(phone_id)))
+            self._conn.commit()
+
+
+_shared_store: Optional[FingerprintStore] = None
+
+
+def get_fingerprint_store() -> FingerprintStore:
+    """Process-wide fingerprint store in the shared state directory"""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = FingerprintStore()
+    return _shared_store
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Perceptual-hash index for phone images
+Every stored image gets a 64-bit dHash and pHash (computed once, keyed by its
+content hash from the image store). Near-duplicates are found by Hamming
+distance through a banded lookup instead of comparing image pixels, which
+lets the colour crawlers reject placeholders and thumbnails and avoid giving
+two colours the same picture.
+"""
+
+import argparse
+import logging
+import math
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from PIL import Image
+
+from image_store import IMAGE_EXTENSIONS, PHONES_DIR, StoredImage, get_image_store, hash_file
+from rate_limiter import STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(STATE_DIR, 'perceptual_index.sqlite')
+
+HASH_BITS = 64
+DUPLICATE_DISTANCE = 6      # pHash bits that may differ between two copies of one picture
+DHASH_CONFIRM_DISTANCE = 12
+MIN_IMAGE_SIDE = 200        # smaller than this is a thumbnail
+PLACEHOLDER_STDDEV = 6.0    # grey levels; flat "no image" tiles sit well below this
+
+# 8 bands of 8 bits: two hashes within 7 bits agree exactly on at least one band
+BAND_BITS = 8
+BAND_COUNT = HASH_BITS // BAND_BITS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+PHASH_SIZE = 32
+PHASH_LOW = 8
+# DCT-II basis for the low-frequency rows/columns only
+_DCT = [[math.cos(math.pi * (2 * n + 1) * k / (2 * PHASH_SIZE)) for n in range(PHASH_SIZE)]
+        for k in range(PHASH_LOW)]
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _bits(flags: Iterable[bool]) -> int:
+    value = 0
+    for flag in flags:
+        value = (value << 1) | flag
+    return value
+
+
+class Fingerprint(NamedTuple):
+    dhash: int
+    phash: int
+    width: int
+    height: int
+    stddev: float
+
+    @property
+    def is_thumbnail(self) -> bool:
+        return min(self.width, self.height) < MIN_IMAGE_SIDE
+
+    @property
+    def is_blank(self) -> bool:
+        return self.stddev < PLACEHOLDER_STDDEV
+
+    def distance(self, other: 'Fingerprint') -> int:
+        return hamming(self.phash, other.phash)
+
+    def matches(self, other: 'Fingerprint', max_distance: int = DUPLICATE_DISTANCE) -> bool:
+        return (hamming(self.phash, other.phash) <= max_distance
+                and hamming(self.dhash, other.dhash) <= DHASH_CONFIRM_DISTANCE)
+
+
+def fingerprint_image(image: Image.Image) -> Fingerprint:
+    width, height = image.size
+    if image.format == 'JPEG':
+        # Let the decoder downscale; hashes only need a 32x32 view
+        image.draft('L', (PHASH_SIZE * 2, PHASH_SIZE * 2))
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # Transparent product shots: flatten onto white like the site shows them
+        rgba = image.convert('RGBA')
+        image = Image.new('RGBA', rgba.size, (255, 255, 255, 255))
+        image.alpha_composite(rgba)
+    gray = image.convert('L')
+
+    small = list(gray.resize((9, 8), Image.LANCZOS).getdata())
+    dhash = _bits(small[row * 9 + col] > small[row * 9 + col + 1] for row in range(8) for col in range(8))
+
+    pixels = list(gray.resize((PHASH_SIZE, PHASH_SIZE), Image.LANCZOS).getdata())
+    rows = [[sum(c * pixels[y * PHASH_SIZE + n] for n, c in enumerate(basis)) for basis in _DCT]
+            for y in range(PHASH_SIZE)]
+    coefficients = [sum(basis[y] * rows[y][u] for y in range(PHASH_SIZE)) for basis in _DCT for u in range(PHASH_LOW)]
+    median = sorted(coefficients[1:])[(len(coefficients) - 1) // 2]
+    phash = _bits(c > median for c in coefficients)
+
+    mean = sum(pixels) / len(pixels)
+    stddev = math.sqrt(sum((p - mean) ** 2 for p in pixels) / len(pixels))
+    return Fingerprint(dhash, phash, width, height, stddev)
+
+
+def fingerprint_file(path: str) -> Fingerprint:
+    with Image.open(path) as image:
+        return fingerprint_image(image)
+
+
+class PerceptualIndex:
+    """Fingerprints keyed by content hash, with banded Hamming-distance lookup"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                hash TEXT PRIMARY KEY,
+                dhash TEXT NOT NULL,
+                phash TEXT NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                stddev REAL NOT NULL,
+                placeholder INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self._conn.commit()
+        self._fingerprints: Dict[str, Fingerprint] = {}
+        self._bands: List[Dict[int, Set[str]]] = [{} for _ in range(BAND_COUNT)]
+        self._placeholders: Set[str] = set()
+        for digest, dhash, phash, width, height, stddev, placeholder in self._conn.execute(
+                'SELECT hash, dhash, phash, width, height, stddev, placeholder FROM fingerprints'):
+            self._insert(digest, Fingerprint(int(dhash, 16), int(phash, 16), width, height, stddev))
+            if placeholder:
+                self._placeholders.add(digest)
+
+    def _insert(self, digest: str, fp: Fingerprint):
+        self._fingerprints[digest] = fp
+        for band in range(BAND_COUNT):
+            key = (fp.phash >> (band * BAND_BITS)) & BAND_MASK
+            self._bands[band].setdefault(key, set()).add(digest)
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def get(self, digest: str) -> Optional[Fingerprint]:
+        with self._lock:
+            return self._fingerprints.get(digest)
+
+    def add(self, digest: str, fp: Fingerprint):
+        with self._lock:
+            self._insert(digest, fp)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO fingerprints (hash, dhash, phash, width, height, stddev, placeholder) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (digest, f'{fp.dhash:016x}', f'{fp.phash:016x}', fp.width, fp.height, fp.stddev,
+                 int(digest in self._placeholders)))
+            self._conn.commit()
+
+    def fingerprint(self, stored: StoredImage) -> Fingerprint:
+        """Fingerprint of a stored image, computed on first use"""
+        fp = self.get(stored.hash)
+        if fp is None:
+            fp = fingerprint_file(stored.path)
+            self.add(stored.hash, fp)
+        return fp
+
+    def near(self, fp: Fingerprint, max_distance: int = DUPLICATE_DISTANCE) -> List[Tuple[str, int]]:
+        """Indexed images perceptually equal to fp, closest first"""
+        if max_distance >= BAND_COUNT:
+            raise ValueError(f"Banded lookup only covers distances below {BAND_COUNT}")
+        with self._lock:
+            candidates = set()
+            for band in range(BAND_COUNT):
+                candidates |= self._bands[band].get((fp.phash >> (band * BAND_BITS)) & BAND_MASK, set())
+            found = [(digest, self._fingerprints[digest].distance(fp)) for digest in candidates
+                     if self._fingerprints[digest].matches(fp, max_distance)]
+        return sorted(found, key=lambda item: item[1])
+
+    def mark_placeholder(self, digest: str, placeholder: bool = True):
+        """Flag an indexed image as a placeholder; look-alikes are rejected too"""
+        with self._lock:
+            if placeholder:
+                self._placeholders.add(digest)
+            else:
+                self._placeholders.discard(digest)
+            self._conn.execute('UPDATE fingerprints SET placeholder = ? WHERE hash = ?', (int(placeholder), digest))
+            self._conn.commit()
+
+    def is_placeholder(self, fp: Fingerprint) -> bool:
+        return fp.is_blank or any(digest in self._placeholders for digest, _ in self.near(fp))
+
+    def rejection(self, stored: StoredImage) -> Optional[str]:
+        """Why a stored image should not be used as a phone picture, or None if it is fine"""
+        try:
+            fp = self.fingerprint(stored)
+        except Exception as e:
+            return f"unreadable ({e})"
+        return 'placeholder' if self.is_placeholder(fp) else None
+
+    def clusters(self, digests: Iterable[str]) -> List[List[str]]:
+        """Group indexed images into near-duplicate clusters (singletons omitted)"""
+        seen: Set[str] = set()
+        groups = []
+        for digest in digests:
+            if digest in seen or digest not in self._fingerprints:
+                continue
+            group = [match for match, _ in self.near(self._fingerprints[digest]) if match not in seen]
+            seen.update(group)
+            if len(group) > 1:
+                groups.append(group)
+        return groups
+
+
+_shared_index: Optional[PerceptualIndex] = None
+
+
+def get_perceptual_index() -> PerceptualIndex:
+    """Process-wide index backed by the shared state directory"""
+    global _shared_index
+    if _shared_index is None:
+        _shared_index = PerceptualIndex()
+    return _shared_index
+
+
+def choose_color_images(candidates: Dict[str, List[StoredImage]],
+                        index: Optional[PerceptualIndex] = None) -> Dict[str, StoredImage]:
+    """Pick one picture per colour from its candidate images.
+
+    Placeholders are skipped, and a picture offered for more than one colour
+    (e.g. the page's main image) identifies none of them, so it is not used
+    for any; such colours take their next candidate or are left out. Among the
+    remaining candidates the largest image wins, so thumbnails only survive
+    when nothing bigger was found."""
+    index = index or get_perceptual_index()
+    usable: Dict[str, List[Tuple[StoredImage, Fingerprint]]] = {}
+    for color, images in candidates.items():
+        for stored in images:
+            reason = index.rejection(stored)
+            if reason:
+                logger.info(f"Skipping {color} candidate {stored.hash[:12]}: {reason}")
+            else:
+                usable.setdefault(color, []).append((stored, index.fingerprint(stored)))
+
+    def claimed_elsewhere(color: str, fp: Fingerprint) -> bool:
+        return any(other_fp.matches(fp) for other, images in usable.items() if other != color
+                   for _, other_fp in images)
+
+    chosen = {}
+    for color, images in usable.items():
+        distinct = [(stored, fp) for stored, fp in images if not claimed_elsewhere(color, fp)]
+        if not distinct:
+            logger.info(f"No distinct image for {color}: every candidate also matches another colour")
+            continue
+        stored, _ = max(distinct, key=lambda item: item[1].width * item[1].height)
+        chosen[color] = stored
+    return chosen
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Perceptual-hash index of phone images')
+    parser.add_argument('directory', nargs='?', default=PHONES_DIR, help='image directory to scan')
+    parser.add_argument('--placeholder', action='append', default=[], metavar='FILE',
+                        help='mark this image (and look-alikes) as a placeholder')
+    args = parser.parse_args()
+
+    index = get_perceptual_index()
+    store = get_image_store()
+    names: Dict[str, List[str]] = {}
+    with os.scandir(args.directory) as entries:
+        for entry in entries:
+            if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            stored = store.get(entry.name)
+            digest = stored.hash if stored else hash_file(entry.path)
+            if index.get(digest) is None:
+                index.add(digest, fingerprint_file(entry.path))
+            names.setdefault(digest, []).append(entry.name)
+
+    for path in args.placeholder:
+        digest = hash_file(path)
+        if index.get(digest) is None:
+            index.add(digest, fingerprint_file(path))
+        index.mark_placeholder(digest)
+
+    flagged = 0
+    for digest, files in names.items():
+        fp = index.get(digest)
+        if index.is_placeholder(fp) or fp.is_thumbnail:
+            flagged += 1
+            print(f"⚠️ {'placeholder' if index.is_placeholder(fp) else 'thumbnail'}: {', '.join(files)}")
+    groups = index.clusters(names)
+    for group in groups:
+        print(f"🔁 {sum(len(names.get(d, [])) for d in group)} files look alike: "
+              f"{', '.join(f for d in group for f in names.get(d, []))}")
+    print(f"{len(names)} distinct images, {len(groups)} look-alike groups, {flagged} placeholders/thumbnails")
+
+
+if __name__ == '__main__':
+    main()
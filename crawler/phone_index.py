@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Local phone search index
+Persistent brand/model -> product URL index, filled from GSMArena brand
+listing pages, every search results page we parse and past successful
+resolutions. Lookups go through an in-memory inverted token index, so a
+phone that was resolved before needs no search request at all.
+"""
+
+import argparse
+import functools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import urljoin
+
+from html_parsing import by_class, links, node_text, parse_html
+from model_matcher import best_match
+from rate_limiter import STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(STATE_DIR, 'phone_index.sqlite')
+
+SOURCE_GSMARENA = 'gsmarena'
+SOURCE_ZOL = 'zol'
+GSMARENA_BASE = 'https://www.gsmarena.com'
+GSMARENA_MAKERS_URL = f'{GSMARENA_BASE}/makers.php3'
+
+TOKEN_RE = re.compile(r'[a-z0-9]+|\+')
+
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    """Lower-cased alphanumeric tokens; a bare '+' becomes 'plus'"""
+    return tuple('plus' if token == '+' else token for token in TOKEN_RE.findall(text.lower()))
+
+
+def query_key(brand: str, model: str) -> str:
+    """Order-insensitive key for a brand/model pair ('Samsung', 'Galaxy S24+' -> 'galaxy plus s24 samsung')"""
+    return ' '.join(sorted(set(tokenize(brand)) | set(tokenize(model))))
+
+
+class IndexEntry(NamedTuple):
+    source: str
+    url: str
+    brand: str
+    name: str
+    tokens: frozenset
+
+
+def parse_gsmarena_listing(html, base_url: str = GSMARENA_BASE) -> List[Tuple[str, str]]:
+    """(name, absolute URL) for every phone on a GSMArena brand listing or search results page"""
+    doc = parse_html(html)
+    return [(node_text(a, ' '), urljoin(base_url + '/', a.get('href')))
+            for a in doc.xpath(by_class('makers', 'div') + '//li/a[@href]')]
+
+
+def search_candidates(html, base_url: str = GSMARENA_BASE) -> List[Tuple[str, str]]:
+    """(name, absolute URL) candidates on a search results page; any product
+    link when the page has no maker listing block"""
+    found = parse_gsmarena_listing(html, base_url)
+    if found:
+        return found
+    return [(text, urljoin(base_url + '/', href)) for href, text in links(parse_html(html), r'\.php$') if text]
+
+
+def gsmarena_listing_pages(html, base_url: str = GSMARENA_BASE) -> List[str]:
+    """Absolute URLs of the other pages of a paginated brand listing"""
+    doc = parse_html(html)
+    return [urljoin(base_url + '/', href) for href in doc.xpath(by_class('nav-pages', 'div') + '//a/@href')]
+
+
+class PhoneIndex:
+    """brand/model -> product URL lookups backed by SQLite"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS phones (
+                source TEXT NOT NULL,
+                url TEXT NOT NULL,
+                brand TEXT NOT NULL,
+                name TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (source, url)
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS resolutions (
+                source TEXT NOT NULL,
+                query_key TEXT NOT NULL,
+                brand TEXT NOT NULL,
+                model TEXT NOT NULL,
+                url TEXT NOT NULL,
+                resolved_at REAL NOT NULL,
+                PRIMARY KEY (source, query_key)
+            )
+        ''')
+        self._conn.commit()
+
+        self._entries: Dict[Tuple[str, str], IndexEntry] = {}
+        self._postings: Dict[Tuple[str, str], Set[Tuple[str, str]]] = {}
+        self._resolved: Dict[Tuple[str, str], str] = {}
+        for source, url, brand, name in self._conn.execute('SELECT source, url, brand, name FROM phones'):
+            self._add_entry(source, url, brand, name)
+        for source, key, url in self._conn.execute('SELECT source, query_key, url FROM resolutions'):
+            self._resolved[(source, key)] = url
+        self.hits = 0
+        self.misses = 0
+
+    def _add_entry(self, source: str, url: str, brand: str, name: str):
+        entry_id = (source, url)
+        old = self._entries.get(entry_id)
+        if old is not None:
+            for token in old.tokens:
+                self._postings.get((source, token), set()).discard(entry_id)
+        tokens = frozenset(tokenize(brand)) | frozenset(tokenize(name))
+        self._entries[entry_id] = IndexEntry(source, url, brand, name, tokens)
+        for token in tokens:
+            self._postings.setdefault((source, token), set()).add(entry_id)
+
+    def add_listing(self, entries: Iterable[Tuple[str, str]], brand: str = '',
+                    source: str = SOURCE_GSMARENA, origin: str = 'listing') -> int:
+        """Index (name, url) pairs from a listing or search results page; returns how many were new"""
+        now = time.time()
+        added = 0
+        with self._lock:
+            for name, url in entries:
+                if not name or not url:
+                    continue
+                added += (source, url) not in self._entries
+                self._add_entry(source, url, brand, name)
+                self._conn.execute('''
+                    INSERT OR REPLACE INTO phones (source, url, brand, name, origin, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (source, url, brand, name, origin, now))
+            self._conn.commit()
+        return added
+
+    def index_search_page(self, html, source: str = SOURCE_GSMARENA) -> int:
+        """Keep every phone listed on a fetched GSMArena search results page"""
+        return self.add_listing(parse_gsmarena_listing(html), source=source, origin='search')
+
+    def record(self, brand: str, model: str, url: str, source: str = SOURCE_GSMARENA):
+        """Remember a successful brand/model resolution"""
+        key = query_key(brand, model)
+        with self._lock:
+            self._resolved[(source, key)] = url
+            self._conn.execute('''
+                INSERT OR REPLACE INTO resolutions (source, query_key, brand, model, url, resolved_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (source, key, brand, model, url, time.time()))
+            self._conn.commit()
+
+    def forget(self, brand: str, model: str, source: str = SOURCE_GSMARENA):
+        """Drop a stored resolution, e.g. after it turned out to be a wrong match"""
+        key = query_key(brand, model)
+        with self._lock:
+            self._resolved.pop((source, key), None)
+            self._conn.execute('DELETE FROM resolutions WHERE source = ? AND query_key = ?', (source, key))
+            self._conn.commit()
+
+    def candidates(self, brand: str, model: str, source: str = SOURCE_GSMARENA) -> List[IndexEntry]:
+        """Indexed phones sharing at least one model token with the query"""
+        model_tokens = set(tokenize(model)) - set(tokenize(brand)) or set(tokenize(model))
+        with self._lock:
+            ids = set()
+            for token in model_tokens:
+                ids |= self._postings.get((source, token), set())
+            return [self._entries[entry_id] for entry_id in ids]
+
+    def lookup(self, brand: str, model: str, source: str = SOURCE_GSMARENA) -> Optional[str]:
+        """Product URL for a phone if it was resolved before or is listed under its exact model name"""
+        key = query_key(brand, model)
+        with self._lock:
+            url = self._resolved.get((source, key))
+            if url is None:
+                wanted = frozenset(key.split())
+                postings = [self._postings.get((source, token), set()) for token in wanted]
+                ids = set.intersection(*postings) if postings else set()
+                urls = {entry_id[1] for entry_id in ids if self._entries[entry_id].tokens == wanted}
+                url = urls.pop() if len(urls) == 1 else None
+        if url is None:
+            # Spelling variants of the same model ("Note 20" / "Note20") still resolve locally
+            match = best_match(brand, model, [(f'{e.brand} {e.name}', e.url) for e in self.candidates(brand, model, source)],
+                               min_confidence=1.0)
+            url = match.url if match else None
+        if url is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return url
+
+    def refresh_gsmarena_brand(self, session, brand: str) -> int:
+        """Index every phone on a brand's GSMArena listing pages; returns how many were new"""
+        response = session.get(GSMARENA_MAKERS_URL, timeout=15)
+        response.raise_for_status()
+        doc = parse_html(response.content)
+        brand_url = None
+        for a in doc.xpath('//table//a[@href]'):
+            label = ''.join(a.xpath('text()')).strip()
+            if label.lower() == brand.lower():
+                brand_url = urljoin(GSMARENA_BASE + '/', a.get('href'))
+                break
+        if brand_url is None:
+            logger.warning(f"No GSMArena listing found for brand {brand}")
+            return 0
+
+        response = session.get(brand_url, timeout=15)
+        response.raise_for_status()
+        pages = [response.content]
+        for page_url in dict.fromkeys(gsmarena_listing_pages(response.content)):
+            page = session.get(page_url, timeout=15)
+            page.raise_for_status()
+            pages.append(page.content)
+
+        added = sum(self.add_listing(parse_gsmarena_listing(html), brand=brand) for html in pages)
+        logger.info(f"Indexed {brand}: {added} new phones from {len(pages)} listing pages")
+        return added
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'phones': len(self._entries), 'resolutions': len(self._resolved),
+                    'hits': self.hits, 'misses': self.misses}
+
+
+_shared_index: Optional[PhoneIndex] = None
+
+
+def get_phone_index() -> PhoneIndex:
+    """Process-wide index backed by the shared state directory"""
+    global _shared_index
+    if _shared_index is None:
+        _shared_index = PhoneIndex()
+    return _shared_index
+
+
+def indexed_search(source: str = SOURCE_GSMARENA, brand: Optional[str] = None):
+    """Decorator for search(self, brand, model) methods (search(self, model) when
+    brand is fixed): answer from the index when possible and remember what the
+    search resolved"""
+    def decorate(search):
+        def resolve(self, phone_brand, model, call):
+            index = get_phone_index()
+            url = index.lookup(phone_brand, model, source)
+            if url:
+                logger.info(f"Index hit for {phone_brand} {model}: {url}")
+                return url
+            url = call()
+            if url:
+                index.record(phone_brand, model, url, source)
+            return url
+
+        if brand is not None:
+            @functools.wraps(search)
+            def wrapper(self, model, *args, **kwargs):
+                return resolve(self, brand, model, lambda: search(self, model, *args, **kwargs))
+        else:
+            @functools.wraps(search)
+            def wrapper(self, phone_brand, model, *args, **kwargs):
+                return resolve(self, phone_brand, model, lambda: search(self, phone_brand, model, *args, **kwargs))
+        return wrapper
+    return decorate
+
+
+def main():
+    from response_cache import CachedSession
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Local phone search index')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='index GSMArena brand listing pages')
+    build.add_argument('brands', nargs='+')
+    lookup = sub.add_parser('lookup', help='resolve a phone from the index')
+    lookup.add_argument('brand')
+    lookup.add_argument('model')
+    sub.add_parser('stats', help='show index size')
+    args = parser.parse_args()
+
+    index = get_phone_index()
+    if args.command == 'build':
+        session = CachedSession()
+        for brand in args.brands:
+            index.refresh_gsmarena_brand(session, brand)
+    elif args.command == 'lookup':
+        print(index.lookup(args.brand, args.model) or 'not found')
+    print(index.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Staged crawl pipeline
+Each stage is a small pool of async workers; stages are connected by bounded
+queues, so while one phone's page is being parsed the next one is already
+downloading, and a slow stage applies back-pressure instead of letting work
+pile up in memory. Every stage keeps its own counters, and the end-of-run
+report shows throughput and how busy each stage was, i.e. where the
+bottleneck is.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 16
+
+_DONE = object()
+
+
+class Stage:
+    """One pipeline step: func(item) -> next item, or None to drop the item.
+    Blocking (non-async) functions run in a worker thread."""
+
+    def __init__(self, name: str, func: Callable[[Any], Union[Any, Awaitable[Any]]], workers: int = 1,
+                 queue_size: Optional[int] = None):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue_size = queue_size
+        self.blocking = not asyncio.iscoroutinefunction(func)
+        self.stats = StageStats(name, workers)
+
+
+class StageStats:
+    """Per-stage counters; times are seconds summed over the stage's workers"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.busy = 0.0         # running func
+        self.starved = 0.0      # waiting for input
+        self.blocked = 0.0      # waiting for room in the next queue
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def items(self) -> int:
+        return self.processed + self.dropped + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Items handled per second of wall time"""
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def utilisation(self) -> float:
+        """Share of the stage's worker time spent doing work; the busiest stage is the bottleneck"""
+        return self.busy / (self.elapsed * self.workers) if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        per_item = self.busy / self.items if self.items else 0.0
+        return (f"{self.name:>10}: {self.processed} ok, {self.dropped} dropped, {self.failed} failed | "
+                f"{self.throughput:.2f} items/s, {per_item:.2f}s per item, "
+                f"{self.utilisation:.0%} busy x{self.workers}, waited {self.starved:.1f}s in / {self.blocked:.1f}s out")
+
+
+class Pipeline:
+    """Runs items through stages connected by bounded queues"""
+
+    def __init__(self, stages: List[Stage], queue_size: int = DEFAULT_QUEUE_SIZE,
+                 describe: Callable[[Any], str] = repr):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.describe = describe
+        self.elapsed = 0.0
+
+    async def _worker(self, stage: Stage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue], results: List):
+        stats = stage.stats
+        while True:
+            waited = time.monotonic()
+            item = await inbox.get()
+            started = time.monotonic()
+            stats.starved += started - waited
+            if item is _DONE:
+                return
+            if stats.started is None:
+                stats.started = started
+            try:
+                if stage.blocking:
+                    result = await asyncio.to_thread(stage.func, item)
+                else:
+                    result = await stage.func(item)
+            except Exception as e:
+                stats.failed += 1
+                logger.error(f"[{stage.name}] failed for {self.describe(item)}: {e}")
+                continue
+            finally:
+                stats.busy += time.monotonic() - started
+                stats.finished = time.monotonic()
+
+            if result is None:
+                stats.dropped += 1
+                continue
+            stats.processed += 1
+            if outbox is None:
+                results.append(result)
+            else:
+                put_at = time.monotonic()
+                await outbox.put(result)
+                stats.blocked += time.monotonic() - put_at
+
+    async def run(self, items: Iterable[Any]) -> List[Any]:
+        """Feed items through every stage; returns what the last stage produced"""
+        queues = [asyncio.Queue(maxsize=stage.queue_size or self.queue_size) for stage in self.stages]
+        results: List[Any] = []
+
+        async def feed():
+            for item in items:
+                await queues[0].put(item)
+            for _ in range(self.stages[0].workers):
+                await queues[0].put(_DONE)
+
+        async def run_stage(index: int):
+            stage = self.stages[index]
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            await asyncio.gather(*(self._worker(stage, queues[index], outbox, results)
+                                   for _ in range(stage.workers)))
+            # Upstream is drained: tell every worker of the next stage to stop
+            if outbox is not None:
+                for _ in range(self.stages[index + 1].workers):
+                    await outbox.put(_DONE)
+
+        started = time.monotonic()
+        await asyncio.gather(feed(), *(run_stage(i) for i in range(len(self.stages))))
+        self.elapsed = time.monotonic() - started
+        return results
+
+    def report(self) -> str:
+        lines = [stage.stats.summary() for stage in self.stages]
+        busiest = max(self.stages, key=lambda stage: stage.stats.utilisation)
+        lines.append(f"Bottleneck: {busiest.name} ({busiest.stats.utilisation:.0%} busy)")
+        return '\n'.join(lines)
+
+    def log_report(self):
+        for line in self.report().splitlines():
+            logger.info(f"📊 {line}")
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Per-host token-bucket rate limiter
+Buckets live in a small SQLite file, so threads, asyncio tasks and separate
+crawler processes all draw from the same per-host budget
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_DIR = os.path.join(SCRIPT_DIR, '.crawl_state')
+DEFAULT_DB_PATH = os.path.join(STATE_DIR, 'rate_limits.sqlite')
+
+# host -> (tokens per second, bucket capacity)
+RATE_LIMITS = {
+    'www.gsmarena.com': (1 / 3.0, 2),
+    'fdn2.gsmarena.com': (2.0, 4),
+    'detail.zol.com.cn': (1 / 3.0, 2),
+    'search.zol.com.cn': (1 / 3.0, 1),
+}
+DEFAULT_RATE_LIMIT = (1.0, 2)
+
+
+def host_of(url_or_host: str) -> str:
+    """Return the lower-cased host for a URL, or the value itself if it is already a host"""
+    if '://' in url_or_host:
+        return urlparse(url_or_host).netloc.lower()
+    return url_or_host.lower()
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by host, persisted in SQLite for cross-process sharing"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH,
+                 limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 fallback_limit: Tuple[float, float] = DEFAULT_RATE_LIMIT):
+        self.db_path = db_path
+        self.limits = dict(RATE_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self.fallback_limit = fallback_limit
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS buckets (
+                host TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                rate REAL NOT NULL,
+                capacity REAL NOT NULL
+            )
+        ''')
+
+    def default_limit(self, host: str) -> Tuple[float, float]:
+        """Configured (rate, capacity) for a host"""
+        return self.limits.get(host, self.fallback_limit)
+
+    def try_acquire(self, url_or_host: str, tokens: float = 1.0) -> float:
+        """Take tokens if available; returns 0 on success or the seconds to wait before retrying"""
+        host = host_of(url_or_host)
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = cur.execute('SELECT tokens, updated_at, rate, capacity FROM buckets WHERE host = ?',
+                                  (host,)).fetchone()
+                if row is None:
+                    rate, capacity = self.default_limit(host)
+                    available = capacity
+                else:
+                    available, updated_at, rate, capacity = row
+                    available = min(capacity, available + max(0.0, now - updated_at) * rate)
+
+                if available >= tokens:
+                    available -= tokens
+                    wait = 0.0
+                else:
+                    wait = (tokens - available) / rate
+
+                cur.execute('''
+                    INSERT INTO buckets (host, tokens, updated_at, rate, capacity) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(host) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+                ''', (host, available, now, rate, capacity))
+                cur.execute('COMMIT')
+                return wait
+            except Exception:
+                cur.execute('ROLLBACK')
+                raise
+
+    def acquire(self, url_or_host: str, tokens: float = 1.0) -> float:
+        """Block the calling thread until tokens are granted; returns total seconds waited"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(url_or_host, tokens)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, url_or_host: str, tokens: float = 1.0) -> float:
+        """Await until tokens are granted without blocking the event loop"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(url_or_host, tokens)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def set_rate(self, url_or_host: str, rate: float, capacity: Optional[float] = None):
+        """Change a host's refill rate for every process sharing the bucket file"""
+        host = host_of(url_or_host)
+        default_rate, default_capacity = self.default_limit(host)
+        capacity = capacity if capacity is not None else default_capacity
+        with self._lock:
+            self._conn.execute('''
+                INSERT INTO buckets (host, tokens, updated_at, rate, capacity) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(host) DO UPDATE SET rate = excluded.rate, capacity = excluded.capacity
+            ''', (host, min(1.0, capacity), time.time(), rate, capacity))
+
+    def hold(self, url_or_host: str, seconds: float):
+        """Drain a host's bucket so no process gets a token for the next `seconds`"""
+        host = host_of(url_or_host)
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute('BEGIN IMMEDIATE')
+            try:
+                row = cur.execute('SELECT rate, capacity FROM buckets WHERE host = ?', (host,)).fetchone()
+                rate, capacity = row if row else self.default_limit(host)
+                cur.execute('''
+                    INSERT INTO buckets (host, tokens, updated_at, rate, capacity) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(host) DO UPDATE SET tokens = MIN(buckets.tokens, excluded.tokens),
+                                                    updated_at = excluded.updated_at
+                ''', (host, -seconds * rate, time.time(), rate, capacity))
+                cur.execute('COMMIT')
+            except Exception:
+                cur.execute('ROLLBACK')
+                raise
+
+    def get_rate(self, url_or_host: str) -> float:
+        """Current refill rate (requests per second) for a host"""
+        host = host_of(url_or_host)
+        with self._lock:
+            row = self._conn.execute('SELECT rate FROM buckets WHERE host = ?', (host,)).fetchone()
+        return row[0] if row else self.default_limit(host)[0]
+
+
+_shared_limiter: Optional[TokenBucketLimiter] = None
+
+
+def get_limiter() -> TokenBucketLimiter:
+    """Process-wide limiter backed by the shared bucket file"""
+    global _shared_limiter
+    if _shared_limiter is None:
+        _shared_limiter = TokenBucketLimiter()
+    return _shared_limiter
+
+
+class LimitedSession(requests.Session):
+    """requests.Session that takes a token for the target host before every request
+    and reports throttling to the adaptive rate controller"""
+
+    def __init__(self, limiter: Optional[TokenBucketLimiter] = None, rate_controller=None):
+        super().__init__()
+        self.limiter = limiter or get_limiter()
+        if rate_controller is None:
+            from adaptive_backoff import get_rate_controller
+            rate_controller = get_rate_controller()
+        self.rate_controller = rate_controller
+
+    def request(self, method, url, *args, **kwargs):
+        waited = self.limiter.acquire(url)
+        if waited:
+            logger.debug(f"Rate limiter held {host_of(url)} for {waited:.1f}s")
+        response = super().request(method, url, *args, **kwargs)
+        if response.status_code in (429, 503):
+            self.rate_controller.on_throttled(url, response.headers.get('Retry-After'))
+        elif response.status_code < 400:
+            self.rate_controller.on_success(url)
+        return response
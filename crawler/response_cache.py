@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+On-disk HTTP response cache
+zlib-compressed page bodies in SQLite, keyed by normalized URL + params, with
+per-URL TTLs and ETag / Last-Modified revalidation. Re-running a fixer for one
+field then costs no network for pages we already hold.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from page_archive import PageArchive, get_page_archive
+from rate_limiter import STATE_DIR, LimitedSession
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(STATE_DIR, 'http_cache.sqlite')
+
+DAY = 24 * 3600
+# (substring of URL, TTL seconds); first match wins
+TTL_RULES = [
+    ('results.php3', 1 * DAY),
+    ('search.zol.com.cn', 1 * DAY),
+    ('gsmarena.com/', 30 * DAY),
+    ('detail.zol.com.cn', 14 * DAY),
+]
+DEFAULT_TTL = 7 * DAY
+
+
+def normalize_url(url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    """Canonical cache key: lower-case scheme/host, no fragment, sorted query incl. params"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((k, str(v)) for k, v in params.items() if v is not None)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/',
+                       urlencode(sorted(query)), ''))
+
+
+def ttl_for(url: str) -> int:
+    for marker, ttl in TTL_RULES:
+        if marker in url:
+            return ttl
+    return DEFAULT_TTL
+
+
+def is_cacheable(status: int, headers: Mapping[str, str]) -> bool:
+    """Only successful HTML/text responses are cached; images go to the image store"""
+    content_type = next((v for k, v in headers.items() if k.lower() == 'content-type'), '').lower()
+    return status == 200 and (content_type.startswith('text/') or 'html' in content_type)
+
+
+class CacheEntry:
+    """A cached response as stored on disk"""
+
+    def __init__(self, key: str, url: str, status: int, headers: Dict[str, str], body: bytes,
+                 fetched_at: float, expires_at: float):
+        self.key = key
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional GET headers for revalidating this entry"""
+        headers = {}
+        stored = {k.lower(): v for k, v in self.headers.items()}
+        etag = stored.get('etag')
+        last_modified = stored.get('last-modified')
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+
+class ResponseCache:
+    """Persistent, compressed HTTP response cache shared by every crawler"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def get(self, url: str, params: Optional[Mapping[str, Any]] = None) -> Optional[CacheEntry]:
+        key = normalize_url(url, params)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url, status, headers, body, fetched_at, expires_at FROM responses WHERE key = ?',
+                (key,)).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(key, row[0], row[1], json.loads(row[2]), zlib.decompress(row[3]), row[4], row[5])
+
+    def store(self, url: str, params: Optional[Mapping[str, Any]], status: int,
+              headers: Mapping[str, str], body: bytes, ttl: Optional[int] = None) -> Optional[CacheEntry]:
+        if not is_cacheable(status, headers):
+            return None
+        key = normalize_url(url, params)
+        now = time.time()
+        kept = {k: v for k, v in headers.items()
+                if k.lower() in ('content-type', 'etag', 'last-modified', 'date')}
+        expires_at = now + (ttl if ttl is not None else ttl_for(key))
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO responses (key, url, status, headers, body, fetched_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (key, url, status, json.dumps(kept), zlib.compress(body, 6), now, expires_at))
+            self._conn.commit()
+        return CacheEntry(key, url, status, kept, body, now, expires_at)
+
+    def refresh(self, entry: CacheEntry, ttl: Optional[int] = None):
+        """Extend an entry's lifetime after a 304 Not Modified"""
+        now = time.time()
+        entry.expires_at = now + (ttl if ttl is not None else ttl_for(entry.key))
+        with self._lock:
+            self._conn.execute('UPDATE responses SET expires_at = ? WHERE key = ?', (entry.expires_at, entry.key))
+            self._conn.commit()
+
+    def purge_expired(self, older_than: float = 0) -> int:
+        """Drop entries that expired more than `older_than` seconds ago"""
+        with self._lock:
+            cur = self._conn.execute('DELETE FROM responses WHERE expires_at < ?', (time.time() - older_than,))
+            self._conn.commit()
+            return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses}
+
+
+_shared_cache: Optional[ResponseCache] = None
+
+
+def get_cache() -> ResponseCache:
+    """Process-wide cache backed by the shared cache file"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ResponseCache()
+    return _shared_cache
+
+
+def _response_from_entry(entry: CacheEntry) -> requests.Response:
+    response = requests.Response()
+    response.status_code = entry.status
+    response.headers = CaseInsensitiveDict(entry.headers)
+    response._content = entry.body
+    response.url = entry.url
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+
+class CachedSession(LimitedSession):
+    """Rate-limited session that serves GETs from the response cache when possible;
+    pages fetched from the network are also kept in the page archive"""
+
+    def __init__(self, cache: Optional[ResponseCache] = None, archive: Optional[PageArchive] = None,
+                 use_archive: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache or get_cache()
+        self.archive = (archive or get_page_archive()) if use_archive else None
+
+    def request(self, method, url, *args, params=None, headers=None, **kwargs):
+        # Streamed downloads go straight to disk, not into the cache
+        if method.upper() != 'GET' or args or kwargs.get('stream'):
+            return super().request(method, url, *args, params=params, headers=headers, **kwargs)
+
+        entry = self.cache.get(url, params)
+        if entry is not None and entry.fresh:
+            self.cache.hits += 1
+            return _response_from_entry(entry)
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers.update(entry.validators())
+        response = super().request(method, url, params=params, headers=request_headers, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.revalidated += 1
+            self.cache.refresh(entry)
+            return _response_from_entry(entry)
+        self.cache.misses += 1
+        if self.archive is not None:
+            self.archive.record(normalize_url(url, params), response.status_code, response.headers,
+                                response.content)
+        self.cache.store(url, params, response.status_code, response.headers, response.content)
+        return response
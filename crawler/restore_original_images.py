@@ -4,17 +4,18 @@ Emergency restore original image links
 Revert the recent incorrect placeholder replacement
 """
 
-import psycopg2
+from batch_writer import PhoneBatchWriter
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DB_CONFIG = {'host': 'localhost', 'database': 'mobilephone_db', 'user': 'postgres'}
+
 def restore_original_images():
     """Restore original image links"""
     try:
-        conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
-        cur = conn.cursor()
+        writer = PhoneBatchWriter(DB_CONFIG, key_columns=('Brand', 'Model'))
         
         # Restore local image paths for Apple iPhone
         apple_phones = [
@@ -41,15 +42,8 @@ def restore_original_images():
             ('iPhone SE', 'Apple_iPhone_SE_front.jpg'),
         ]
         
-        restored_count = 0
-        
         for model, filename in apple_phones:
-            local_url = f"http://localhost:5198/images/phones/{filename}"
-            cur.execute('UPDATE "Phones" SET "ImageUrl" = %s WHERE "Brand" = %s AND "Model" = %s', 
-                       (local_url, 'Apple', model))
-            if cur.rowcount > 0:
-                logger.info(f"✅ Restored Apple {model}")
-                restored_count += 1
+            writer.update(('Apple', model), {'ImageUrl': f"http://localhost:5198/images/phones/{filename}"})
         
         # Restore local image paths for ASUS ROG Phone
         asus_phones = [
@@ -66,12 +60,7 @@ def restore_original_images():
         ]
         
         for model, filename in asus_phones:
-            local_url = f"http://localhost:5198/images/phones/{filename}"
-            cur.execute('UPDATE "Phones" SET "ImageUrl" = %s WHERE "Brand" = %s AND "Model" = %s', 
-                       (local_url, 'ASUS', model))
-            if cur.rowcount > 0:
-                logger.info(f"✅ Restored ASUS {model}")
-                restored_count += 1
+            writer.update(('ASUS', model), {'ImageUrl': f"http://localhost:5198/images/phones/{filename}"})
         
         # Restore local image paths for Google Pixel
         google_phones = [
@@ -91,12 +80,7 @@ def restore_original_images():
         ]
         
         for model, filename in google_phones:
-            local_url = f"http://localhost:5198/images/phones/{filename}"
-            cur.execute('UPDATE "Phones" SET "ImageUrl" = %s WHERE "Brand" = %s AND "Model" = %s', 
-                       (local_url, 'Google', model))
-            if cur.rowcount > 0:
-                logger.info(f"✅ Restored Google {model}")
-                restored_count += 1
+            writer.update(('Google', model), {'ImageUrl': f"http://localhost:5198/images/phones/{filename}"})
         
         # Restore local image paths for Huawei
         huawei_phones = [
@@ -119,12 +103,7 @@ def restore_original_images():
         ]
         
         for model, filename in huawei_phones:
-            local_url = f"http://localhost:5198/images/phones/{filename}"
-            cur.execute('UPDATE "Phones" SET "ImageUrl" = %s WHERE "Brand" = %s AND "Model" = %s', 
-                       (local_url, 'Huawei', model))
-            if cur.rowcount > 0:
-                logger.info(f"✅ Restored Huawei {model}")
-                restored_count += 1
+            writer.update(('Huawei', model), {'ImageUrl': f"http://localhost:5198/images/phones/{filename}"})
         
         # Restore local image paths for Honor
         honor_phones = [
@@ -144,18 +123,14 @@ def restore_original_images():
         ]
         
         for model, filename in honor_phones:
-            local_url = f"http://localhost:5198/images/phones/{filename}"
-            cur.execute('UPDATE "Phones" SET "ImageUrl" = %s WHERE "Brand" = %s AND "Model" = %s', 
-                       (local_url, 'Honor', model))
-            if cur.rowcount > 0:
-                logger.info(f"✅ Restored Honor {model}")
-                restored_count += 1
+            writer.update(('Honor', model), {'ImageUrl': f"http://localhost:5198/images/phones/{filename}"})
         
-        conn.commit()
-        cur.close()
-        conn.close()
+        # One batched UPDATE instead of a statement per phone
+        restored = writer.flush()
+        for brand, model in restored:
+            logger.info(f"✅ Restored {brand} {model}")
         
-        logger.info(f"🎉 Successfully restored {restored_count} original image paths!")
+        logger.info(f"🎉 Successfully restored {len(restored)} original image paths!")
         
     except Exception as e:
         logger.error(f"Error restoring images: {e}")
@@ -1,13 +1,16 @@
 #!/usr/bin/env python3
 """
 Run colors backfill in small batches with delays until no more phones need updates.
+Progress is kept in the crawl job ledger, so an interrupted run resumes where it
+stopped and phones that keep failing no longer keep the loop going forever.
 """
 
+import os
 import sys
 import time
 
 # Ensure we can import backfill_colors from this directory
-sys.path.append('/Users/shenmeidun/UoW_IT/COMPX576/MobilePhone/crawler')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from backfill_colors import ColorBackfiller  # type: ignore
 
@@ -20,25 +23,17 @@ def main():
     batch_num = 0
 
     while True:
-        targets = bf.get_targets(limit=batch_size)
+        targets = bf.jobs.runnable(bf.get_targets(), 'colors', stages=('resolve', 'colors'))
         if not targets:
-            print(f"No more phones missing colors. Total updated: {total_updated}")
+            print(f"No more phones to backfill. Total updated: {total_updated}")
             break
 
         batch_num += 1
-        print(f"\n=== Batch {batch_num}: processing up to {len(targets)} phones ===")
-        before = total_updated
-        bf.backfill(limit=batch_size, dry_run=False)
-        # We cannot directly know how many updated in this call; just wait and proceed
+        print(f"\n=== Batch {batch_num}: processing up to {min(len(targets), batch_size)} of {len(targets)} phones ===")
+        total_updated += bf.backfill(limit=batch_size, dry_run=False)
         # Sleep between batches to reduce rate-limiting
         time.sleep(sleep_between_batches)
 
 
 if __name__ == '__main__':
     main()
-
-
-
-
-
-
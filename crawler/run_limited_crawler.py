@@ -3,7 +3,7 @@
 Run GSMArena crawler for a limited number of phones first (testing)
 """
 
-import psycopg2
+from db_pool import pooled_connect
 from gsmarena_flagship_crawler import GSMArenaFlagshipCrawler
 
 def run_limited_crawler(limit=10):
@@ -19,7 +19,7 @@ def run_limited_crawler(limit=10):
     
     # Get first N phones that need details
     try:
-        with psycopg2.connect(**db_config) as conn:
+        with pooled_connect(**db_config) as conn:
             with conn.cursor() as cur:
                 cur.execute(f'''
                     SELECT "Id", "Brand", "Model", "ReleaseYear"
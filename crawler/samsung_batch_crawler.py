@@ -5,14 +5,17 @@ Specifically targets Samsung Galaxy phones that failed in the previous crawl
 """
 
 import requests
-import time
 import json
-import psycopg2
+from db_pool import pooled_connect
 import os
-from bs4 import BeautifulSoup
 import logging
-from urllib.parse import urljoin, quote
+from urllib.parse import quote
 import re
+from model_matcher import best_match
+from phone_index import indexed_search, search_candidates
+from response_cache import CachedSession
+from spec_fields import SAMSUNG_RULES
+from gsmarena_parser import get_spec_store
 
 # Configure logging
 logging.basicConfig(
@@ -28,7 +31,7 @@ logger = logging.getLogger(__name__)
 class SamsungBatchCrawler:
     def __init__(self, db_config):
         self.db_config = db_config
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -40,6 +43,7 @@ class SamsungBatchCrawler:
         })
         self.base_url = "https://www.gsmarena.com"
         self.search_url = "https://www.gsmarena.com/results.php3"
+        self.spec_records = get_spec_store()
         
         # Samsung phones to crawl (from failed list)
         self.samsung_phones = [
@@ -66,6 +70,7 @@ class SamsungBatchCrawler:
         
         return model.strip()
     
+    @indexed_search()
     def search_phone_on_gsmarena(self, brand, model):
         """Search for phone on GSMArena and return the product page URL"""
         try:
@@ -82,31 +87,10 @@ class SamsungBatchCrawler:
             response = self.session.get(self.search_url, params=params, timeout=15)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for phone links
-            phone_links = soup.find_all('a', href=True)
-            
-            for link in phone_links:
-                href = link.get('href', '')
-                if href.startswith('/') and '_' in href and '-' in href:
-                    # Extract phone name from URL and text
-                    link_text = link.get_text(strip=True).lower()
-                    url_name = href.replace('/', '').replace('.php', '').replace('-', ' ').replace('_', ' ')
-                    
-                    # Normalize search terms
-                    search_normalized = search_query.lower().replace(' ', '').replace('-', '').replace('_', '')
-                    link_normalized = link_text.replace(' ', '').replace('-', '').replace('_', '')
-                    url_normalized = url_name.replace(' ', '').replace('-', '').replace('_', '')
-                    
-                    # Check if this is a good match
-                    if (search_normalized in link_normalized or 
-                        search_normalized in url_normalized or
-                        link_normalized in search_normalized):
-                        
-                        full_url = urljoin(self.base_url, href)
-                        logger.info(f"✅ Found potential match: {link_text} -> {full_url}")
-                        return full_url
+            match = best_match(brand, search_model, search_candidates(response.content, self.base_url))
+            if match:
+                logger.info(f"✅ Found match: {match.name} -> {match.url} (confidence {match.confidence:.2f})")
+                return match.url
             
             logger.warning(f"❌ No product page found for: {search_query}")
             return None
@@ -123,56 +107,10 @@ class SamsungBatchCrawler:
         try:
             logger.info(f"📱 Extracting details from: {url}")
             
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            record = self.spec_records.get(self.session, url)
             
-            details = {}
-            
-            # Extract specifications from the specs table
-            spec_tables = soup.find_all('table', {'cellspacing': '0'})
-            
-            for table in spec_tables:
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    if len(cells) >= 2:
-                        key = cells[0].get_text(strip=True).lower()
-                        value = cells[1].get_text(strip=True)
-                        
-                        # Map GSMArena fields to our database fields
-                        if 'weight' in key and 'g' in value:
-                            try:
-                                weight_match = re.search(r'(\d+\.?\d*)\s*g', value)
-                                if weight_match:
-                                    details['weight'] = float(weight_match.group(1))
-                            except:
-                                pass
-                        
-                        elif 'dimensions' in key:
-                            details['dimensions'] = value[:100]  # Limit length
-                        
-                        elif any(word in key for word in ['chipset', 'cpu', 'processor']):
-                            details['processor'] = value[:200]
-                        
-                        elif 'os' in key or 'android' in key.lower() or 'ios' in key.lower():
-                            details['os'] = value[:100]
-                        
-                        elif any(word in key for word in ['network', '2g', '3g', '4g', '5g']):
-                            details['network_type'] = value[:100]
-                        
-                        elif any(word in key for word in ['charging', 'battery']) and any(word in value.lower() for word in ['w', 'watt', 'fast']):
-                            details['charging_power'] = value[:100]
-                        
-                        elif any(word in key for word in ['protection', 'water', 'dust', 'ip']):
-                            details['water_resistance'] = value[:100]
-                        
-                        elif any(word in key for word in ['build', 'materials', 'body']):
-                            details['material'] = value[:200]
-                        
-                        elif 'colors' in key or 'colour' in key:
-                            details['colors'] = value[:200]
+            # Extract specifications from the specs tables
+            details = SAMSUNG_RULES.apply(record.pairs())
             
             logger.info(f"📊 Extracted {len(details)} specifications")
             return details
@@ -187,7 +125,7 @@ class SamsungBatchCrawler:
     def get_phone_id_from_db(self, brand, model):
         """Get phone ID from database"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cursor = conn.cursor()
             
             cursor.execute(
@@ -208,7 +146,7 @@ class SamsungBatchCrawler:
     def update_phone_in_db(self, phone_id, details):
         """Update phone details in database"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cursor = conn.cursor()
             
             # Build update query dynamically
@@ -275,7 +213,6 @@ class SamsungBatchCrawler:
                 if not product_url:
                     print("❌ No product page found")
                     failed_count += 1
-                    time.sleep(3)  # Wait before next request
                     continue
                 
                 # Extract details
@@ -283,7 +220,6 @@ class SamsungBatchCrawler:
                 if not details:
                     print("❌ No details extracted")
                     failed_count += 1
-                    time.sleep(3)
                     continue
                 
                 # Update database
@@ -295,14 +231,10 @@ class SamsungBatchCrawler:
                     print("❌ Failed to update database")
                     failed_count += 1
                 
-                # Wait between requests to avoid rate limiting
-                time.sleep(3)
-                
             except Exception as e:
                 logger.error(f"❌ Unexpected error processing Samsung {model}: {e}")
                 print(f"❌ Error: {e}")
                 failed_count += 1
-                time.sleep(3)
         
         logger.info(f"🎉 Samsung batch crawling completed: {updated_count} updated, {failed_count} failed")
         print(f"\n🎉 Samsung batch completed!")
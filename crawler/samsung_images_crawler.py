@@ -9,7 +9,7 @@ import time
 import random
 import os
 import sys
-import psycopg2
+from db_pool import pooled_connect
 from bs4 import BeautifulSoup
 import re
 from urllib.parse import urljoin, urlparse
@@ -45,7 +45,7 @@ HEADERS = {
 def get_db_connection():
     """Get database connection"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = pooled_connect(**DB_CONFIG)
         return conn
     except Exception as e:
         print(f"Database connection failed: {e}")
@@ -4,14 +4,16 @@ Samsung Improved Crawler - Fixed search matching logic
 """
 
 import requests
-import time
 import json
-import psycopg2
+from db_pool import pooled_connect
 import os
-from bs4 import BeautifulSoup
 import logging
-from urllib.parse import urljoin, quote
-import re
+from urllib.parse import quote
+from model_matcher import best_match
+from phone_index import indexed_search, search_candidates
+from response_cache import CachedSession
+from spec_fields import SAMSUNG_RULES
+from gsmarena_parser import get_spec_store
 
 # Configure logging
 logging.basicConfig(
@@ -27,7 +29,7 @@ logger = logging.getLogger(__name__)
 class SamsungImprovedCrawler:
     def __init__(self, db_config):
         self.db_config = db_config
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -39,6 +41,7 @@ class SamsungImprovedCrawler:
         })
         self.base_url = "https://www.gsmarena.com"
         self.search_url = "https://www.gsmarena.com/results.php3"
+        self.spec_records = get_spec_store()
         
         # Samsung phones to crawl
         self.samsung_phones = [
@@ -52,6 +55,7 @@ class SamsungImprovedCrawler:
             "Galaxy Z Fold2", "Galaxy Z Fold3", "Galaxy Z Fold4", "Galaxy Z Fold5", "Galaxy Z Fold6"
         ]
     
+    @indexed_search()
     def search_phone_on_gsmarena(self, brand, model):
         """Improved search for Samsung phones on GSMArena"""
         try:
@@ -66,30 +70,10 @@ class SamsungImprovedCrawler:
             response = self.session.get(self.search_url, params=params, timeout=15)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for phone links in the search results
-            phone_links = soup.find_all('a', href=True)
-            
-            for link in phone_links:
-                href = link.get('href', '')
-                if href.startswith('samsung_') and href.endswith('.php'):
-                    # Extract phone name from the link text
-                    link_spans = link.find_all('span')
-                    if link_spans:
-                        link_text = ' '.join([span.get_text(strip=True) for span in link_spans])
-                    else:
-                        link_text = link.get_text(strip=True)
-                    
-                    # Clean up model names for comparison
-                    model_clean = model.lower().replace(' ', '').replace('+', 'plus').replace('z fold', 'zfold').replace('z flip', 'zflip')
-                    link_clean = link_text.lower().replace(' ', '').replace('+', 'plus').replace('z fold', 'zfold').replace('z flip', 'zflip')
-                    
-                    # Check if this is a good match
-                    if self.is_phone_match(model_clean, link_clean, href):
-                        full_url = urljoin(self.base_url, href)
-                        logger.info(f"✅ Found match: {link_text} -> {full_url}")
-                        return full_url
+            match = best_match(brand, model, search_candidates(response.content, self.base_url))
+            if match:
+                logger.info(f"✅ Found match: {match.name} -> {match.url} (confidence {match.confidence:.2f})")
+                return match.url
             
             # If no match found, try alternative search
             return self.alternative_search(brand, model)
@@ -101,28 +85,6 @@ class SamsungImprovedCrawler:
             logger.error(f"❌ Unexpected error searching for {brand} {model}: {e}")
             return None
     
-    def is_phone_match(self, model_clean, link_clean, href):
-        """Check if the link matches the phone model"""
-        # Extract model from URL
-        url_model = href.replace('samsung_galaxy_', '').replace('.php', '').replace('-', '').replace('_', '')
-        url_model = url_model.replace('plus', '+')
-        
-        # Various matching strategies
-        strategies = [
-            model_clean in link_clean,
-            model_clean in url_model,
-            link_clean.endswith(model_clean),
-            url_model.startswith(model_clean.replace('galaxy', '')),
-            # Handle special cases
-            model_clean.replace('galaxy', '') in url_model,
-            # Handle + sign
-            model_clean.replace('+', 'plus') in url_model,
-            # Handle Z series
-            model_clean.replace('zfold', 'z_fold').replace('zflip', 'z_flip') in href,
-        ]
-        
-        return any(strategies)
-    
     def alternative_search(self, brand, model):
         """Try alternative search patterns"""
         # Try without 'Galaxy' prefix
@@ -139,20 +101,10 @@ class SamsungImprovedCrawler:
                 response = self.session.get(self.search_url, params=params, timeout=15)
                 response.raise_for_status()
                 
-                soup = BeautifulSoup(response.content, 'html.parser')
-                phone_links = soup.find_all('a', href=True)
-                
-                for link in phone_links:
-                    href = link.get('href', '')
-                    if href.startswith('samsung_') and href.endswith('.php'):
-                        # More lenient matching for alternative search
-                        model_simple = simple_model.lower().replace(' ', '').replace('+', 'plus')
-                        href_simple = href.lower().replace('samsung_galaxy_', '').replace('.php', '').replace('-', '').replace('_', '')
-                        
-                        if model_simple in href_simple or href_simple.startswith(model_simple):
-                            full_url = urljoin(self.base_url, href)
-                            logger.info(f"✅ Alternative search found: {simple_model} -> {full_url}")
-                            return full_url
+                match = best_match(brand, model, search_candidates(response.content, self.base_url))
+                if match:
+                    logger.info(f"✅ Alternative search found: {simple_model} -> {match.url}")
+                    return match.url
             except:
                 pass
         
@@ -164,56 +116,10 @@ class SamsungImprovedCrawler:
         try:
             logger.info(f"📱 Extracting details from: {url}")
             
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            record = self.spec_records.get(self.session, url)
             
-            details = {}
-            
-            # Extract specifications from the specs table
-            spec_tables = soup.find_all('table', {'cellspacing': '0'})
-            
-            for table in spec_tables:
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    if len(cells) >= 2:
-                        key = cells[0].get_text(strip=True).lower()
-                        value = cells[1].get_text(strip=True)
-                        
-                        # Map GSMArena fields to our database fields
-                        if 'weight' in key and 'g' in value:
-                            try:
-                                weight_match = re.search(r'(\d+\.?\d*)\s*g', value)
-                                if weight_match:
-                                    details['weight'] = float(weight_match.group(1))
-                            except:
-                                pass
-                        
-                        elif 'dimensions' in key:
-                            details['dimensions'] = value[:100]
-                        
-                        elif any(word in key for word in ['chipset', 'cpu', 'processor']):
-                            details['processor'] = value[:200]
-                        
-                        elif 'os' in key or 'android' in key.lower():
-                            details['os'] = value[:100]
-                        
-                        elif any(word in key for word in ['network', '2g', '3g', '4g', '5g']):
-                            details['network_type'] = value[:100]
-                        
-                        elif any(word in key for word in ['charging', 'battery']) and any(word in value.lower() for word in ['w', 'watt', 'fast']):
-                            details['charging_power'] = value[:100]
-                        
-                        elif any(word in key for word in ['protection', 'water', 'dust', 'ip']):
-                            details['water_resistance'] = value[:100]
-                        
-                        elif any(word in key for word in ['build', 'materials', 'body']):
-                            details['material'] = value[:200]
-                        
-                        elif 'colors' in key or 'colour' in key:
-                            details['colors'] = value[:200]
+            # Extract specifications from the specs tables
+            details = SAMSUNG_RULES.apply(record.pairs())
             
             logger.info(f"📊 Extracted {len(details)} specifications")
             return details
@@ -228,7 +134,7 @@ class SamsungImprovedCrawler:
     def get_phone_id_from_db(self, brand, model):
         """Get phone ID from database"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cursor = conn.cursor()
             
             cursor.execute(
@@ -249,7 +155,7 @@ class SamsungImprovedCrawler:
     def update_phone_in_db(self, phone_id, details):
         """Update phone details in database"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cursor = conn.cursor()
             
             # Build update query dynamically
@@ -316,7 +222,6 @@ class SamsungImprovedCrawler:
                 if not product_url:
                     print("❌ No product page found")
                     failed_count += 1
-                    time.sleep(3)
                     continue
                 
                 # Extract details
@@ -324,7 +229,6 @@ class SamsungImprovedCrawler:
                 if not details:
                     print("❌ No details extracted")
                     failed_count += 1
-                    time.sleep(3)
                     continue
                 
                 # Update database
@@ -336,14 +240,10 @@ class SamsungImprovedCrawler:
                     print("❌ Failed to update database")
                     failed_count += 1
                 
-                # Wait between requests
-                time.sleep(3)
-                
             except Exception as e:
                 logger.error(f"❌ Unexpected error processing Samsung {model}: {e}")
                 print(f"❌ Error: {e}")
                 failed_count += 1
-                time.sleep(3)
         
         logger.info(f"🎉 Samsung improved crawling completed: {updated_count} updated, {failed_count} failed")
         print(f"\n🎉 Samsung crawling completed!")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Compiled spec-key dispatch
+Maps spec-table labels to database fields through precompiled rules. The
+rules that match a given label are worked out once and memoised, so
+reprocessing thousands of cached pages costs one dict lookup per row instead
+of a long if/elif chain of substring checks.
+"""
+
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Tuple, Union
+
+# Shared value patterns, compiled once
+NUMBER_RE = re.compile(r'(\d+(?:\.\d+)?)')
+WEIGHT_GRAMS_RE = re.compile(r'(\d+(?:\.\d+)?)\s*g')
+YEAR_RE = re.compile(r'(20\d{2})')
+MAH_RE = re.compile(r'(\d+)\s*mAh')
+SCREEN_INCHES_RE = re.compile(r'(\d+\.?\d*)"')
+
+
+def parse_number(value: str) -> Optional[float]:
+    """First number in the value, e.g. '168 g (5.93 oz)' -> 168.0"""
+    match = NUMBER_RE.search(value)
+    return float(match.group(1)) if match else None
+
+
+def parse_grams(value: str) -> Optional[float]:
+    """Number directly followed by 'g', e.g. '168 g' -> 168.0"""
+    match = WEIGHT_GRAMS_RE.search(value)
+    return float(match.group(1)) if match else None
+
+
+def parse_year(value: str) -> Optional[int]:
+    match = YEAR_RE.search(value)
+    return int(match.group(1)) if match else None
+
+
+def truncate(length: int) -> Callable[[str], str]:
+    """Value parser that caps the text at the column width"""
+    return lambda value: value[:length]
+
+
+class FieldRule:
+    """One label -> field mapping, checked in rule order like an elif branch"""
+
+    __slots__ = ('field', 'key_pattern', 'value_pattern', 'parse', 'keep_first', 'only_if_missing')
+
+    def __init__(self, field: str, key_pattern: Union[str, Pattern],
+                 value_pattern: Optional[Union[str, Pattern]] = None,
+                 parse: Optional[Callable[[str], object]] = None,
+                 keep_first: bool = False, only_if_missing: bool = False):
+        self.field = field
+        self.key_pattern = re.compile(key_pattern) if isinstance(key_pattern, str) else key_pattern
+        if isinstance(value_pattern, str):
+            value_pattern = re.compile(value_pattern)
+        self.value_pattern = value_pattern      # value must match too, else fall through to the next rule
+        self.parse = parse                      # turns the cell text into the stored value; None skips it
+        self.keep_first = keep_first            # the label is claimed, but an existing value is kept
+        self.only_if_missing = only_if_missing  # skipped (falls through) once the field is set
+
+
+class SpecDispatcher:
+    """Applies an ordered rule list to (label, value) pairs"""
+
+    def __init__(self, rules: List[FieldRule], lower_keys: bool = False):
+        self.rules = rules
+        self.lower_keys = lower_keys
+        self._candidates: Dict[str, Tuple[FieldRule, ...]] = {}
+
+    def candidates(self, key: str) -> Tuple[FieldRule, ...]:
+        """Rules whose key pattern matches this label, in order (memoised per label)"""
+        found = self._candidates.get(key)
+        if found is None:
+            normalized = key.lower() if self.lower_keys else key
+            found = tuple(rule for rule in self.rules if rule.key_pattern.search(normalized))
+            self._candidates[key] = found
+        return found
+
+    def apply(self, pairs: Iterable[Tuple[str, str]], details: Optional[Dict] = None) -> Dict:
+        """Fill details from label/value pairs; the first applicable rule per row wins"""
+        details = {} if details is None else details
+        for key, value in pairs:
+            for rule in self.candidates(key):
+                if rule.only_if_missing and details.get(rule.field):
+                    continue
+                if rule.value_pattern is not None and not rule.value_pattern.search(value):
+                    continue
+                if not (rule.keep_first and details.get(rule.field)):
+                    parsed = rule.parse(value) if rule.parse else value
+                    if parsed is not None:
+                        details[rule.field] = parsed
+                break
+        return details
+
+
+# GSMArena spec tables (labels as shown on the page)
+GSMARENA_RULES = SpecDispatcher([
+    FieldRule('os', r'OS|(?i:operating system)'),
+    FieldRule('processor', r'(?i:chipset)'),
+    FieldRule('processor', r'CPU', only_if_missing=True),
+    FieldRule('dimensions', r'(?i:dimensions)'),
+    FieldRule('weight', r'(?i:weight)', parse=parse_number),
+    FieldRule('battery', r'(?i:battery)'),
+    FieldRule('charging_power', r'(?i:charging)'),
+    FieldRule('water_resistance', r'(?i:protection|water)'),
+    FieldRule('material', r'(?i:build)'),
+    FieldRule('colors', r'(?i:colors)'),
+    FieldRule('network_type', r'Network|[2345]G', keep_first=True),
+    FieldRule('screen_size', r'^(?=.*Display)(?=.*Size)'),
+    FieldRule('storage', r'(?i:internal)', keep_first=True),
+    FieldRule('ram', r'RAM|Memory', keep_first=True),
+    FieldRule('camera', r'^(?=.*Camera)(?=.*(?:Main|Primary))'),
+])
+
+# Samsung crawlers: lower-cased labels, values capped to the column widths
+SAMSUNG_RULES = SpecDispatcher([
+    FieldRule('weight', r'weight', value_pattern=r'g', parse=parse_grams),
+    FieldRule('dimensions', r'dimensions', parse=truncate(100)),
+    FieldRule('processor', r'chipset|cpu|processor', parse=truncate(200)),
+    FieldRule('os', r'os|android|ios', parse=truncate(100)),
+    FieldRule('network_type', r'network|[2345]g', parse=truncate(100)),
+    FieldRule('charging_power', r'charging|battery', value_pattern=r'(?i:w|fast)', parse=truncate(100)),
+    FieldRule('water_resistance', r'protection|water|dust|ip', parse=truncate(100)),
+    FieldRule('material', r'build|materials|body', parse=truncate(200)),
+    FieldRule('colors', r'colors|colour', parse=truncate(200)),
+], lower_keys=True)
+
+# OnePlus / OPPO crawler: first spec table, then the remaining tables for gaps
+ONEPLUS_RULES = SpecDispatcher([
+    FieldRule('weight', r'weight'),
+    FieldRule('dimensions', r'dimensions'),
+    FieldRule('processor', r'chipset|cpu|processor'),
+    FieldRule('os', r'os'),
+    FieldRule('network_type', r'network|[2345]g'),
+    FieldRule('charging_power', r'charging|battery'),
+    FieldRule('water_resistance', r'water|protection|ip'),
+    FieldRule('material', r'build|body|material'),
+], lower_keys=True)
+
+ONEPLUS_FALLBACK_RULES = SpecDispatcher([
+    FieldRule('weight', r'weight', only_if_missing=True),
+    FieldRule('dimensions', r'dimensions', only_if_missing=True),
+    FieldRule('processor', r'chipset|cpu', only_if_missing=True),
+    FieldRule('os', r'os', only_if_missing=True),
+], lower_keys=True)
+
+# Storage / RAM fixer: internal memory vs. card slot rows
+STORAGE_RAM_RULES = SpecDispatcher([
+    FieldRule('storage', r'^(?!.*(?:card|external|slot)).*(?:internal|storage|memory)', keep_first=True),
+    FieldRule('ram', r'card slot|microsd|memory card', keep_first=True),
+], lower_keys=True)
+
+# ZOL parameter tables (Chinese labels)
+ZOL_RULES = SpecDispatcher([
+    FieldRule('processor', r'处理器|CPU|芯片'),
+    FieldRule('os', r'操作系统|OS|系统'),
+    FieldRule('dimensions', r'尺寸'),
+    FieldRule('weight', r'重量', parse=parse_number),
+    FieldRule('battery', r'电池'),
+    FieldRule('charging_power', r'充电|快充'),
+    FieldRule('water_resistance', r'防水|防护等级'),
+    FieldRule('material', r'材质'),
+    FieldRule('colors', r'颜色|配色'),
+    FieldRule('network_type', r'网络'),
+    FieldRule('screen_size', r'屏幕尺寸|显示屏尺寸'),
+    FieldRule('storage', r'存储|机身内存|ROM'),
+    FieldRule('ram', r'运行内存|RAM|内存'),
+    FieldRule('camera', r'摄像头|主摄'),
+])
@@ -3,7 +3,7 @@
 Test the two phones that failed
 """
 
-import psycopg2
+from db_pool import pooled_connect
 from gsmarena_flagship_crawler import GSMArenaFlagshipCrawler
 
 def test_failed_phones():
@@ -19,7 +19,7 @@ def test_failed_phones():
     
     # Get the specific phones that failed (ASUS ROG Phone 8 and 8 Pro)
     try:
-        with psycopg2.connect(**db_config) as conn:
+        with pooled_connect(**db_config) as conn:
             with conn.cursor() as cur:
                 cur.execute('''
                     SELECT "Id", "Brand", "Model", "ReleaseYear"
@@ -79,6 +79,8 @@ def test_failed_phones():
                 
         except Exception as e:
             print(f"❌ Error: {e}")
+    
+    crawler.writer.flush()
 
 if __name__ == "__main__":
     test_failed_phones()
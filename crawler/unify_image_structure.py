@@ -7,7 +7,7 @@ Simplify filenames and remove subfolder structure
 
 import os
 import shutil
-import psycopg2
+from db_pool import pooled_connect
 import logging
 from pathlib import Path
 
@@ -66,7 +66,7 @@ class ImageUnifier:
     def update_database_paths(self):
         """Update image paths in database"""
         try:
-            conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+            conn = pooled_connect(host='localhost', database='mobilephone_db', user='postgres')
             cur = conn.cursor()
             
             # Update iPhone 11 paths
@@ -122,7 +122,7 @@ class ImageUnifier:
     def clean_database_inconsistencies(self):
         """Clean inconsistent image paths in database"""
         try:
-            conn = psycopg2.connect(host='localhost', database='mobilephone_db', user='postgres')
+            conn = pooled_connect(host='localhost', database='mobilephone_db', user='postgres')
             cur = conn.cursor()
             
             # Fetch all local image paths
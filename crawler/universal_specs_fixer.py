@@ -6,14 +6,16 @@ Fix fields: ScreenSize, Ram, Battery, Storage (if missing)
 """
 
 import requests
-import time
 import json
-import psycopg2
+from db_pool import pooled_connect
 import os
-from bs4 import BeautifulSoup
 import logging
-from urllib.parse import urljoin, quote
+from urllib.parse import quote
 import re
+from model_matcher import best_match
+from phone_index import indexed_search, search_candidates
+from response_cache import CachedSession
+from gsmarena_parser import get_spec_store
 
 # Configure logging
 logging.basicConfig(
@@ -29,7 +31,7 @@ logger = logging.getLogger(__name__)
 class UniversalSpecsFixer:
     def __init__(self, db_config):
         self.db_config = db_config
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -39,11 +41,12 @@ class UniversalSpecsFixer:
             'Upgrade-Insecure-Requests': '1',
         })
         self.base_url = "https://www.gsmarena.com"
+        self.spec_records = get_spec_store()
         
     def get_phones_to_fix(self, batch_size=20):
         """Get phones that need specs fixes (excluding Samsung which is already complete)"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cur = conn.cursor()
             
             query = '''
@@ -72,6 +75,7 @@ class UniversalSpecsFixer:
             logger.error(f"Database error: {e}")
             return []
     
+    @indexed_search()
     def search_phone_on_gsmarena(self, brand, model):
         """Search for phone on GSMArena"""
         try:
@@ -84,40 +88,10 @@ class UniversalSpecsFixer:
             response = self.session.get(search_url, timeout=10)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for phone links in search results
-            phone_links = soup.find_all('a', href=re.compile(r'\.php$'))
-            
-            for link in phone_links:
-                href = link.get('href', '')
-                link_text = link.get_text(strip=True).lower()
-                
-                # Check if this link matches our phone
-                brand_lower = brand.lower()
-                model_lower = model.lower()
-                
-                # Handle special cases for brand matching
-                if brand_lower == 'oneplus':
-                    brand_patterns = ['oneplus', 'one plus']
-                elif brand_lower == 'oppo':
-                    brand_patterns = ['oppo']
-                elif brand_lower in ['samsung', 'apple', 'google', 'honor', 'huawei', 'xiaomi', 'sony', 'asus', 'vivo']:
-                    brand_patterns = [brand_lower]
-                else:
-                    brand_patterns = [brand_lower]
-                
-                # Check if brand matches
-                brand_match = any(pattern in link_text for pattern in brand_patterns)
-                
-                # Check if model matches (more flexible matching)
-                model_words = model_lower.split()
-                model_match = any(word in link_text for word in model_words if len(word) > 2)
-                
-                if brand_match and model_match:
-                    phone_url = urljoin(self.base_url, href)
-                    logger.info(f"Found match: {phone_url}")
-                    return phone_url
+            match = best_match(brand, model, search_candidates(response.content, self.base_url))
+            if match:
+                logger.info(f"Found match: {match.name} -> {match.url} (confidence {match.confidence:.2f})")
+                return match.url
             
             logger.warning(f"No product page found for {brand} {model}")
             return None
@@ -135,17 +109,13 @@ class UniversalSpecsFixer:
     def extract_specs_data(self, phone_url):
         """Extract comprehensive specs data from GSMArena phone page"""
         try:
-            response = self.session.get(phone_url, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            record = self.spec_records.get(self.session, phone_url)
             
             data = {}
             
             # 1. Extract Screen Size
-            screen_elem = soup.find('span', {'data-spec': 'displaysize-hl'})
-            if screen_elem:
-                screen_text = screen_elem.get_text(strip=True)
+            screen_text = record.spec('displaysize-hl')
+            if screen_text:
                 # Extract just the size (e.g., "6.7"" from "6.7" 1344x2992 pixels")
                 screen_match = re.search(r'(\d+\.?\d*)"', screen_text)
                 if screen_match:
@@ -153,17 +123,15 @@ class UniversalSpecsFixer:
                     logger.info(f"✅ Screen Size: {data['screen_size']}")
             
             # 2. Extract RAM
-            ram_elem = soup.find('span', {'data-spec': 'ramsize-hl'})
-            if ram_elem:
-                ram_text = ram_elem.get_text(strip=True)
+            ram_text = record.spec('ramsize-hl')
+            if ram_text:
                 # Clean up RAM text (e.g., "4GB" or "4GB/8GB/12GB")
                 data['ram'] = ram_text
                 logger.info(f"✅ RAM: {data['ram']}")
             
             # 3. Extract Battery
-            battery_elem = soup.find('span', {'data-spec': 'batsize-hl'})
-            if battery_elem:
-                battery_text = battery_elem.get_text(strip=True)
+            battery_text = record.spec('batsize-hl')
+            if battery_text:
                 # Extract numeric mAh value
                 battery_match = re.search(r'(\d+)\s*mAh', battery_text)
                 if battery_match:
@@ -175,25 +143,22 @@ class UniversalSpecsFixer:
                     logger.info(f"✅ Battery (fallback): {data['battery']}")
             
             # 4. Extract Storage (Internal Memory)
-            storage_elem = soup.find('span', {'data-spec': 'internalmemory'})
-            if storage_elem:
-                storage_text = storage_elem.get_text(strip=True)
+            storage_text = record.spec('internalmemory')
+            if storage_text:
                 data['storage'] = storage_text
                 logger.info(f"✅ Storage: {data['storage']}")
             
             # 5. Extract Weight (if missing)
-            weight_elem = soup.find('span', {'data-spec': 'body-hl'})
-            if weight_elem:
-                weight_text = weight_elem.get_text(strip=True)
+            weight_text = record.spec('body-hl')
+            if weight_text:
                 weight_match = re.search(r'(\d+(?:\.\d+)?)\s*g', weight_text)
                 if weight_match:
                     data['weight'] = float(weight_match.group(1))
                     logger.info(f"✅ Weight: {data['weight']}g")
             
             # 6. Extract OS (if not already done)
-            os_elem = soup.find('span', {'data-spec': 'os-hl'})
-            if os_elem:
-                os_text = os_elem.get_text(strip=True)
+            os_text = record.spec('os-hl')
+            if os_text:
                 data['os'] = os_text
                 logger.info(f"✅ OS: {data['os']}")
             
@@ -207,7 +172,7 @@ class UniversalSpecsFixer:
     def update_phone_specs(self, phone_id, data):
         """Update phone with extracted specs data"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cur = conn.cursor()
             
             # Build update query - only update fields that have data
@@ -297,9 +262,6 @@ class UniversalSpecsFixer:
             else:
                 fail_count += 1
                 logger.error(f"❌ Failed to update {brand} {model}")
-            
-            # Add delay between requests to avoid rate limiting
-            time.sleep(3)
         
         logger.info(f"\n🎯 Universal Specs Fix completed!")
         logger.info(f"✅ Success: {success_count}")
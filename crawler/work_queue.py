@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Distributed crawl work queue
+Target phones of a job are queued in a Postgres table; any number of worker
+processes, on one or several machines, claim batches with
+FOR UPDATE SKIP LOCKED so no phone is handed out twice. Claimed rows carry a
+heartbeat: a worker that dies stops heartbeating and its phones are claimed
+again by someone else once the lease runs out. A failed phone goes back to the
+queue with a delay until it has used up max_attempts.
+
+Workers on one machine already share per-host token buckets (rate_limiter.py);
+across machines each worker registers itself, and every machine's buckets are
+scaled down to its share of the configured per-host rate.
+
+    python work_queue.py enqueue gsmarena_flagship
+    python work_queue.py worker gsmarena_flagship      # on as many hosts as you like
+    python work_queue.py status gsmarena_flagship
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import threading
+import uuid
+from typing import Dict, Iterable, List, Optional, Union
+
+from psycopg2.extras import execute_values
+
+from adaptive_backoff import RATE_CEILINGS, get_rate_controller
+from db_pool import pooled_connect
+from rate_limiter import RATE_LIMITS, get_limiter
+
+logger = logging.getLogger(__name__)
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'database': 'mobilephone_db',
+    'user': 'postgres',
+    'password': 'postgres'
+}
+
+DEFAULT_LEASE = 120.0           # seconds without a heartbeat before a claim can be taken over
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 300.0     # seconds before a failed phone is handed out again
+DEFAULT_BATCH_SIZE = 20
+
+QUEUED = 'queued'
+CLAIMED = 'claimed'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA_LOCK_ID = 0x63726177     # advisory lock so concurrent workers don't race on CREATE TABLE
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS crawl_queue (
+        id BIGSERIAL PRIMARY KEY,
+        job TEXT NOT NULL,
+        phone_id INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        priority INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        claimed_by TEXT,
+        claimed_at TIMESTAMPTZ,
+        heartbeat_at TIMESTAMPTZ,
+        available_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        finished_at TIMESTAMPTZ,
+        last_error TEXT,
+        UNIQUE (job, phone_id)
+    );
+    CREATE INDEX IF NOT EXISTS crawl_queue_claim_idx ON crawl_queue (job, status, priority DESC, id);
+    CREATE TABLE IF NOT EXISTS crawl_workers (
+        worker_id TEXT PRIMARY KEY,
+        job TEXT NOT NULL,
+        hostname TEXT NOT NULL,
+        pid INTEGER NOT NULL,
+        started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+'''
+
+
+class WorkQueue:
+    """One job's share of the crawl_queue table, seen from one worker"""
+
+    def __init__(self, job: str, db_config: Optional[Dict] = None, worker_id: Optional[str] = None,
+                 lease: float = DEFAULT_LEASE, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.job = job
+        self.db_config = db_config or DB_CONFIG
+        self.hostname = socket.gethostname()
+        self.worker_id = worker_id or f"{self.hostname}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._held: set = set()
+        self._stop = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self.ensure_schema()
+
+    def ensure_schema(self):
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                cur.execute('SELECT pg_advisory_xact_lock(%s)', (SCHEMA_LOCK_ID,))
+                cur.execute(SCHEMA)
+
+    # Producer side
+
+    def enqueue(self, phone_ids: Iterable[int], priority: Union[int, Dict[int, int]] = 0,
+                requeue_finished: bool = False) -> int:
+        """Add phones to the job, with one priority or a per-phone mapping; phones already in
+        the queue take the new priority, and with requeue_finished done/failed ones are queued
+        again. Returns the number of rows inserted, re-queued or re-prioritised."""
+        rows = [(self.job, phone_id, priority.get(phone_id, 0) if isinstance(priority, dict) else priority)
+                for phone_id in dict.fromkeys(phone_ids)]
+        if not rows:
+            return 0
+        reset = f"crawl_queue.status IN ('{DONE}', '{FAILED}')" if requeue_finished else 'FALSE'
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                # Queued and claimed rows keep their state; only finished ones start over
+                changed = execute_values(cur, f'''
+                    INSERT INTO crawl_queue (job, phone_id, priority) VALUES %s
+                    ON CONFLICT (job, phone_id) DO UPDATE
+                        SET priority = excluded.priority,
+                            status = CASE WHEN {reset} THEN '{QUEUED}' ELSE crawl_queue.status END,
+                            attempts = CASE WHEN {reset} THEN 0 ELSE crawl_queue.attempts END,
+                            available_at = CASE WHEN {reset} THEN now() ELSE crawl_queue.available_at END,
+                            claimed_by = CASE WHEN {reset} THEN NULL ELSE crawl_queue.claimed_by END,
+                            last_error = CASE WHEN {reset} THEN NULL ELSE crawl_queue.last_error END
+                        WHERE {reset} OR crawl_queue.priority <> excluded.priority
+                    RETURNING phone_id
+                ''', rows, page_size=1000, fetch=True)
+        logger.info(f"[{self.job}] Enqueued {len(changed)} of {len(rows)} phones")
+        return len(changed)
+
+    def requeue_failed(self) -> int:
+        """Give phones that used up their attempts another round"""
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f'''
+                    UPDATE crawl_queue SET status = '{QUEUED}', attempts = 0, available_at = now()
+                    WHERE job = %s AND status = '{FAILED}'
+                ''', (self.job,))
+                return cur.rowcount
+
+    # Worker side
+
+    def claim(self, limit: int = DEFAULT_BATCH_SIZE) -> List[int]:
+        """Take up to `limit` phones nobody else holds: queued ones that are due, or claims
+        whose worker stopped heartbeating. Rows locked by another claimer are skipped."""
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                # Abandoned claims that already had their last attempt are given up on
+                cur.execute(f'''
+                    UPDATE crawl_queue SET status = '{FAILED}', finished_at = now(),
+                                           last_error = coalesce(last_error, 'worker lost')
+                    WHERE job = %s AND status = '{CLAIMED}' AND attempts >= %s
+                      AND heartbeat_at < now() - make_interval(secs => %s)
+                ''', (self.job, self.max_attempts, self.lease))
+                cur.execute(f'''
+                    UPDATE crawl_queue AS q
+                    SET status = '{CLAIMED}', claimed_by = %(worker)s, claimed_at = now(),
+                        heartbeat_at = now(), attempts = q.attempts + 1
+                    WHERE q.id IN (
+                        SELECT id FROM crawl_queue
+                        WHERE job = %(job)s AND attempts < %(max_attempts)s
+                          AND ((status = '{QUEUED}' AND available_at <= now())
+                               OR (status = '{CLAIMED}' AND heartbeat_at < now() - make_interval(secs => %(lease)s)))
+                        ORDER BY priority DESC, id
+                        LIMIT %(limit)s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING q.phone_id
+                ''', {'worker': self.worker_id, 'job': self.job, 'max_attempts': self.max_attempts,
+                      'lease': self.lease, 'limit': limit})
+                phone_ids = [row[0] for row in cur.fetchall()]
+        with self._lock:
+            self._held.update(phone_ids)
+        return phone_ids
+
+    def complete(self, phone_ids: Iterable[int]):
+        phone_ids = list(phone_ids)
+        if not phone_ids:
+            return
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f'''
+                    UPDATE crawl_queue SET status = '{DONE}', finished_at = now(), last_error = NULL
+                    WHERE job = %s AND phone_id = ANY(%s) AND claimed_by = %s
+                ''', (self.job, phone_ids, self.worker_id))
+        with self._lock:
+            self._held.difference_update(phone_ids)
+
+    def release(self, phone_id: int, error: str, retry_delay: float = DEFAULT_RETRY_DELAY):
+        """Hand a failed phone back: queued again after retry_delay, or failed for good
+        once it has had max_attempts"""
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f'''
+                    UPDATE crawl_queue
+                    SET status = CASE WHEN attempts >= %s THEN '{FAILED}' ELSE '{QUEUED}' END,
+                        finished_at = CASE WHEN attempts >= %s THEN now() END,
+                        available_at = now() + make_interval(secs => %s),
+                        claimed_by = NULL, last_error = %s
+                    WHERE job = %s AND phone_id = %s AND claimed_by = %s
+                    RETURNING status
+                ''', (self.max_attempts, self.max_attempts, retry_delay, error[:1000],
+                      self.job, phone_id, self.worker_id))
+                row = cur.fetchone()
+        with self._lock:
+            self._held.discard(phone_id)
+        if row and row[0] == FAILED:
+            logger.warning(f"[{self.job}] Phone {phone_id} failed {self.max_attempts} times, giving up: {error}")
+
+    def release_all(self, error: str = 'worker stopped'):
+        """Return every phone still held, immediately and without using up an attempt"""
+        with self._lock:
+            held, self._held = list(self._held), set()
+        if not held:
+            return
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f'''
+                    UPDATE crawl_queue SET status = '{QUEUED}', claimed_by = NULL, available_at = now(),
+                                           attempts = greatest(attempts - 1, 0), last_error = %s
+                    WHERE job = %s AND phone_id = ANY(%s) AND claimed_by = %s AND status = '{CLAIMED}'
+                ''', (error, self.job, held, self.worker_id))
+        logger.info(f"[{self.job}] Released {len(held)} unfinished phones")
+
+    # Heartbeat and worker registry
+
+    def heartbeat(self) -> int:
+        """Extend the lease on held phones; returns how many machines are working on the job"""
+        with self._lock:
+            held = list(self._held)
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                if held:
+                    cur.execute(f'''
+                        UPDATE crawl_queue SET heartbeat_at = now()
+                        WHERE job = %s AND phone_id = ANY(%s) AND claimed_by = %s AND status = '{CLAIMED}'
+                    ''', (self.job, held, self.worker_id))
+                cur.execute('''
+                    INSERT INTO crawl_workers (worker_id, job, hostname, pid) VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at = now()
+                ''', (self.worker_id, self.job, self.hostname, os.getpid()))
+                cur.execute('''
+                    SELECT count(DISTINCT hostname) FROM crawl_workers
+                    WHERE job = %s AND heartbeat_at >= now() - make_interval(secs => %s)
+                ''', (self.job, self.lease))
+                return max(1, cur.fetchone()[0])
+
+    def _heartbeat_loop(self):
+        machines = None
+        while True:
+            try:
+                count = self.heartbeat()
+                if count != machines:
+                    machines = count
+                    share_host_rates(machines)
+            except Exception as e:
+                logger.warning(f"[{self.job}] Heartbeat failed: {e}")
+            if self._stop.wait(self.lease / 4):
+                return
+
+    def start_heartbeat(self):
+        if self._heartbeat_thread is None:
+            self._stop.clear()
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name='queue-heartbeat',
+                                                      daemon=True)
+            self._heartbeat_thread.start()
+
+    def stop_heartbeat(self):
+        if self._heartbeat_thread is not None:
+            self._stop.set()
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                cur.execute('DELETE FROM crawl_workers WHERE worker_id = %s', (self.worker_id,))
+
+    def remaining(self) -> int:
+        """Phones that are queued or claimed (whether due yet or not)"""
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f'''
+                    SELECT count(*) FROM crawl_queue
+                    WHERE job = %s AND status IN ('{QUEUED}', '{CLAIMED}') AND attempts < %s
+                ''', (self.job, self.max_attempts))
+                return cur.fetchone()[0]
+
+    def summary(self) -> Dict[str, int]:
+        with pooled_connect(**self.db_config) as conn:
+            with conn.cursor() as cur:
+                cur.execute('SELECT status, count(*) FROM crawl_queue WHERE job = %s GROUP BY status', (self.job,))
+                counts = dict(cur.fetchall())
+                cur.execute('''
+                    SELECT count(*) FROM crawl_workers
+                    WHERE job = %s AND heartbeat_at >= now() - make_interval(secs => %s)
+                ''', (self.job, self.lease))
+                counts['workers'] = cur.fetchone()[0]
+        return counts
+
+
+def share_host_rates(machines: int):
+    """Scale this machine's per-host buckets (and the AIMD ceilings) to 1/machines of the
+    configured rate, so the whole fleet stays within one crawler's politeness budget"""
+    limiter, controller = get_limiter(), get_rate_controller()
+    for host, (rate, capacity) in RATE_LIMITS.items():
+        share = rate / machines
+        # Never raise the rate here: one cut by throttling, or by a larger fleet that has since
+        # shrunk, creeps back up to the new ceiling through the AIMD controller
+        limiter.set_rate(host, min(limiter.get_rate(host), share), max(1.0, capacity / machines))
+        controller.ceilings[host] = RATE_CEILINGS.get(host, rate) / machines
+    logger.info(f"{machines} machine(s) crawling: using 1/{machines} of each host's request rate")
+
+
+# Job runners: claimed phone ids in, written phone ids out
+
+async def run_gsmarena_flagship(queue: WorkQueue, batch_size: int, poll_interval: float, refresh: bool = False):
+    from fetch_engine import FetchEngine
+    from gsmarena_flagship_crawler import GSMArenaFlagshipCrawler
+
+    crawler = GSMArenaFlagshipCrawler(queue.db_config, refresh=refresh)
+    async with FetchEngine(headers=crawler.session.headers) as engine:
+        while True:
+            phone_ids = await asyncio.to_thread(queue.claim, batch_size)
+            if not phone_ids:
+                if await asyncio.to_thread(queue.remaining) == 0:
+                    logger.info(f"[{queue.job}] Queue drained")
+                    return
+                await asyncio.sleep(poll_interval)
+                continue
+
+            phones = await asyncio.to_thread(crawler.get_phones_by_id, phone_ids)
+            pipeline = crawler.build_pipeline(engine)
+            finished = await pipeline.run(phones)
+            written = set(await asyncio.to_thread(crawler.finish_writes))
+            unchanged = {phone['id'] for phone in finished if phone.get('unchanged')}
+            await asyncio.to_thread(queue.complete, written | unchanged)
+            for phone_id in phone_ids:
+                if phone_id not in written and phone_id not in unchanged:
+                    await asyncio.to_thread(queue.release, phone_id, crawler.last_error(phone_id))
+            logger.info(f"[{queue.job}] Batch done: {len(written)}/{len(phone_ids)} written, "
+                        f"{len(unchanged)} unchanged ({engine.request_count} requests so far)")
+            pipeline.log_report()
+
+
+def flagship_targets(db_config: Dict, refresh: bool = False, budget: Optional[int] = None) -> Dict[int, int]:
+    """phone id -> queue priority; with a budget, the staleness scheduler's pick and ranking"""
+    from gsmarena_flagship_crawler import GSMArenaFlagshipCrawler
+    crawler = GSMArenaFlagshipCrawler(db_config, refresh=refresh, budget=budget)
+    if budget is None:
+        return {phone['id']: 0 for phone in crawler.get_flagship_phones_from_database()}
+    phones = crawler.get_scheduled_phones(budget)
+    crawler.scheduler.mark_scheduled(phone['id'] for phone in phones)
+    # Plan order as priority, so workers claim the most urgent phones first
+    return {phone['id']: len(phones) - rank for rank, phone in enumerate(phones)}
+
+
+# job name -> (target phone ids and priorities for `enqueue`, async worker loop)
+JOBS = {
+    'gsmarena_flagship': (flagship_targets, run_gsmarena_flagship),
+}
+
+
+def run_worker(job: str, db_config: Optional[Dict] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+               poll_interval: float = 30.0, lease: float = DEFAULT_LEASE, refresh: bool = False):
+    """Claim and crawl phones of a job until its queue is empty"""
+    queue = WorkQueue(job, db_config, lease=lease)
+    logger.info(f"[{job}] Worker {queue.worker_id} starting")
+    queue.start_heartbeat()
+    try:
+        asyncio.run(JOBS[job][1](queue, batch_size, poll_interval, refresh=refresh))
+    finally:
+        queue.release_all()
+        queue.stop_heartbeat()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Postgres work queue for distributed crawl workers')
+    parser.add_argument('command', choices=['enqueue', 'worker', 'status', 'requeue-failed'])
+    parser.add_argument('job', choices=sorted(JOBS))
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='phones claimed at a time')
+    parser.add_argument('--lease', type=float, default=DEFAULT_LEASE, help='heartbeat lease in seconds')
+    parser.add_argument('--refresh', action='store_true',
+                        help='enqueue: every phone, finished ones included; worker: skip pages that are unchanged')
+    parser.add_argument('--budget', type=int, default=None,
+                        help='enqueue: only the stalest phones, within this many requests (implies --refresh)')
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        run_worker(args.job, batch_size=args.batch_size, lease=args.lease, refresh=args.refresh)
+        return
+
+    queue = WorkQueue(args.job, lease=args.lease)
+    if args.command == 'enqueue':
+        refresh = args.refresh or args.budget is not None
+        targets = JOBS[args.job][0](queue.db_config, refresh=refresh, budget=args.budget)
+        queue.enqueue(targets, priority=targets, requeue_finished=refresh)
+    elif args.command == 'requeue-failed':
+        print(f"Re-queued {queue.requeue_failed()} failed phones")
+    for status, count in sorted(queue.summary().items()):
+        print(f"{status:>10}: {count}")
+
+
+if __name__ == '__main__':
+    main()
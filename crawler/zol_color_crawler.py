@@ -8,12 +8,17 @@ import requests
 import json
 import time
 import logging
-import psycopg2
+from db_pool import pooled_connect
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-import os
 import re
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from html_parsing import links, parse_html
+from image_downloads import DownloadJob
+from image_store import store_images
+from perceptual_index import choose_color_images
+from phone_index import SOURCE_ZOL, indexed_search
+from response_cache import CachedSession
 
 # Configure logging
 logging.basicConfig(
@@ -30,7 +35,7 @@ class ZOLColorCrawler:
     def __init__(self):
         self.base_delay_seconds = 3.0  # ZOL is relatively lenient, shorter delay is acceptable
         self.max_retries = 3
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -52,7 +57,6 @@ class ZOLColorCrawler:
         """带退避的请求方法"""
         for attempt in range(self.max_retries):
             try:
-                time.sleep(self.base_delay_seconds)
                 response = self.session.request(method, url, timeout=30, **kwargs)
                 response.raise_for_status()
                 return response
@@ -68,7 +72,7 @@ class ZOLColorCrawler:
     def get_phones_with_colors(self) -> List[Dict]:
         """获取需要颜色图片的手机列表"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cursor = conn.cursor()
             
             query = """
@@ -99,6 +103,7 @@ class ZOLColorCrawler:
             logger.error(f"Database query failed: {e}")
             return []
 
+    @indexed_search(SOURCE_ZOL)
     def search_zol_phone(self, brand: str, model: str) -> Optional[str]:
         """搜索ZOL上的手机页面"""
         # 对于iPhone 12，直接使用已知的URL
@@ -112,12 +117,8 @@ class ZOLColorCrawler:
         try:
             logger.info(f"Searching ZOL for: {brand} {model}")
             response = self.request_with_backoff('GET', search_url)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
             # 查找第一个手机链接
-            phone_links = soup.find_all('a', href=True)
-            for link in phone_links:
-                href = link.get('href')
+            for href, _ in links(parse_html(response.content)):
                 if href and '/detail/' in href and 'series' in href:
                     # 构建完整URL
                     if href.startswith('/'):
@@ -135,8 +136,8 @@ class ZOLColorCrawler:
             logger.error(f"ZOL search failed for {brand} {model}: {e}")
             return None
 
-    def extract_color_images_zol(self, phone_url: str, color_list: List[str]) -> Dict[str, str]:
-        """从ZOL页面提取颜色图片"""
+    def extract_color_images_zol(self, phone_url: str, color_list: List[str]) -> Dict[str, List[str]]:
+        """从ZOL页面提取颜色图片 (color -> 候选图片URL列表)"""
         color_images = {}
         
         try:
@@ -222,95 +223,52 @@ class ZOLColorCrawler:
                                 elif img_src.startswith('/'):
                                     img_src = 'https://detail.zol.com.cn' + img_src
                                 
-                                color_images[matched_color] = img_src
+                                color_images[matched_color] = [img_src]
                                 logger.info(f"Found direct image for {matched_color}: {img_src}")
                         else:
                             # 如果没有直接图片，记录颜色名称，稍后通过主图片区域获取
                             logger.info(f"No direct image found for {matched_color}, will try main image area")
             
-            # 尝试从主图片区域提取
+            # 没有直接的颜色图片: 收集页面上匹配颜色的图片, 主图片作为每个颜色最后的候选
+            # (同一张图被多个颜色共用时, 下载后的感知哈希挑选不会采用它)
             if not color_images:
-                logger.info("Trying to extract from main image area")
-                
-                # 查找ZOL的主图片
-                main_pic = soup.find('img', id='big-pic')
-                if main_pic:
-                    main_src = main_pic.get('src')
-                    if main_src:
-                        # 处理URL
-                        if main_src.startswith('//'):
-                            main_src = 'https:' + main_src
-                        elif main_src.startswith('/'):
-                            main_src = 'https://detail.zol.com.cn' + main_src
-                        
-                        logger.info(f"Found main image: {main_src}")
-                        
-                        # 为每个匹配的颜色使用主图片
-                        for color in color_list:
-                            # 检查是否已经找到了这个颜色的图片
-                            if color not in color_images:
-                                color_images[color] = main_src
-                                logger.info(f"Using main image for {color}: {main_src}")
+                logger.info("Trying to extract from page images and main image area")
                 
-                # 尝试找到不同颜色的图片
-                if len(color_images) == len(color_list) and len(set(color_images.values())) == 1:
-                    logger.info("All colors have same image, trying to find different color images")
+                for img in soup.find_all('img', src=True):
+                    src = img.get('src')
+                    alt = img.get('alt', '').lower()
+                    title = img.get('title', '').lower()
                     
-                    # 查找所有iPhone 12相关的图片
-                    all_images = soup.find_all('img', src=True)
-                    iphone_images = []
+                    # 处理URL
+                    if src.startswith('//'):
+                        src = 'https:' + src
+                    elif src.startswith('/'):
+                        src = 'https://detail.zol.com.cn' + src
                     
-                    for img in all_images:
-                        src = img.get('src')
-                        alt = img.get('alt', '').lower()
-                        
-                        # 检查是否是iPhone 12图片
-                        if ('iphone' in alt or '苹果' in alt) and '12' in alt:
-                            if src.startswith('//'):
-                                src = 'https:' + src
-                            elif src.startswith('/'):
-                                src = 'https://detail.zol.com.cn' + src
-                            
-                            # 检查图片质量
-                            if self.is_good_image(src):
-                                iphone_images.append(src)
-                                logger.info(f"Found iPhone 12 image: {src}")
-                    
-                    # 为不同颜色分配不同的图片
-                    if len(iphone_images) >= len(color_list):
-                        logger.info(f"Found {len(iphone_images)} iPhone 12 images, assigning to colors")
-                        for i, color in enumerate(color_list):
-                            if i < len(iphone_images):
-                                color_images[color] = iphone_images[i]
-                                logger.info(f"Assigned image {i+1} to {color}: {iphone_images[i]}")
+                    for color in color_list:
+                        color_lower = color.lower()
+                        if (color_lower in alt or color_lower in title or color_lower in src.lower()) \
+                                and self.is_good_image(src):
+                            candidates = color_images.setdefault(color, [])
+                            if src not in candidates:
+                                candidates.append(src)
+                                logger.info(f"Found page image for {color}: {src}")
+                            break
                 
-                # 如果还是没找到不同图片，尝试其他方法
-                if len(color_images) == len(color_list) and len(set(color_images.values())) == 1:
-                    logger.info("Still same image for all colors, trying alternative approach")
-                    main_images = soup.find_all('img', src=True)
+                # 查找ZOL的主图片
+                main_pic = soup.find('img', id='big-pic')
+                main_src = main_pic.get('src') if main_pic else None
+                if main_src:
+                    if main_src.startswith('//'):
+                        main_src = 'https:' + main_src
+                    elif main_src.startswith('/'):
+                        main_src = 'https://detail.zol.com.cn' + main_src
                     
-                    for img in main_images:
-                        src = img.get('src')
-                        alt = img.get('alt', '').lower()
-                        title = img.get('title', '').lower()
-                        
-                        # 匹配颜色
-                        for color in color_list:
-                            color_lower = color.lower()
-                            if (color_lower in alt or color_lower in title or 
-                                color_lower in src.lower()):
-                                
-                                # 处理URL
-                                if src.startswith('//'):
-                                    src = 'https:' + src
-                                elif src.startswith('/'):
-                                    src = 'https://detail.zol.com.cn' + src
-                                
-                                # 检查图片质量
-                                if self.is_good_image(src):
-                                    color_images[color] = src
-                                    logger.info(f"Found main image for {color}: {src}")
-                                    break
+                    logger.info(f"Found main image: {main_src}")
+                    for color in color_list:
+                        candidates = color_images.setdefault(color, [])
+                        if main_src not in candidates:
+                            candidates.append(main_src)
             
             return color_images
             
@@ -334,32 +292,22 @@ class ZOLColorCrawler:
         
         return True
 
-    def download_image(self, url: str, filename: str) -> bool:
-        """下载图片到本地"""
-        try:
-            logger.info(f"Downloading image: {url}")
-            response = self.request_with_backoff('GET', url)
-            
-            # 确保目录存在
-            os.makedirs(os.path.dirname(filename), exist_ok=True)
-            
-            # 处理文件名中的空格，替换为下划线
-            safe_filename = filename.replace(' ', '_')
-            
-            with open(safe_filename, 'wb') as f:
-                f.write(response.content)
-            
-            logger.info(f"✅ Downloaded: {safe_filename}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Download failed for {url}: {e}")
-            return False
+    def download_color_images(self, images: Dict[str, List[Tuple[str, str]]]) -> Dict[str, str]:
+        """并发下载候选图片 (color -> [(url, 文件名)]), 按感知哈希挑选后返回 color -> 存储相对路径"""
+        jobs = [(color, DownloadJob(url, path.replace(' ', '_')))
+                for color, candidates in images.items() for url, path in candidates]
+        results = store_images([job for _, job in jobs], headers=self.session.headers)
+        
+        candidates: Dict[str, List] = {}
+        for (color, _), stored in zip(jobs, results):
+            if stored:
+                candidates.setdefault(color, []).append(stored)
+        return {color: stored.relative_path for color, stored in choose_color_images(candidates).items()}
 
     def update_database_path(self, phone_id: int, color_images: Dict[str, str]):
         """更新数据库中的颜色图片路径"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = pooled_connect(**self.db_config)
             cursor = conn.cursor()
             
             # 转换为JSON字符串
@@ -399,12 +347,11 @@ class ZOLColorCrawler:
             return False
         
         # 下载图片并更新路径
-        downloaded_images = {}
-        for color, img_url in color_images.items():
-            filename = f"images/phones/{brand}_{model}_{color}.jpg"
-            safe_filename = filename.replace(' ', '_')
-            if self.download_image(img_url, filename):
-                downloaded_images[color] = safe_filename
+        downloaded_images = self.download_color_images({
+            color: [(img_url, f"{brand}_{model}_{color}{'' if i == 0 else f'_{i + 1}'}.jpg")
+                    for i, img_url in enumerate(img_urls)]
+            for color, img_urls in color_images.items()
+        })
         
         # 更新数据库
         if downloaded_images:
@@ -433,10 +380,6 @@ class ZOLColorCrawler:
             
             if self.crawl_phone_colors(phone):
                 success_count += 1
-            
-            # 避免请求过于频繁
-            if i < len(phones):
-                time.sleep(2)
         
         logger.info(f"Completed. Successfully processed: {success_count}/{len(phones)}")
 
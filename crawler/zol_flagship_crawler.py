@@ -6,14 +6,16 @@ Targets the 167 flagship models from 2020-2024 in the database
 """
 
 import requests
-import time
 import json
-import psycopg2
+from db_pool import pooled_connect
 import os
-from bs4 import BeautifulSoup
 import logging
 from urllib.parse import urljoin, quote
 import re
+from html_parsing import images, links, parse_html, table_rows
+from phone_index import SOURCE_ZOL, indexed_search
+from response_cache import CachedSession
+from spec_fields import ZOL_RULES
 
 # Configure logging
 logging.basicConfig(
@@ -26,10 +28,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+PARAM_TABLE_XPATH = '//table[re:test(@class, "param.*table|spec.*table")]'
+MAIN_IMAGE_ID = re.compile(r'.*bigpic.*|.*mainpic.*|.*product.*img.*')
+MAIN_IMAGE_CLASS = re.compile(r'.*product.*|.*main.*|.*big.*')
+GALLERY_IMAGE_SRC = re.compile(r'.*\.(jpg|jpeg|png|webp)', re.IGNORECASE)
+
 class ZOLCrawler:
     def __init__(self, db_config):
         self.db_config = db_config
-        self.session = requests.Session()
+        self.session = CachedSession()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -84,6 +91,7 @@ class ZOLCrawler:
         
         return model.strip()
     
+    @indexed_search(SOURCE_ZOL)
     def search_phone_on_zol(self, brand, model):
         """Search for phone on ZOL and return the product page URL"""
         try:
@@ -102,17 +110,16 @@ class ZOLCrawler:
             response = self.session.get(search_url, timeout=10)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            doc = parse_html(response.content)
             
             # Look for product links in search results
-            product_links = soup.find_all('a', href=re.compile(r'/detail\.zol\.com\.cn/.*\.html'))
+            product_links = links(doc, r'/detail\.zol\.com\.cn/.*\.html')
             
             if not product_links:
                 # Try alternative search patterns
-                product_links = soup.find_all('a', href=re.compile(r'detail\.zol\.com\.cn'))
+                product_links = links(doc, r'detail\.zol\.com\.cn')
             
-            for link in product_links:
-                href = link.get('href')
+            for href, _ in product_links:
                 if href:
                     # Ensure full URL
                     if href.startswith('//'):
@@ -143,58 +150,17 @@ class ZOLCrawler:
             response = self.session.get(product_url, timeout=15)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            details = {}
+            doc = parse_html(response.content)
             
             # Extract specifications from parameter table
-            param_tables = soup.find_all('table', class_=re.compile(r'param.*table|spec.*table'))
+            param_tables = table_rows(doc, PARAM_TABLE_XPATH)
             if not param_tables:
-                param_tables = soup.find_all('table')
+                param_tables = table_rows(doc)
             
-            for table in param_tables:
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    if len(cells) >= 2:
-                        key = cells[0].get_text(strip=True)
-                        value = cells[1].get_text(strip=True)
-                        
-                        # Map common specifications
-                        if any(keyword in key for keyword in ['处理器', 'CPU', '芯片']):
-                            details['processor'] = value
-                        elif any(keyword in key for keyword in ['操作系统', 'OS', '系统']):
-                            details['os'] = value
-                        elif any(keyword in key for keyword in ['尺寸', '机身尺寸', '外观尺寸']):
-                            details['dimensions'] = value
-                        elif any(keyword in key for keyword in ['重量', '机身重量']):
-                            # Extract numeric weight
-                            weight_match = re.search(r'(\d+(?:\.\d+)?)', value)
-                            if weight_match:
-                                details['weight'] = float(weight_match.group(1))
-                        elif any(keyword in key for keyword in ['电池', '电池容量']):
-                            details['battery'] = value
-                        elif any(keyword in key for keyword in ['充电', '充电功率', '快充']):
-                            details['charging_power'] = value
-                        elif any(keyword in key for keyword in ['防水', '防护等级']):
-                            details['water_resistance'] = value
-                        elif any(keyword in key for keyword in ['材质', '机身材质']):
-                            details['material'] = value
-                        elif any(keyword in key for keyword in ['颜色', '机身颜色', '配色']):
-                            details['colors'] = value
-                        elif any(keyword in key for keyword in ['网络', '网络制式', '网络类型']):
-                            details['network_type'] = value
-                        elif any(keyword in key for keyword in ['屏幕尺寸', '显示屏尺寸']):
-                            details['screen_size'] = value
-                        elif any(keyword in key for keyword in ['存储', '机身内存', 'ROM']):
-                            details['storage'] = value
-                        elif any(keyword in key for keyword in ['运行内存', 'RAM', '内存']):
-                            details['ram'] = value
-                        elif any(keyword in key for keyword in ['摄像头', '后置摄像头', '主摄']):
-                            details['camera'] = value
+            details = ZOL_RULES.apply((cells[0], cells[1]) for rows in param_tables for cells in rows if len(cells) >= 2)
             
             # Extract images
-            image_urls = self.extract_product_images(soup, product_url)
+            image_urls = self.extract_product_images(doc, product_url)
             if image_urls:
                 details.update(image_urls)
             
@@ -208,39 +174,40 @@ class ZOLCrawler:
             logger.error(f"Unexpected error extracting details: {e}")
             return {}
     
-    def extract_product_images(self, soup, base_url):
+    def extract_product_images(self, doc, base_url):
         """Extract product images from the page"""
         image_urls = {}
         
         try:
+            imgs = images(doc)
+            
             # Look for main product image
-            main_img = soup.find('img', {'id': re.compile(r'.*bigpic.*|.*mainpic.*|.*product.*img.*')})
+            main_img = next((img for img in imgs if img['id'] and MAIN_IMAGE_ID.search(img['id'])), None)
             if not main_img:
-                main_img = soup.find('img', class_=re.compile(r'.*product.*|.*main.*|.*big.*'))
+                main_img = next((img for img in imgs if img['class'] and MAIN_IMAGE_CLASS.search(img['class'])), None)
             if not main_img:
                 # Fallback: look for any large image
-                imgs = soup.find_all('img')
                 for img in imgs:
-                    src = img.get('src') or img.get('data-src')
+                    src = img['src'] or img['data-src']
                     if src and any(size in src for size in ['800x', '600x', '400x']):
                         main_img = img
                         break
             
             if main_img:
-                src = main_img.get('src') or main_img.get('data-src')
+                src = main_img['src'] or main_img['data-src']
                 if src:
                     full_url = urljoin(base_url, src)
                     image_urls['image_front'] = full_url
             
             # Look for additional images in gallery
-            gallery_imgs = soup.find_all('img', src=re.compile(r'.*\.(jpg|jpeg|png|webp)', re.IGNORECASE))
+            gallery_imgs = [img for img in imgs if GALLERY_IMAGE_SRC.search(img['src'])]
             
             count = 0
             for img in gallery_imgs:
                 if count >= 2:  # Limit to avoid too many images
                     break
                     
-                src = img.get('src') or img.get('data-src')
+                src = img['src'] or img['data-src']
                 if src and src != image_urls.get('image_front'):
                     full_url = urljoin(base_url, src)
                     if count == 0 and 'image_back' not in image_urls:
@@ -275,7 +242,7 @@ class ZOLCrawler:
     def get_phones_from_database(self):
         """Get all flagship phones from database that need details"""
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            with pooled_connect(**self.db_config) as conn:
                 with conn.cursor() as cur:
                     cur.execute('''
                         SELECT "Id", "Brand", "Model", "ReleaseYear"
@@ -303,7 +270,7 @@ class ZOLCrawler:
     def update_phone_details(self, phone_id, details):
         """Update phone details in database"""
         try:
-            with psycopg2.connect(**self.db_config) as conn:
+            with pooled_connect(**self.db_config) as conn:
                 with conn.cursor() as cur:
                     update_fields = []
                     values = []
@@ -410,9 +377,6 @@ class ZOLCrawler:
                 else:
                     failed_count += 1
                 
-                # Rate limiting
-                time.sleep(2)  # 2 seconds between requests
-                
             except Exception as e:
                 logger.error(f"Error processing {phone['brand']} {phone['model']}: {e}")
                 failed_count += 1